@@ -129,6 +129,7 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
 ]
 
 # Permettre les credentials (cookies, authorization headers)
@@ -137,7 +138,7 @@ CORS_ALLOW_CREDENTIALS = True
 # Préflight requests cache (en secondes)
 CORS_PREFLIGHT_MAX_AGE = 86400  # 24 heures
 
-CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken']
+CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken', 'Idempotent-Replayed']
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
@@ -148,6 +149,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.instrumentation.RequestInstrumentationMiddleware',
     'api.middleware.AuditAllMiddleware',
 ]
 
@@ -234,11 +236,13 @@ CORS_ALLOW_ALL_ORIGINS = True
 # DRF / Auth
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.PrincipalJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
+    # Pagination par curseur, activée uniquement via ?cursor= ou ?page_size=
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
 }
 
 SIMPLE_JWT = {
@@ -281,3 +285,113 @@ SMS_BACKEND = os.getenv('SMS_BACKEND', 'console')  # console | custom
 SMS_SENDER_ID = os.getenv('SMS_SENDER_ID', 'SGBC')
 SMS_API_URL = os.getenv('SMS_API_URL', '')
 SMS_API_KEY = os.getenv('SMS_API_KEY', '')
+
+# Journal d'audit : écriture asynchrone par lots (file bornée en mémoire + thread d'écriture).
+# AUDIT_ASYNC=false repasse en écriture synchrone (tests, scripts ponctuels).
+AUDIT_ASYNC = os.getenv('AUDIT_ASYNC', 'true').lower() == 'true'
+AUDIT_QUEUE_MAX_SIZE = int(os.getenv('AUDIT_QUEUE_MAX_SIZE', '10000'))
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '200'))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '1.0'))
+
+# Politique de journalisation HTTP (AuditAllMiddleware) : la règle au préfixe le
+# plus long correspondant à la méthode s'applique. Les erreurs (>= 400) sont
+# toujours journalisées ; sample_rate ne s'applique qu'aux succès.
+# payload_mode : 'truncate' (premiers octets conservés) ou 'hash' (empreinte SHA-256).
+AUDIT_HTTP_POLICIES = [
+    {
+        'prefix': '/',
+        'methods': ['POST', 'PUT', 'PATCH', 'DELETE'],
+        'sample_rate': 1.0,
+        'max_payload_bytes': 4096,
+        'payload_mode': 'truncate',
+    },
+    {
+        'prefix': '/',
+        'methods': ['GET', 'HEAD', 'OPTIONS'],
+        'sample_rate': float(os.getenv('AUDIT_HTTP_READ_SAMPLE_RATE', '0.01')),
+        'max_payload_bytes': 1024,
+        'payload_mode': 'hash',
+    },
+    {
+        # Collecte Prometheus : jamais journalisée.
+        'prefix': '/metrics/',
+        'methods': ['GET'],
+        'audit': False,
+    },
+    {
+        'prefix': '/dashboard/',
+        'methods': ['GET'],
+        'sample_rate': float(os.getenv('AUDIT_HTTP_READ_SAMPLE_RATE', '0.01')),
+        'max_payload_bytes': 0,
+    },
+]
+
+# Export des journaux d'audit : taille des lots lus en base pendant le streaming.
+AUDIT_EXPORT_CHUNK_SIZE = int(os.getenv('AUDIT_EXPORT_CHUNK_SIZE', '2000'))
+
+# Instrumentation des requêtes (nombre de requêtes SQL, temps DB / sérialisation).
+# Les mesures sont exposées dans l'en-tête Server-Timing ; les requêtes dépassant
+# leur budget sont journalisées par le logger 'api.performance'.
+# Clés de REQUEST_BUDGETS : 'default', 'Classe' ou 'Classe.action'
+# (ex. 'BonCommandeViewSet.list') ; limites : queries, db_ms, serializer_ms,
+# total_ms, response_bytes.
+REQUEST_INSTRUMENTATION = os.getenv('REQUEST_INSTRUMENTATION', 'true').lower() == 'true'
+REQUEST_INSTRUMENTATION_HEADERS = os.getenv('REQUEST_INSTRUMENTATION_HEADERS', 'true').lower() == 'true'
+REQUEST_BUDGETS = {
+    'default': {
+        'queries': int(os.getenv('REQUEST_BUDGET_QUERIES', '30')),
+        'total_ms': float(os.getenv('REQUEST_BUDGET_TOTAL_MS', '1000')),
+    },
+    'DashboardView': {'queries': 40},
+    # Transfert -> demande et bon de commande détaillés : un préchargement par
+    # relation imbriquée (nombre constant, indépendant du nombre de lignes).
+    'TransfertViewSet': {'queries': 40},
+}
+
+# Métriques Prometheus exposées sur /metrics/ (administrateurs ou METRICS_TOKEN).
+# Avec plusieurs workers gunicorn, METRICS_MULTIPROC_DIR doit pointer vers un
+# répertoire partagé (vidé au démarrage) où chaque processus dépose ses valeurs.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5.0'))
+
+# Cache Django (mémoire locale par défaut). Les caches invalidés entre workers
+# (utilisateurs authentifiés, réponses agrégées) ne sont actifs qu'avec un
+# backend partagé (ex. CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# et CACHE_LOCATION=/var/tmp/sgbc_cache), cf. api.caching.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'sgbc'),
+    },
+}
+
+# Cache des réponses agrégées (actions stats, tableau de bord), invalidé par
+# version de modèle à chaque écriture (cf. api.response_cache). Actif seulement
+# avec un RESPONSE_CACHE_ALIAS partagé.
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+RESPONSE_CACHE_ALIAS = os.getenv('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', '300'))
+
+# Cache local (par processus) des utilisateurs authentifiés par JWT, revalidé
+# par leur version (claim ``ver``, cf. api.authentication). 0 désactive le cache,
+# comme un AUTH_USER_CACHE_ALIAS local au processus.
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', '60'))
+AUTH_USER_CACHE_ALIAS = os.getenv('AUTH_USER_CACHE_ALIAS', 'default')
+
+# Taille des blocs de numéros réservés par processus (hi-lo, cf. api.sequences).
+# 1 (défaut) : numérotation sans trou, une ligne verrouillée par numéro.
+SEQUENCE_BLOCK_SIZE = int(os.getenv('SEQUENCE_BLOCK_SIZE', '1'))
+
+# Nombre maximal de lignes (créées, modifiées ou supprimées) par requête des
+# endpoints d'enregistrement en masse (``lignes/bulk``).
+BULK_LIGNES_MAX = int(os.getenv('BULK_LIGNES_MAX', '500'))
+
+# Nombre maximal d'ordres par requête de génération groupée des ordres de
+# virement (``bons-commande/ordres-virement/batch``).
+ORDRES_VIREMENT_BATCH_MAX = int(os.getenv('ORDRES_VIREMENT_BATCH_MAX', '500'))
+
+# Durée de conservation (secondes) des réponses des actions appelées avec
+# l'en-tête Idempotency-Key (cf. api.idempotency, purge_idempotency_keys).
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400'))
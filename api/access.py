@@ -0,0 +1,146 @@
+"""
+Table d'accès matérialisée (``DemandeAcces``) des demandes et transferts.
+
+Les filtres de visibilité deviennent une semi-jointure indexée sur cette
+table au lieu d'un OR sur plusieurs chemins de jointure suivi d'un DISTINCT.
+Les fonctions ``sync_*`` sont appelées par les signaux (``api.signals``) ;
+``reconcile_access`` corrige les écarts avec les lignes attendues (migration,
+commande ``reconcile_demande_access``).
+"""
+from collections import defaultdict
+
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models import Q
+
+TRANSFERT_DEPARTEMENT_FIELDS = (
+    'departement_source_id',
+    'departement_beneficiaire_id',
+    'id_demande__id_departement_id',
+    'id_bc__id_departement_id',
+)
+
+# Colonnes d'une ligne d'accès, dans l'ordre des tuples de ``expected_access``.
+ACCES_FIELDS = ('departement_id', 'utilisateur_id', 'demande_id', 'transfert_id')
+
+
+def _acces_model(get_model=django_apps.get_model):
+    return get_model('api.DemandeAcces')
+
+
+def visible_demandes(user, departement_id):
+    """
+    Sous-requête des identifiants de demandes visibles par un utilisateur non global.
+    """
+    condition = Q(utilisateur=user) if getattr(user, 'is_authenticated', False) else Q(pk__isnull=True)
+    if departement_id:
+        condition |= Q(departement_id=departement_id)
+    return _acces_model().objects.filter(condition, demande__isnull=False).values('demande_id')
+
+
+def visible_transferts(departement_id):
+    return _acces_model().objects.filter(departement_id=departement_id, transfert__isnull=False).values('transfert_id')
+
+
+def _sync_departements(object_field: str, wanted: dict) -> None:
+    """
+    Aligne les lignes (département, objet) sur ``wanted`` : {objet: {départements}}.
+    """
+    if not wanted:
+        return
+    acces_model = _acces_model()
+    object_attname = f'{object_field}_id'
+    existing = defaultdict(set)
+    for object_id, departement_id in acces_model.objects.filter(
+        **{f'{object_attname}__in': list(wanted)}, departement__isnull=False
+    ).values_list(object_attname, 'departement_id'):
+        existing[object_id].add(departement_id)
+
+    stale = Q(pk__in=[])
+    missing = []
+    for object_id, departements in wanted.items():
+        removed = existing[object_id] - departements
+        if removed:
+            stale |= Q(**{object_attname: object_id, 'departement_id__in': removed})
+        missing += [
+            acces_model(departement_id=departement_id, **{object_attname: object_id})
+            for departement_id in departements - existing[object_id]
+        ]
+    acces_model.objects.filter(stale).delete()
+    if missing:
+        acces_model.objects.bulk_create(missing, ignore_conflicts=True)
+
+
+def sync_demande(demande) -> None:
+    departements = {demande.id_departement_id} if demande.id_departement_id else set()
+    _sync_departements('demande', {demande.pk: departements})
+
+
+def sync_transferts(**filters) -> None:
+    transfert_model = django_apps.get_model('api.Transfert')
+    wanted = {}
+    for pk, *departements in transfert_model.objects.filter(**filters).values_list('pk', *TRANSFERT_DEPARTEMENT_FIELDS):
+        wanted[pk] = {departement_id for departement_id in departements if departement_id}
+    _sync_departements('transfert', wanted)
+
+
+def grant_users(pairs) -> None:
+    """
+    Ajoute les lignes (utilisateur, demande) pour des couples (utilisateur_id, demande_id).
+    """
+    acces_model = _acces_model()
+    acces_model.objects.bulk_create(
+        [acces_model(utilisateur_id=user_id, demande_id=demande_id) for user_id, demande_id in pairs],
+        ignore_conflicts=True,
+    )
+
+
+def revoke_users(**filters) -> None:
+    _acces_model().objects.filter(utilisateur__isnull=False, demande__isnull=False, **filters).delete()
+
+
+def expected_access(get_model=django_apps.get_model) -> set:
+    """
+    Lignes attendues, en tuples (département, utilisateur, demande, transfert).
+    """
+    demande_model = get_model('api.Demande')
+    transfert_model = get_model('api.Transfert')
+    expected = {
+        (departement_id, None, pk, None)
+        for pk, departement_id in demande_model.objects.exclude(id_departement__isnull=True).values_list(
+            'pk', 'id_departement_id'
+        )
+    }
+    m2m_field = demande_model._meta.get_field('utilisateurs_transferts')
+    expected.update(
+        (None, user_id, demande_id, None)
+        for user_id, demande_id in m2m_field.remote_field.through.objects.values_list(
+            m2m_field.m2m_reverse_field_name(), m2m_field.m2m_field_name()
+        )
+    )
+    for pk, *departements in transfert_model.objects.values_list('pk', *TRANSFERT_DEPARTEMENT_FIELDS):
+        expected.update((departement_id, None, None, pk) for departement_id in departements if departement_id)
+    return expected
+
+
+def reconcile_access(dry_run: bool = False, get_model=django_apps.get_model, batch_size: int = 2000) -> tuple:
+    """
+    Compare la table d'accès aux lignes attendues et corrige les écarts ;
+    retourne (lignes manquantes, lignes obsolètes).
+    """
+    acces_model = _acces_model(get_model)
+    with transaction.atomic():
+        expected = expected_access(get_model)
+        stale = []
+        for pk, *key in acces_model.objects.values_list('pk', *ACCES_FIELDS).iterator(chunk_size=batch_size):
+            key = tuple(key)
+            if key in expected:
+                expected.discard(key)
+            else:
+                stale.append(pk)
+        missing = [acces_model(**dict(zip(ACCES_FIELDS, key))) for key in expected]
+        if not dry_run:
+            for start in range(0, len(stale), batch_size):
+                acces_model.objects.filter(pk__in=stale[start:start + batch_size]).delete()
+            acces_model.objects.bulk_create(missing, batch_size=batch_size, ignore_conflicts=True)
+    return len(missing), len(stale)
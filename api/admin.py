@@ -400,6 +400,7 @@ class LigneBudgetaireAdmin(admin.ModelAdmin):
     )
     search_fields = ('code_ligne', 'chapitre', 'article_budgetaire')
     list_filter = ('exercice', 'id_departement')
+    readonly_fields = LigneBudgetaire.LEDGER_FIELDS
 
 
 @admin.register(Transfert)
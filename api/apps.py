@@ -7,4 +7,5 @@ class ApiConfig(AppConfig):
 
     def ready(self):
         # Ensure signal handlers are registered when the app is ready
+        import api.caching  # noqa: F401
         import api.signals  # noqa: F401
@@ -0,0 +1,111 @@
+"""
+Politique de journalisation HTTP utilisée par ``AuditAllMiddleware``.
+
+Chaque règle de ``AUDIT_HTTP_POLICIES`` associe un préfixe de chemin et une
+liste de méthodes à : journaliser ou non, un taux d'échantillonnage et une
+taille maximale de charge utile conservée (tronquée ou remplacée par une
+empreinte au-delà). La règle au préfixe le plus long l'emporte.
+"""
+import hashlib
+import random
+from typing import Optional
+
+from django.conf import settings
+
+PAYLOAD_TRUNCATE = 'truncate'
+PAYLOAD_HASH = 'hash'
+
+DEFAULT_HTTP_POLICY = {
+    'audit': True,
+    'sample_rate': 1.0,
+    'max_payload_bytes': 4096,
+    'payload_mode': PAYLOAD_TRUNCATE,
+}
+
+
+class HttpAuditPolicy:
+    def __init__(
+        self,
+        *,
+        prefix: str = '/',
+        methods=None,
+        audit: bool = True,
+        sample_rate: float = 1.0,
+        max_payload_bytes: int = 4096,
+        payload_mode: str = PAYLOAD_TRUNCATE,
+    ):
+        if payload_mode not in (PAYLOAD_TRUNCATE, PAYLOAD_HASH):
+            raise ValueError(f'payload_mode inconnu: {payload_mode}')
+        self.prefix = prefix or '/'
+        self.methods = {m.upper() for m in methods} if methods else None
+        self.audit = audit
+        self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        self.max_payload_bytes = max(int(max_payload_bytes), 0)
+        self.payload_mode = payload_mode
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods is not None and (method or '').upper() not in self.methods:
+            return False
+        return (path or '').startswith(self.prefix)
+
+    def should_audit(self, status: Optional[int]) -> bool:
+        """
+        Les erreurs (status >= 400 ou exception) sont toujours journalisées
+        lorsque la règle est active ; les succès sont échantillonnés.
+        """
+        if not self.audit:
+            return False
+        if status is None or status >= 400:
+            return True
+        if self.sample_rate >= 1.0:
+            return True
+        return random.random() < self.sample_rate
+
+    def render_payload(self, response) -> Optional[str]:
+        """
+        Retourne la charge utile à conserver, bornée à ``max_payload_bytes``.
+
+        Le corps déjà rendu (``response.content``) est privilégié afin de ne pas
+        re-sérialiser ``response.data``.
+        """
+        if self.max_payload_bytes <= 0:
+            return None
+        data = getattr(response, 'data', None)
+        if data is None:
+            return None
+        if getattr(response, 'is_rendered', True) and not getattr(response, 'streaming', False):
+            body = response.content
+        else:
+            body = repr(data).encode('utf-8', errors='replace')
+        size = len(body)
+        if size <= self.max_payload_bytes:
+            return body.decode('utf-8', errors='replace')
+        if self.payload_mode == PAYLOAD_HASH:
+            return f'sha256={hashlib.sha256(body).hexdigest()} ({size} octets)'
+        kept = body[: self.max_payload_bytes].decode('utf-8', errors='ignore')
+        return f'{kept}… [tronqué, {size} octets]'
+
+
+_default_policy = HttpAuditPolicy(**DEFAULT_HTTP_POLICY)
+_policies_cache = None
+
+
+def _load_policies():
+    global _policies_cache
+    raw = getattr(settings, 'AUDIT_HTTP_POLICIES', None) or []
+    if _policies_cache is not None and _policies_cache[0] is raw:
+        return _policies_cache[1]
+    policies = sorted(
+        (HttpAuditPolicy(**rule) for rule in raw),
+        key=lambda policy: (len(policy.prefix), policy.methods is not None),
+        reverse=True,
+    )
+    _policies_cache = (raw, policies)
+    return policies
+
+
+def resolve_http_policy(method: str, path: str) -> HttpAuditPolicy:
+    for policy in _load_policies():
+        if policy.matches(method, path):
+            return policy
+    return _default_policy
@@ -0,0 +1,226 @@
+"""
+Écriture asynchrone et groupée des entrées d'audit.
+
+Les entrées sont déposées dans une file bornée en mémoire ; un thread de fond
+les insère par lots (``bulk_create``) dès que la taille de lot ou le délai
+maximal est atteint. Si l'écriture asynchrone est désactivée (``AUDIT_ASYNC``),
+chaque entrée est insérée immédiatement.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """
+    File d'attente bornée + thread d'écriture par lots.
+
+    Le thread est démarré à la première entrée reçue par le processus courant
+    (compatible avec le fork des workers gunicorn).
+    """
+
+    def __init__(self, *, max_size: int = 10000, batch_size: int = 200, flush_interval: float = 1.0):
+        self.max_size = max_size
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.01, flush_interval)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._pid = None
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    def enqueue(self, entry: dict) -> bool:
+        """
+        Ajoute une entrée sans bloquer. Retourne False si la file est pleine
+        (l'entrée est alors abandonnée et comptabilisée).
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def enqueue_many(self, entries) -> int:
+        """
+        Ajoute plusieurs entrées sans bloquer ; retourne le nombre d'entrées
+        mises en file (les autres sont abandonnées et comptabilisées).
+        """
+        queued = 0
+        for entry in entries:
+            queued += self.enqueue(entry)
+        return queued
+
+    def flush(self) -> int:
+        """
+        Vide la file dans le thread appelant et retourne le nombre d'entrées écrites.
+        """
+        total = 0
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return total
+            self._write(batch)
+            total += len(batch)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """
+        Arrête le thread d'écriture puis écrit les entrées restantes.
+        """
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.flush()
+        close_old_connections()
+
+    def stats(self) -> dict:
+        return {
+            'queue_depth': self._queue.qsize(),
+            'queue_max_size': self.max_size,
+            'dropped': self.dropped,
+            'written': self.written,
+            'failed': self.failed,
+        }
+
+    def _ensure_started(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != pid:
+                # Processus enfant (fork) : la file et le thread du parent ne sont pas utilisables.
+                self._queue = queue.Queue(maxsize=self.max_size)
+                self.dropped = self.written = self.failed = 0
+            self._pid = pid
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+
+    def _collect(self) -> list:
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = self.flush_interval if deadline is None else deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def _write(self, batch: list) -> None:
+        from .models import AuditLog
+
+        with self._write_lock:
+            try:
+                AuditLog.objects.bulk_create([AuditLog(**entry) for entry in batch], batch_size=self.batch_size)
+            except Exception:
+                logger.exception("Échec de l'écriture d'un lot de %s entrées d'audit", len(batch))
+                with self._lock:
+                    self.failed += len(batch)
+            else:
+                with self._lock:
+                    self.written += len(batch)
+            finally:
+                if threading.current_thread() is self._thread:
+                    close_old_connections()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer() -> AuditWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditWriter(
+                    max_size=getattr(settings, 'AUDIT_QUEUE_MAX_SIZE', 10000),
+                    batch_size=getattr(settings, 'AUDIT_BATCH_SIZE', 200),
+                    flush_interval=getattr(settings, 'AUDIT_FLUSH_INTERVAL', 1.0),
+                )
+                atexit.register(_writer.shutdown)
+    return _writer
+
+
+def submit_audit_entry(entry: dict) -> None:
+    """
+    Enregistre une entrée d'audit (dictionnaire de champs ``AuditLog``).
+
+    En mode asynchrone, l'entrée n'est mise en file qu'au commit de la
+    transaction courante : un rollback n'écrit donc pas de trace orpheline.
+    """
+    if not getattr(settings, 'AUDIT_ASYNC', True):
+        from .models import AuditLog
+
+        AuditLog.objects.create(**entry)
+        return
+    writer = get_audit_writer()
+    transaction.on_commit(lambda: writer.enqueue(entry))
+
+
+def submit_audit_entries(entries) -> None:
+    """
+    Enregistre un lot d'entrées d'audit : une insertion groupée en mode
+    synchrone, une seule mise en file au commit en mode asynchrone.
+    """
+    entries = list(entries)
+    if not entries:
+        return
+    if not getattr(settings, 'AUDIT_ASYNC', True):
+        from .models import AuditLog
+
+        AuditLog.objects.bulk_create([AuditLog(**entry) for entry in entries])
+        return
+    writer = get_audit_writer()
+    transaction.on_commit(lambda: writer.enqueue_many(entries))
+
+
+def flush_audit_queue() -> int:
+    if _writer is None:
+        return 0
+    return _writer.flush()
+
+
+def audit_queue_stats() -> dict:
+    if _writer is None:
+        return {
+            'queue_depth': 0,
+            'queue_max_size': getattr(settings, 'AUDIT_QUEUE_MAX_SIZE', 10000),
+            'dropped': 0,
+            'written': 0,
+            'failed': 0,
+        }
+    return _writer.stats()
@@ -6,9 +6,10 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
 from django.utils import timezone
-from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import AuditLog, TwoFactorCode, TwoFactorMethod
+from .audit_writer import submit_audit_entries, submit_audit_entry
+from .models import TwoFactorCode, TwoFactorMethod
+from .tokens import UserRefreshToken
 
 
 def get_client_ip(request) -> Optional[str]:
@@ -21,18 +22,43 @@ def get_client_ip(request) -> Optional[str]:
 
 
 def log_audit(user, action: str, *, type_objet: str = 'auth', id_objet=None, request=None, details: str = '') -> None:
-    AuditLog.objects.create(
-        id_utilisateur=user if getattr(user, 'is_authenticated', False) else None,
-        action=action,
-        type_objet=type_objet,
-        id_objet=id_objet,
-        ip_client=get_client_ip(request),
-        details=details,
+    submit_audit_entry(
+        {
+            'id_utilisateur_id': user.pk if getattr(user, 'is_authenticated', False) else None,
+            'action': action,
+            'type_objet': type_objet,
+            'id_objet': id_objet,
+            'ip_client': get_client_ip(request),
+            'details': details,
+            'timestamp': timezone.now(),
+        }
+    )
+
+
+def log_audit_many(user, entries, *, request=None) -> None:
+    """
+    Journalise un lot d'actions du même utilisateur ; chaque entrée fournit
+    ``action``, ``type_objet``, ``id_objet`` et ``details``.
+    """
+    user_id = user.pk if getattr(user, 'is_authenticated', False) else None
+    ip_client = get_client_ip(request)
+    timestamp = timezone.now()
+    submit_audit_entries(
+        {
+            'id_utilisateur_id': user_id,
+            'action': entry['action'],
+            'type_objet': entry.get('type_objet', 'auth'),
+            'id_objet': entry.get('id_objet'),
+            'ip_client': ip_client,
+            'details': entry.get('details', ''),
+            'timestamp': timestamp,
+        }
+        for entry in entries
     )
 
 
 def generate_tokens_for_user(user) -> dict:
-    refresh = RefreshToken.for_user(user)
+    refresh = UserRefreshToken.for_user(user)
     return {
         'access': str(refresh.access_token),
         'refresh': str(refresh),
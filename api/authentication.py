@@ -0,0 +1,160 @@
+"""
+Authentification JWT avec cache des utilisateurs.
+
+L'utilisateur authentifié (avec son rôle et son département) est conservé
+``AUTH_USER_CACHE_TTL`` secondes dans un cache local au processus. Une entrée
+n'est servie que si sa version (``Utilisateur.token_version``) est celle
+publiée dans le cache partagé (``AUTH_USER_CACHE_ALIAS``) et n'est pas plus
+ancienne que le claim ``ver`` du jeton : une requête authentifiée ne lit alors
+pas la base. ``bump_user_version`` incrémente la version et retire les entrées
+(signaux ``api.signals`` sur ``Utilisateur`` et ``Role``).
+
+Le cache n'est utilisé qu'avec un backend partagé (``api.caching``) : avec
+un backend local au processus, une désactivation ou un changement de mot de
+passe ne serait pas vu par les autres workers. Chaque requête relit alors
+l'utilisateur en base (``is_active``, mot de passe).
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import caching
+from .principal import attach_principal
+from .tokens import VERSION_CLAIM
+
+VERSION_PREFIX = 'auth:ver:'
+
+_users = {}
+_users_lock = threading.Lock()
+
+
+def _alias() -> str:
+    return getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')
+
+
+def _cache():
+    return caches[_alias()]
+
+
+def _ttl() -> float:
+    # Sans backend partagé, les invalidations ne seraient pas vues des autres workers.
+    if not caching.is_shared(_alias()):
+        return 0
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+
+
+def _version_key(user_id) -> str:
+    return f'{VERSION_PREFIX}{user_id}'
+
+
+def cached_user(user_id, token_version):
+    """
+    Copie de l'utilisateur en cache, ou None si l'entrée est absente, expirée
+    ou invalidée.
+    """
+    if not _ttl():
+        return None
+    key = str(user_id)
+    with _users_lock:
+        entry = _users.get(key)
+    if entry is None:
+        return None
+    user, version, expires_at = entry
+    if expires_at < time.monotonic() or token_version > version:
+        return None
+    if _cache().get(_version_key(key)) != version:
+        return None
+    # Chaque requête reçoit sa propre copie : les vues peuvent modifier request.user.
+    return copy.deepcopy(user)
+
+
+def remember_user(user) -> None:
+    ttl = _ttl()
+    if not ttl:
+        return
+    key = str(getattr(user, api_settings.USER_ID_FIELD))
+    _cache().set(_version_key(key), user.token_version, timeout=None)
+    with _users_lock:
+        _users[key] = (copy.deepcopy(user), user.token_version, time.monotonic() + ttl)
+
+
+def _forget(keys) -> None:
+    _cache().delete_many([_version_key(key) for key in keys])
+
+
+def forget_users(user_ids) -> None:
+    """
+    Retire des utilisateurs du cache : immédiatement, puis à la validation de
+    la transaction (une authentification concurrente ayant relu l'état
+    antérieur entre-temps est ainsi écartée).
+    """
+    keys = [str(user_id) for user_id in user_ids]
+    if not keys:
+        return
+    with _users_lock:
+        for key in keys:
+            _users.pop(key, None)
+    _forget(keys)
+    transaction.on_commit(lambda: _forget(keys))
+
+
+def bump_user_version(**filters) -> list:
+    """
+    Incrémente ``token_version`` des utilisateurs filtrés et les retire du cache.
+    """
+    user_model = get_user_model()
+    user_ids = list(user_model.objects.filter(**filters).values_list(api_settings.USER_ID_FIELD, flat=True))
+    if user_ids:
+        user_model.objects.filter(**{f'{api_settings.USER_ID_FIELD}__in': user_ids}).update(
+            token_version=F('token_version') + 1
+        )
+        forget_users(user_ids)
+    return user_ids
+
+
+class PrincipalJWTAuthentication(JWTAuthentication):
+    """
+    Authentification JWT chargeant l'utilisateur avec son rôle et son
+    département (cache local, sinon une requête) et construisant son
+    ``Principal``.
+    """
+
+    user_related = ('id_role', 'id_departement')
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        token_version = validated_token.get(VERSION_CLAIM)
+        user = cached_user(user_id, token_version) if token_version is not None else None
+        if user is None:
+            try:
+                user = self.user_model.objects.select_related(*self.user_related).get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found') from e
+            remember_user(user)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        attach_principal(user)
+        return user
@@ -0,0 +1,271 @@
+"""
+Registre des engagements des lignes budgétaires.
+
+Un bon de commande engage son ``montant_engage`` (arrondi au centime) sur la
+ligne désignée par ``id_ligne_budgetaire`` (code de la ligne, ou son
+identifiant). Chaque variation — création, modification du montant,
+changement de ligne, suppression — est enregistrée comme
+``MouvementBudgetaire`` et appliquée aux totaux de la ligne par une mise à
+jour ``F()`` dans la transaction de l'écriture du bon de commande
+(``save()`` transactionnel, voir ``AtomicSaveModel`` ; les vues recalculent
+le montant engagé dans la même transaction) : ``montant_engage`` et
+``montant_reste`` restent à jour sans relecture, et la disponibilité d'une
+ligne se lit sur une seule ligne de table.
+
+Le registre est alimenté par les signaux (``api.signals``) ; les mises à jour
+en masse (``update()``) passent par ``snapshot`` / ``record_changes``.
+``reconcile_lignes`` (commande ``reconcile_budget``) recalcule les totaux
+depuis les bons de commande et régularise les écarts.
+"""
+import uuid
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models.budget import MouvementBudgetaire
+from .response_cache import bump_model_version
+
+CENT = Decimal('0.01')
+TRACKED_FIELDS = ('montant_engage', 'id_ligne_budgetaire')
+STATE_FIELDS = ('id_ligne_budgetaire', 'montant_engage', 'numero_bc')
+
+
+def montant(value) -> Decimal:
+    return Decimal(value or 0).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _as_uuid(value):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def resolve_lignes(references, get_model=django_apps.get_model) -> dict:
+    """
+    {référence: identifiant de ligne} pour des valeurs de
+    ``BonCommande.id_ligne_budgetaire`` ; les références inconnues sont omises.
+    """
+    references = {reference for reference in references if reference}
+    if not references:
+        return {}
+    uuids = {reference: _as_uuid(reference) for reference in references}
+    condition = Q(code_ligne__in=references) | Q(pk__in=[value for value in uuids.values() if value])
+    by_code, pks = {}, set()
+    for pk, code in get_model('api.LigneBudgetaire')._default_manager.filter(condition).values_list('pk', 'code_ligne'):
+        by_code[code] = pk
+        pks.add(pk)
+    resolved = {}
+    for reference in references:
+        if reference in by_code:
+            resolved[reference] = by_code[reference]
+        elif uuids[reference] in pks:
+            resolved[reference] = uuids[reference]
+    return resolved
+
+
+def find_ligne(reference, queryset=None):
+    """
+    Ligne budgétaire désignée par son code ou son identifiant, ou None.
+    """
+    ligne_id = resolve_lignes([reference]).get(reference)
+    if ligne_id is None:
+        return None
+    queryset = queryset if queryset is not None else django_apps.get_model('api.LigneBudgetaire')._default_manager
+    return queryset.filter(pk=ligne_id).first()
+
+
+def post(entries, get_model=django_apps.get_model) -> int:
+    """
+    Enregistre des mouvements ``(ligne, bon de commande, numéro, montant, motif)``
+    (montant positif : engagement, négatif : désengagement) et applique leur
+    somme aux totaux de chaque ligne ; retourne le nombre de mouvements.
+    """
+    ligne_model = get_model('api.LigneBudgetaire')
+    mouvement_model = get_model('api.MouvementBudgetaire')
+    mouvements = []
+    deltas = defaultdict(Decimal)
+    for ligne_id, bc_id, numero_bc, value, motif in entries:
+        if ligne_id is None or not value:
+            continue
+        mouvements.append(
+            mouvement_model(
+                id_ligne_budgetaire_id=ligne_id,
+                id_bc_id=bc_id,
+                numero_bc=numero_bc or '',
+                type_mouvement=(
+                    MouvementBudgetaire.TYPE_ENGAGEMENT if value > 0 else MouvementBudgetaire.TYPE_DESENGAGEMENT
+                ),
+                motif=motif,
+                montant=value,
+            )
+        )
+        deltas[ligne_id] += value
+    if not mouvements:
+        return 0
+    with transaction.atomic(savepoint=False):
+        mouvement_model.objects.bulk_create(mouvements)
+        for ligne_id, delta in deltas.items():
+            if delta:
+                ligne_model._default_manager.filter(pk=ligne_id).update(
+                    montant_engage=F('montant_engage') + delta,
+                    montant_reste=F('montant_reste') - delta,
+                )
+    bump_model_version(ligne_model)
+    return len(mouvements)
+
+
+def _changes(bc_id, numero_bc, old, new, lignes, motif=None) -> list:
+    """
+    Mouvements faisant passer un bon de commande de ``old`` à ``new``
+    (référence de ligne, montant).
+    """
+    (old_reference, old_montant), (new_reference, new_montant) = old, new
+    old_ligne, new_ligne = lignes.get(old_reference), lignes.get(new_reference)
+    if old_ligne == new_ligne:
+        return [(new_ligne, bc_id, numero_bc, new_montant - old_montant, motif or MouvementBudgetaire.MOTIF_MODIFICATION)]
+    motif = motif or MouvementBudgetaire.MOTIF_CHANGEMENT_LIGNE
+    return [
+        (old_ligne, bc_id, numero_bc, -old_montant, motif),
+        (new_ligne, bc_id, numero_bc, new_montant, motif),
+    ]
+
+
+def _touches(update_fields) -> bool:
+    return update_fields is None or bool(set(TRACKED_FIELDS) & set(update_fields))
+
+
+def before_save(instance, update_fields=None) -> None:
+    """
+    Mémorise la ligne et le montant engagés d'un bon de commande existant
+    avant son enregistrement.
+    """
+    if instance._state.adding or not _touches(update_fields):
+        return
+    row = type(instance)._default_manager.filter(pk=instance.pk).values_list(*STATE_FIELDS[:2]).first()
+    if row is not None:
+        instance._budget_state = row
+
+
+def after_save(instance, created: bool) -> None:
+    state = instance.__dict__.pop('_budget_state', None)
+    if created:
+        old, motif = (None, Decimal('0')), MouvementBudgetaire.MOTIF_CREATION
+    elif state is not None:
+        old, motif = (state[0], montant(state[1])), None
+    else:
+        return
+    new = (instance.id_ligne_budgetaire, montant(instance.montant_engage))
+    if old == new:
+        return
+    lignes = resolve_lignes({old[0], new[0]})
+    post(_changes(instance.pk, instance.numero_bc, old, new, lignes, motif))
+
+
+def before_delete(instance) -> None:
+    instance._budget_state = type(instance)._default_manager.filter(pk=instance.pk).values_list(*STATE_FIELDS[:2]).first()
+
+
+def after_delete(instance) -> None:
+    state = instance.__dict__.pop('_budget_state', None)
+    if not state or not state[0]:
+        return
+    old = (state[0], montant(state[1]))
+    lignes = resolve_lignes({state[0]})
+    # Le bon de commande n'existe plus : seul son numéro est conservé.
+    post(_changes(None, instance.numero_bc, old, (None, Decimal('0')), lignes, MouvementBudgetaire.MOTIF_SUPPRESSION))
+
+
+def after_bulk_create(instances) -> None:
+    lignes = resolve_lignes({instance.id_ligne_budgetaire for instance in instances})
+    if not lignes:
+        return
+    entries = []
+    for instance in instances:
+        entries += _changes(
+            instance.pk,
+            instance.numero_bc,
+            (None, Decimal('0')),
+            (instance.id_ligne_budgetaire, montant(instance.montant_engage)),
+            lignes,
+            MouvementBudgetaire.MOTIF_CREATION,
+        )
+    post(entries)
+
+
+def snapshot(queryset) -> dict:
+    """
+    État engagé {pk: (référence, montant, numéro)} de bons de commande, avant
+    une mise à jour en masse suivie de ``record_changes``.
+    """
+    return {pk: (reference, montant(value), numero) for pk, reference, value, numero in queryset.values_list('pk', *STATE_FIELDS)}
+
+
+def record_changes(before: dict) -> int:
+    """
+    Enregistre les mouvements des bons de commande de ``before`` (voir
+    ``snapshot``) modifiés depuis sans signal.
+    """
+    if not before:
+        return 0
+    bc_model = django_apps.get_model('api.BonCommande')
+    after = snapshot(bc_model._default_manager.filter(pk__in=list(before)))
+    lignes = resolve_lignes({state[0] for state in (*before.values(), *after.values())})
+    entries = []
+    for pk, (reference, value, numero) in after.items():
+        old = before[pk][:2]
+        if old != (reference, value):
+            entries += _changes(pk, numero, old, (reference, value), lignes)
+    return post(entries)
+
+
+def compute_engagements(get_model=django_apps.get_model) -> dict:
+    """
+    Montant engagé attendu par ligne {identifiant: montant}, recalculé depuis
+    les bons de commande.
+    """
+    rows = (
+        get_model('api.BonCommande')
+        ._default_manager.exclude(Q(id_ligne_budgetaire__isnull=True) | Q(id_ligne_budgetaire=''))
+        .values_list('id_ligne_budgetaire', 'montant_engage')
+    )
+    by_reference = defaultdict(Decimal)
+    for reference, value in rows.iterator(chunk_size=2000):
+        by_reference[reference] += montant(value)
+    totals = defaultdict(Decimal)
+    for reference, ligne_id in resolve_lignes(by_reference, get_model).items():
+        totals[ligne_id] += by_reference[reference]
+    return dict(totals)
+
+
+def reconcile_lignes(get_model=django_apps.get_model, dry_run: bool = False) -> list:
+    """
+    Aligne les totaux des lignes sur les bons de commande (mouvements de
+    reprise) ; retourne les écarts (code, engagé stocké, engagé attendu,
+    reste stocké, reste attendu).
+    """
+    ligne_model = get_model('api.LigneBudgetaire')
+    with transaction.atomic():
+        expected = compute_engagements(get_model)
+        lignes = ligne_model._default_manager.order_by('code_ligne')
+        if not dry_run:
+            lignes = lignes.select_for_update()
+        differences, entries = [], []
+        for pk, code, budget, engage, reste in lignes.values_list(
+            'pk', 'code_ligne', 'montant_budget', 'montant_engage', 'montant_reste'
+        ):
+            attendu = expected.get(pk, Decimal('0'))
+            if engage != attendu or reste != budget - engage:
+                differences.append((code, engage, attendu, reste, budget - attendu))
+            if engage != attendu:
+                entries.append((pk, None, '', attendu - engage, MouvementBudgetaire.MOTIF_REPRISE))
+        if not dry_run and differences:
+            post(entries, get_model)
+            ligne_model._default_manager.exclude(montant_reste=F('montant_budget') - F('montant_engage')).update(
+                montant_reste=F('montant_budget') - F('montant_engage')
+            )
+            bump_model_version(ligne_model)
+    return differences
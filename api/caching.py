@@ -0,0 +1,49 @@
+"""
+Backends de cache partagés entre processus.
+
+Les caches dont l'invalidation doit être vue par tous les workers (versions
+des utilisateurs authentifiés, cf. ``api.authentication`` ; réponses
+agrégées, cf. ``api.response_cache``) ne sont utilisés
+qu'avec un backend partagé (fichiers, Redis, Memcached...) : avec un backend
+local au processus (``LocMemCache``), un autre worker continuerait à servir
+une entrée invalidée. Le contrôle ``api.W001`` (``manage.py check``, exécuté
+au démarrage) signale les caches ainsi désactivés.
+"""
+from django.conf import settings
+from django.core import checks
+
+PROCESS_LOCAL_BACKENDS = frozenset({
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+})
+
+
+def is_shared(alias: str) -> bool:
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    return bool(backend) and backend not in PROCESS_LOCAL_BACKENDS
+
+
+def _local_caches():
+    """
+    (réglage, alias) des caches activés mais configurés sur un backend local.
+    """
+    if getattr(settings, 'AUTH_USER_CACHE_TTL', 60):
+        alias = getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')
+        if not is_shared(alias):
+            yield 'AUTH_USER_CACHE_TTL', alias
+    if getattr(settings, 'RESPONSE_CACHE_ENABLED', True):
+        alias = getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')
+        if not is_shared(alias):
+            yield 'RESPONSE_CACHE_ENABLED', alias
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    return [
+        checks.Warning(
+            f"{setting} est actif mais le cache '{alias}' est local au processus : il est désactivé.",
+            hint='Configurer un backend partagé (CACHE_BACKEND, ex. FileBasedCache ou Redis).',
+            id='api.W001',
+        )
+        for setting, alias in _local_caches()
+    ]
@@ -0,0 +1,357 @@
+"""
+Compteurs matérialisés du tableau de bord (``DashboardCounter``).
+
+Chaque métrique est décrite par un ``CounterSpec`` : le modèle compté, les
+chemins menant au(x) département(s) qui voient l'objet (mêmes règles que
+``filter_by_departement`` / ``filter_transferts_for_user``) et, le cas échéant,
+le champ de statut. Un objet compte pour la ligne globale (sans département)
+et pour chacun de ses départements.
+
+Les compteurs sont tenus à jour par les signaux (``api.signals``) avec des
+mises à jour ``F()`` dans la transaction de l'écriture : ``save()`` des
+modèles comptés est transactionnel (``AtomicSaveModel``), les suppressions
+le sont par Django et ``post_bulk_create`` est émis dans la transaction du
+``bulk_create``. La commande ``reconcile_dashboard_counters`` recalcule
+l'ensemble périodiquement.
+"""
+from collections import Counter, defaultdict
+
+from django.apps import apps as django_apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+GLOBAL = None
+
+
+class CounterSpec:
+    def __init__(self, metric: str, model: str, departements=(), statut: str = '', tracked=None):
+        self.metric = metric
+        self.model = model
+        self.departements = tuple(departements)
+        self.statut = statut
+        # Champs locaux dont la modification peut changer les clés de l'objet.
+        self.tracked = tuple(
+            tracked
+            if tracked is not None
+            else {lookup.split('__', 1)[0] for lookup in self.departements} | ({statut} if statut else set())
+        )
+
+    @property
+    def is_local(self) -> bool:
+        return all('__' not in lookup for lookup in self.departements)
+
+    @property
+    def value_fields(self) -> list:
+        return [*self.departements, *([self.statut] if self.statut else [])]
+
+    def keys(self, values) -> list:
+        """
+        Clés (département, statut) d'un objet à partir de ses valeurs ``value_fields``.
+        """
+        statut = values[len(self.departements)] if self.statut else ''
+        statut = statut or ''
+        departements = {value for value in values[: len(self.departements)] if value is not None}
+        return [(GLOBAL, statut)] + [(departement, statut) for departement in departements]
+
+
+COUNTER_SPECS = (
+    CounterSpec('demandes', 'api.Demande', ('id_departement',), 'statut_demande'),
+    CounterSpec('bons_commande', 'api.BonCommande', ('id_departement',), 'statut_bc'),
+    CounterSpec('lignes_demande', 'api.LigneDemande', ('id_demande__id_departement',)),
+    CounterSpec('lignes_bc', 'api.LigneBC', ('id_bc__id_departement',)),
+    CounterSpec('documents', 'api.Document', ('id_utilisateur__id_departement',)),
+    CounterSpec(
+        'transferts',
+        'api.Transfert',
+        (
+            'departement_source',
+            'departement_beneficiaire',
+            'id_demande__id_departement',
+            'id_bc__id_departement',
+        ),
+    ),
+    CounterSpec('factures', 'api.Facture', ('id_bc__id_departement',)),
+    CounterSpec('paiements', 'api.Paiement', ('id_facture__id_bc__id_departement',)),
+    CounterSpec('fournisseurs', 'api.Fournisseur'),
+    CounterSpec('articles', 'api.Article'),
+    CounterSpec('devises', 'api.Devise'),
+    CounterSpec('departements', 'api.Departement'),
+    CounterSpec('categories', 'api.Categorie'),
+    CounterSpec('methodes_paiement', 'api.MethodePaiement'),
+    CounterSpec('banques', 'api.Banque'),
+    CounterSpec('fournisseurs_rib', 'api.FournisseurRIB'),
+    CounterSpec('signatures_numeriques', 'api.SignatureNumerique'),
+    CounterSpec('signatures_bc', 'api.SignatureBC'),
+    CounterSpec('lignes_budgetaires', 'api.LigneBudgetaire'),
+)
+SPECS_BY_MODEL = {spec.model: spec for spec in COUNTER_SPECS}
+SPECS_BY_METRIC = {spec.metric: spec for spec in COUNTER_SPECS}
+GLOBAL_ONLY_METRICS = tuple(spec.metric for spec in COUNTER_SPECS if not spec.departements)
+
+# Déplacement d'un parent (changement de département ou de rattachement) :
+# champs surveillés et métriques dépendantes (métrique, chemin vers le parent).
+DEPENDENT_MOVES = {
+    'api.Demande': (('id_departement',), (('lignes_demande', 'id_demande'), ('transferts', 'id_demande'))),
+    'api.BonCommande': (
+        ('id_departement',),
+        (
+            ('lignes_bc', 'id_bc'),
+            ('factures', 'id_bc'),
+            ('paiements', 'id_facture__id_bc'),
+            ('transferts', 'id_bc'),
+        ),
+    ),
+    'api.Facture': (('id_bc',), (('paiements', 'id_facture'),)),
+    'api.Utilisateur': (('id_departement',), (('documents', 'id_utilisateur'),)),
+}
+
+
+def model_label(model) -> str:
+    return model._meta.label
+
+
+def _touches(fields, update_fields) -> bool:
+    if update_fields is None:
+        return True
+    names = set(update_fields)
+    return any(field in names or f'{field}_id' in names for field in fields)
+
+
+def _keys_from_instance(spec: CounterSpec, instance) -> Counter:
+    values = [getattr(instance, f'{lookup}_id') for lookup in spec.departements]
+    if spec.statut:
+        values.append(getattr(instance, spec.statut))
+    return Counter(spec.keys(values))
+
+
+def _keys_from_db(spec: CounterSpec, model, **filters) -> Counter:
+    if not spec.departements and not spec.statut:
+        return Counter({(GLOBAL, ''): model._default_manager.filter(**filters).count()})
+    keys = Counter()
+    for values in model._default_manager.filter(**filters).values_list(*spec.value_fields):
+        keys.update(spec.keys(values))
+    return keys
+
+
+def _keys_by_pk(spec: CounterSpec, model, pks) -> dict:
+    keys = defaultdict(Counter)
+    for pk, *values in model._default_manager.filter(pk__in=pks).values_list('pk', *spec.value_fields):
+        keys[pk].update(spec.keys(values))
+    return keys
+
+
+def _snapshot_dependents(instance, moves) -> list:
+    """
+    Clés actuelles des objets rattachés à ``instance`` (par objet), avant un
+    changement de rattachement ou une suppression (SET_NULL sans signal).
+    """
+    dependents = []
+    for metric, lookup in moves[1]:
+        spec = SPECS_BY_METRIC[metric]
+        model = django_apps.get_model(spec.model)
+        pks = list(model._default_manager.filter(**{lookup: instance.pk}).values_list('pk', flat=True))
+        if pks:
+            dependents.append((spec, model, _keys_by_pk(spec, model, pks)))
+    return dependents
+
+
+def _dependent_deltas(dependents, deltas) -> None:
+    # Les objets supprimés entre-temps sont décomptés par leur propre signal.
+    for spec, model, old in dependents:
+        for pk, new in _keys_by_pk(spec, model, list(old)).items():
+            deltas[spec.metric].update(_diff(new, old[pk]))
+
+
+def _diff(new: Counter, old: Counter) -> Counter:
+    delta = Counter(new)
+    delta.subtract(old)
+    return delta
+
+
+def apply_deltas(deltas: dict, counter_model=None) -> None:
+    """
+    Applique {métrique: Counter({(département, statut): delta})} avec des mises à jour F().
+    """
+    if counter_model is None:
+        counter_model = django_apps.get_model('api', 'DashboardCounter')
+    now = timezone.now()
+    with transaction.atomic(savepoint=False):
+        for metric, keys in deltas.items():
+            for (departement_id, statut), delta in keys.items():
+                if not delta:
+                    continue
+                lookup = {'metric': metric, 'departement_id': departement_id, 'statut': statut}
+                updated = counter_model.objects.filter(**lookup).update(valeur=F('valeur') + delta, date_modification=now)
+                if updated:
+                    continue
+                try:
+                    with transaction.atomic():
+                        counter_model.objects.create(valeur=delta, **lookup)
+                except IntegrityError:
+                    counter_model.objects.filter(**lookup).update(valeur=F('valeur') + delta, date_modification=now)
+
+
+def before_save(instance, update_fields=None) -> None:
+    """
+    Mémorise l'état compté d'un objet existant (et de ses dépendants si son
+    rattachement change) avant son enregistrement.
+    """
+    if instance._state.adding:
+        return
+    model = type(instance)
+    label = model_label(model)
+    state = {}
+    spec = SPECS_BY_MODEL.get(label)
+    if spec is not None and (spec.departements or spec.statut) and _touches(spec.tracked, update_fields):
+        state['own'] = _keys_from_db(spec, model, pk=instance.pk)
+
+    moves = DEPENDENT_MOVES.get(label)
+    if moves is not None and _touches(moves[0], update_fields):
+        attnames = [f'{field}_id' for field in moves[0]]
+        previous = model._default_manager.filter(pk=instance.pk).values_list(*attnames).first()
+        if previous is not None and list(previous) != [getattr(instance, attname) for attname in attnames]:
+            state['dependents'] = _snapshot_dependents(instance, moves)
+    if state:
+        instance._counter_state = state
+
+
+def after_save(instance, created: bool) -> None:
+    model = type(instance)
+    spec = SPECS_BY_MODEL.get(model_label(model))
+    state = instance.__dict__.pop('_counter_state', {})
+    deltas = defaultdict(Counter)
+    if spec is not None:
+        if created:
+            if spec.is_local:
+                deltas[spec.metric] += _keys_from_instance(spec, instance)
+            else:
+                deltas[spec.metric] += _keys_from_db(spec, model, pk=instance.pk)
+        elif 'own' in state:
+            new = _keys_from_instance(spec, instance) if spec.is_local else _keys_from_db(spec, model, pk=instance.pk)
+            deltas[spec.metric].update(_diff(new, state['own']))
+    _dependent_deltas(state.get('dependents', ()), deltas)
+    if deltas:
+        apply_deltas(deltas)
+
+
+def before_delete(instance) -> None:
+    model = type(instance)
+    label = model_label(model)
+    spec = SPECS_BY_MODEL.get(label)
+    if spec is not None:
+        if spec.is_local:
+            instance._counter_keys = _keys_from_instance(spec, instance)
+        else:
+            instance._counter_keys = _keys_from_db(spec, model, pk=instance.pk)
+    moves = DEPENDENT_MOVES.get(label)
+    if moves is not None:
+        instance._counter_dependents = _snapshot_dependents(instance, moves)
+
+
+def after_delete(instance) -> None:
+    keys = instance.__dict__.pop('_counter_keys', None)
+    dependents = instance.__dict__.pop('_counter_dependents', ())
+    spec = SPECS_BY_MODEL.get(model_label(type(instance)))
+    deltas = defaultdict(Counter)
+    if spec is not None and keys:
+        deltas[spec.metric].update({key: -count for key, count in keys.items()})
+    _dependent_deltas(dependents, deltas)
+    if deltas:
+        apply_deltas(deltas)
+
+
+def after_bulk_create(model, instances) -> None:
+    spec = SPECS_BY_MODEL.get(model_label(model))
+    if spec is None or not instances:
+        return
+    if spec.is_local:
+        keys = Counter()
+        for instance in instances:
+            keys += _keys_from_instance(spec, instance)
+    else:
+        keys = _keys_from_db(spec, model, pk__in=[instance.pk for instance in instances])
+    apply_deltas({spec.metric: keys})
+
+
+def compute_counters(get_model=django_apps.get_model) -> dict:
+    """
+    Recalcule toutes les métriques depuis les tables sources.
+    """
+    result = {}
+    for spec in COUNTER_SPECS:
+        model = get_model(spec.model)
+        manager = model._default_manager
+        keys = Counter()
+        if len(spec.departements) <= 1:
+            # Une seule appartenance possible : agrégation SQL directe.
+            for row in manager.order_by().values(*spec.value_fields).annotate(total=Count('pk')):
+                values = [row[field] for field in spec.value_fields]
+                for key in spec.keys(values):
+                    keys[key] += row['total']
+        else:
+            for values in manager.order_by().values_list(*spec.value_fields).iterator(chunk_size=2000):
+                keys.update(spec.keys(values))
+        result[spec.metric] = keys
+    return result
+
+
+def reconcile_counters(get_model=django_apps.get_model, dry_run: bool = False) -> list:
+    """
+    Aligne la table des compteurs sur les valeurs recalculées ; retourne les écarts
+    sous forme de tuples (métrique, département, statut, valeur stockée, valeur attendue).
+    """
+    counter_model = get_model('api.DashboardCounter')
+    expected = compute_counters(get_model)
+    with transaction.atomic():
+        stored = {
+            (row.metric, row.departement_id, row.statut): row
+            for row in counter_model.objects.select_for_update().order_by()
+        }
+        differences = []
+        for metric, keys in expected.items():
+            for (departement_id, statut), value in keys.items():
+                row = stored.pop((metric, departement_id, statut), None)
+                current = row.valeur if row is not None else 0
+                if current != value:
+                    differences.append((metric, departement_id, statut, current, value))
+                    if not dry_run:
+                        if row is None:
+                            counter_model.objects.create(
+                                metric=metric, departement_id=departement_id, statut=statut, valeur=value
+                            )
+                        else:
+                            row.valeur = value
+                            row.save(update_fields=['valeur', 'date_modification'])
+        for (metric, departement_id, statut), row in stored.items():
+            if row.valeur:
+                differences.append((metric, departement_id, statut, row.valeur, 0))
+        if not dry_run and stored:
+            counter_model.objects.filter(pk__in=[row.pk for row in stored.values()]).delete()
+    return differences
+
+
+def read_counters(departement_id=None, *, global_scope: bool = False) -> dict:
+    """
+    Lit les compteurs visibles : {métrique: {statut: valeur}}.
+
+    ``global_scope`` lit les totaux globaux ; sinon les lignes du département
+    (les métriques sans département restent globales).
+    """
+    counter_model = django_apps.get_model('api', 'DashboardCounter')
+    if global_scope:
+        qs = counter_model.objects.filter(departement__isnull=True)
+    elif departement_id:
+        qs = counter_model.objects.filter(
+            Q(departement_id=departement_id) | Q(departement__isnull=True, metric__in=GLOBAL_ONLY_METRICS)
+        )
+    else:
+        qs = counter_model.objects.filter(departement__isnull=True, metric__in=GLOBAL_ONLY_METRICS)
+    values = defaultdict(dict)
+    for metric, statut, valeur in qs.values_list('metric', 'statut', 'valeur'):
+        values[metric][statut] = valeur
+    return values
+
+
+def counter_total(values: dict, metric: str) -> int:
+    return sum(values.get(metric, {}).values())
@@ -0,0 +1,118 @@
+"""
+Montant engagé des bons de commande calculé en SQL.
+
+Pour chaque ligne : ``quantite * prix_unitaire``, plus la TVA au taux de la
+ligne (à défaut celui du bon de commande), plus ``ca`` lorsqu'il contient un
+nombre ; le total est arrondi au centime. L'expression s'applique à un bon de
+commande comme à tout un queryset (sous-requête corrélée) : recalcul,
+réparation par lots et contrôle des écarts se font sans charger les lignes.
+Les corrections sont reportées au registre budgétaire (``api.budget``).
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Case,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Abs, Cast, Coalesce, Round
+
+from . import budget
+from .models import BonCommande, LigneBC
+from .response_cache import bump_model_version
+
+MONEY = DecimalField(max_digits=18, decimal_places=5)
+RATE = DecimalField(max_digits=5, decimal_places=2)
+# ``ca`` est un texte libre : seuls les nombres (décimaux, exposant éventuel) sont additionnés.
+NUMBER_PATTERN = r'^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?\s*$'
+# Écart en dessous duquel montant stocké et montant calculé sont considérés égaux.
+DRIFT_TOLERANCE = Decimal('0.005')
+
+
+def ligne_montant_expression(bc_tva):
+    """
+    Montant d'une ligne (quantité, prix, TVA et ca) ; ``bc_tva`` est le taux
+    du bon de commande appliqué aux lignes sans taux propre.
+    """
+    base = ExpressionWrapper(F('quantite') * F('prix_unitaire'), output_field=MONEY)
+    taux = Coalesce(F('taux_tva'), bc_tva, Value(Decimal('0')), output_field=RATE)
+    ca = Case(
+        When(ca__regex=NUMBER_PATTERN, then=Cast('ca', DecimalField(max_digits=30, decimal_places=10))),
+        default=Value(Decimal('0')),
+        output_field=MONEY,
+    )
+    # Multiplier par 0.01 plutôt que diviser par 100 : SQLite divise des entiers
+    # (taux sans décimales) en division entière.
+    return ExpressionWrapper(base + base * taux * Value(Decimal('0.01')) + ca, output_field=MONEY)
+
+
+def montant_engage_expression():
+    """
+    Montant engagé d'un bon de commande, à annoter ou à utiliser dans un
+    ``update`` sur un queryset de ``BonCommande``.
+    """
+    totals = (
+        LigneBC.objects.filter(id_bc=OuterRef('pk'))
+        .order_by()
+        .values('id_bc')
+        .annotate(total=Sum(ligne_montant_expression(OuterRef('tva'))))
+        .values('total')
+    )
+    return Round(Coalesce(Subquery(totals, output_field=MONEY), Value(Decimal('0')), output_field=MONEY), 2)
+
+
+def with_montant_engage_calcule(queryset):
+    return queryset.annotate(montant_engage_calcule=montant_engage_expression())
+
+
+def compute_montant_engage(bc) -> Decimal:
+    if not bc:
+        return Decimal('0')
+    return (
+        with_montant_engage_calcule(BonCommande.objects.filter(pk=bc.pk))
+        .values_list('montant_engage_calcule', flat=True)
+        .get()
+    )
+
+
+def drifted(queryset):
+    """
+    Bons de commande dont le montant stocké diffère du montant calculé.
+    """
+    return (
+        with_montant_engage_calcule(queryset)
+        .annotate(ecart=Abs(F('montant_engage') - F('montant_engage_calcule'), output_field=MONEY))
+        .filter(ecart__gte=DRIFT_TOLERANCE)
+    )
+
+
+def repair_montant_engage(queryset=None, batch_size: int = 500) -> int:
+    """
+    Recalcule ``montant_engage`` par lots (clé primaire croissante) ; retourne
+    le nombre de bons de commande corrigés.
+    """
+    queryset = (queryset if queryset is not None else BonCommande.objects.all()).order_by('pk')
+    repaired = 0
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        pks = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            if repaired:
+                bump_model_version(BonCommande)
+            return repaired
+        last_pk = pks[-1]
+        stale = list(drifted(BonCommande.objects.filter(pk__in=pks)).values_list('pk', flat=True))
+        if stale:
+            with transaction.atomic():
+                # update() n'émet pas de signal : les mouvements budgétaires sont enregistrés ici.
+                before = budget.snapshot(BonCommande.objects.filter(pk__in=stale))
+                repaired += BonCommande.objects.filter(pk__in=stale).update(montant_engage=montant_engage_expression())
+                budget.record_changes(before)
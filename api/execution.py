@@ -0,0 +1,132 @@
+"""
+Exécution budgétaire : budget, engagé et payé des lignes budgétaires.
+
+Les montants sont agrégés en SQL au niveau le plus fin (exercice,
+département, chapitre, article budgétaire) en une requête : budget et engagé
+viennent des totaux des lignes (tenus par ``api.budget``). Le payé vient des
+totaux payés des bons de commande (tenus par ``api.facturation``), groupés
+par référence de ligne (code ou identifiant) en une requête ; les références
+sont résolues une fois, comme dans le registre (``budget.resolve_lignes``),
+puis les lignes payées rattachées à leur groupe.
+Les sous-totaux (article < chapitre < département < exercice < total)
+reproduisent ``GROUPING SETS`` / ``ROLLUP`` — non disponibles dans l'ORM ni
+sous SQLite — en cumulant ces lignes déjà agrégées, dont le nombre ne dépend
+que du nombre de groupes.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+
+from . import budget
+from .models import BonCommande
+
+CENT = Decimal('0.01')
+LEVELS = ('exercice', 'departement', 'chapitre', 'article_budgetaire')
+GROUP_FIELDS = ('exercice', 'id_departement', 'chapitre', 'article_budgetaire')
+# Niveau d'une ligne du rapport : nombre de dimensions renseignées.
+LEVEL_NAMES = ('total', 'exercice', 'departement', 'chapitre', 'article')
+AMOUNTS = ('montant_budget', 'montant_engage', 'montant_paye')
+COLUMNS = (
+    'niveau',
+    'exercice',
+    'departement_id',
+    'departement',
+    'chapitre',
+    'article_budgetaire',
+    'nb_lignes',
+    'montant_budget',
+    'montant_engage',
+    'montant_paye',
+    'montant_reste',
+)
+
+
+def paye_par_ligne() -> dict:
+    """
+    {identifiant de ligne: total payé} : bons de commande rattachés par le
+    code ou l'identifiant de la ligne.
+    """
+    by_reference = dict(
+        BonCommande.objects.filter(id_ligne_budgetaire__gt='')
+        .exclude(total_paye=0)
+        .order_by()
+        .values_list('id_ligne_budgetaire')
+        .annotate(total=Sum('total_paye'))
+    )
+    totals = defaultdict(Decimal)
+    for reference, ligne_id in budget.resolve_lignes(by_reference).items():
+        totals[ligne_id] += by_reference[reference]
+    return totals
+
+
+def grouped_rows(queryset):
+    """
+    Agrégats SQL par (exercice, département, chapitre, article budgétaire).
+    """
+    return (
+        queryset.order_by()
+        .values('exercice', 'id_departement', 'id_departement__nom', 'chapitre', 'article_budgetaire')
+        .annotate(
+            nb_lignes=Count('pk'),
+            montant_budget=Sum('montant_budget'),
+            montant_engage=Sum('montant_engage'),
+        )
+    )
+
+
+def paye_par_groupe(queryset) -> dict:
+    """
+    Total payé par (exercice, département, chapitre, article budgétaire),
+    sur les seules lignes payées du queryset.
+    """
+    paye = paye_par_ligne()
+    totals = defaultdict(Decimal)
+    if not paye:
+        return totals
+    lignes = queryset.order_by().filter(pk__in=list(paye)).values_list('pk', *GROUP_FIELDS)
+    for pk, *values in lignes:
+        totals[tuple(values)] += paye[pk]
+    return totals
+
+
+def _sort_key(entry):
+    # Ordre de ROLLUP : chaque sous-total suit les groupes qu'il résume.
+    values = (entry['exercice'], entry['departement'], entry['departement_id'], entry['chapitre'], entry['article_budgetaire'])
+    return tuple((value is None, value if value is not None else '') for value in values)
+
+
+def execution_rows(queryset) -> list:
+    """
+    Lignes du rapport d'exécution (groupes et sous-totaux), montants en
+    chaînes décimales.
+    """
+    totals = {}
+    paye = paye_par_groupe(queryset)
+    for row in grouped_rows(queryset):
+        values = tuple(row[field] for field in GROUP_FIELDS)
+        row['montant_paye'] = paye.get(values)
+        for depth in range(len(LEVELS) + 1):
+            key = values[:depth] + (None,) * (len(LEVELS) - depth)
+            entry = totals.get(key)
+            if entry is None:
+                entry = totals[key] = {
+                    'niveau': LEVEL_NAMES[depth],
+                    'exercice': key[0],
+                    'departement_id': str(key[1]) if key[1] is not None else None,
+                    'departement': row['id_departement__nom'] if depth >= 2 else None,
+                    'chapitre': key[2],
+                    'article_budgetaire': key[3],
+                    'nb_lignes': 0,
+                    **{amount: Decimal('0') for amount in AMOUNTS},
+                }
+            entry['nb_lignes'] += row['nb_lignes']
+            for amount in AMOUNTS:
+                entry[amount] += row[amount] or Decimal('0')
+
+    rows = sorted(totals.values(), key=_sort_key)
+    for entry in rows:
+        entry['montant_reste'] = entry['montant_budget'] - entry['montant_engage']
+        for amount in (*AMOUNTS, 'montant_reste'):
+            entry[amount] = str(entry[amount].quantize(CENT))
+    return rows
@@ -0,0 +1,273 @@
+"""
+Totaux facturés et payés des bons de commande.
+
+``BonCommande.total_facture`` (somme des ``montant_ttc`` de ses factures) et
+``BonCommande.total_paye`` (somme des paiements de ces factures) sont tenus à
+jour par les signaux (``api.signals``) sur ``Facture`` et ``Paiement`` avec
+des mises à jour ``F()`` dans la transaction de l'écriture (``save()``
+transactionnel, voir ``AtomicSaveModel`` ; ``post_bulk_create`` est émis
+dans la transaction du ``bulk_create``) : les écrans de paiement lisent les
+totaux sur le bon de commande sans agrégation.
+Dans ``deferred_deltas()``, les variations sont cumulées puis appliquées en
+une mise à jour par bon de commande (factures et paiements créés par lot).
+``repair_totaux`` (commande ``repair_paiement_totaux``) les recalcule en SQL
+par lots.
+"""
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .response_cache import bump_model_version
+
+MONEY = DecimalField(max_digits=18, decimal_places=2)
+FACTURE_TRACKED = ('id_bc', 'montant_ttc')
+PAIEMENT_TRACKED = ('id_facture', 'montant')
+
+_deferred = threading.local()
+
+
+def totaux(bc) -> tuple:
+    """
+    (total autorisé, total payé) d'un bon de commande : le total autorisé est
+    le montant engagé, à défaut le total facturé.
+    """
+    total_autorise = bc.montant_engage or Decimal('0')
+    if total_autorise <= 0:
+        total_autorise = bc.total_facture
+    return total_autorise, bc.total_paye
+
+
+def numero_facture_auto(bc, suffix: str = '') -> str:
+    """
+    Numéro d'une facture générée pour un ordre de virement sans facture.
+    """
+    base = (bc.numero_bc or 'BC').strip().replace(' ', '')
+    numero = f'FAC/AUTO/{base}/{timezone.now().strftime("%Y%m%d%H%M%S")}{suffix}'
+    return numero[:100]
+
+
+def _touches(fields, update_fields) -> bool:
+    if update_fields is None:
+        return True
+    names = set(update_fields)
+    return any(field in names or f'{field}_id' in names for field in fields)
+
+
+@contextmanager
+def deferred_deltas(get_model=django_apps.get_model):
+    """
+    Cumule les variations appliquées dans le bloc et les applique à sa sortie,
+    à utiliser dans la transaction des écritures.
+    """
+    if getattr(_deferred, 'deltas', None) is not None:
+        yield
+        return
+    _deferred.deltas = defaultdict(Counter)
+    try:
+        yield
+        deltas = _deferred.deltas
+    finally:
+        _deferred.deltas = None
+    apply_deltas(deltas, get_model)
+
+
+def apply_deltas(deltas: dict, get_model=django_apps.get_model) -> None:
+    """
+    Applique des variations {pk du bon de commande: Counter(champ: montant)}.
+    """
+    pending = getattr(_deferred, 'deltas', None)
+    if pending is not None:
+        for bc_id, values in deltas.items():
+            pending[bc_id].update(values)
+        return
+    bc_model = get_model('api.BonCommande')
+    changed = False
+    with transaction.atomic(savepoint=False):
+        for bc_id, values in deltas.items():
+            updates = {field: F(field) + delta for field, delta in values.items() if delta}
+            if bc_id is not None and updates:
+                bc_model._default_manager.filter(pk=bc_id).update(**updates)
+                changed = True
+    if changed:
+        bump_model_version(bc_model)
+
+
+def _facture_state(facture_model, **filters):
+    """
+    (bon de commande, montant TTC, total payé) de la facture en base.
+    """
+    paye = Coalesce(Sum('paiements__montant'), Value(Decimal('0')), output_field=MONEY)
+    return (
+        facture_model._default_manager.filter(**filters)
+        .annotate(paye=paye)
+        .values_list('id_bc_id', 'montant_ttc', 'paye')
+        .first()
+    )
+
+
+def before_save(instance, update_fields=None) -> None:
+    if instance._state.adding:
+        return
+    model = type(instance)
+    if model._meta.label == 'api.Facture':
+        if _touches(FACTURE_TRACKED, update_fields):
+            instance._totaux_state = _facture_state(model, pk=instance.pk)
+    elif _touches(PAIEMENT_TRACKED, update_fields):
+        instance._totaux_state = (
+            model._default_manager.filter(pk=instance.pk).values_list('id_facture__id_bc_id', 'montant').first()
+        )
+
+
+def _facture_deltas(old, new) -> dict:
+    """
+    Variations d'une facture passant de ``old`` à ``new`` (bon de commande,
+    montant TTC, total payé) ; le payé suit la facture d'un bon à l'autre.
+    """
+    deltas = defaultdict(Counter)
+    if old is not None:
+        deltas[old[0]]['total_facture'] -= old[1] or Decimal('0')
+        deltas[old[0]]['total_paye'] -= old[2] or Decimal('0')
+    if new is not None:
+        deltas[new[0]]['total_facture'] += new[1] or Decimal('0')
+        deltas[new[0]]['total_paye'] += new[2] or Decimal('0')
+    return deltas
+
+
+def _paiement_deltas(old, new) -> dict:
+    deltas = defaultdict(Counter)
+    if old is not None:
+        deltas[old[0]]['total_paye'] -= old[1] or Decimal('0')
+    if new is not None:
+        deltas[new[0]]['total_paye'] += new[1] or Decimal('0')
+    return deltas
+
+
+def _paiement_bc_ids(paiements) -> dict:
+    """
+    {facture: bon de commande} des paiements (facture déjà chargée, sinon une requête).
+    """
+    bc_ids, missing = {}, set()
+    for paiement in paiements:
+        facture = paiement._state.fields_cache.get('id_facture')
+        if facture is not None and facture.pk == paiement.id_facture_id:
+            bc_ids[facture.pk] = facture.id_bc_id
+        else:
+            missing.add(paiement.id_facture_id)
+    if missing:
+        facture_model = django_apps.get_model('api.Facture')
+        bc_ids.update(facture_model._default_manager.filter(pk__in=missing).values_list('pk', 'id_bc_id'))
+    return bc_ids
+
+
+def after_save(instance, created: bool) -> None:
+    state = instance.__dict__.pop('_totaux_state', None)
+    if not created and state is None:
+        return
+    if type(instance)._meta.label == 'api.Facture':
+        paye = state[2] if state is not None else Decimal('0')
+        deltas = _facture_deltas(state, (instance.id_bc_id, instance.montant_ttc, paye))
+    else:
+        bc_id = _paiement_bc_ids([instance]).get(instance.id_facture_id)
+        deltas = _paiement_deltas(state, (bc_id, instance.montant))
+    apply_deltas(deltas)
+
+
+def before_delete(instance) -> None:
+    model = type(instance)
+    if model._meta.label == 'api.Facture':
+        instance._totaux_state = _facture_state(model, pk=instance.pk)
+    else:
+        instance._totaux_state = (
+            model._default_manager.filter(pk=instance.pk).values_list('id_facture__id_bc_id', 'montant').first()
+        )
+
+
+def after_delete(instance) -> None:
+    state = instance.__dict__.pop('_totaux_state', None)
+    if state is None:
+        return
+    if type(instance)._meta.label == 'api.Facture':
+        apply_deltas(_facture_deltas(state, None))
+    else:
+        apply_deltas(_paiement_deltas(state, None))
+
+
+def after_bulk_create(model, instances) -> None:
+    deltas = defaultdict(Counter)
+    if model._meta.label == 'api.Facture':
+        for facture in instances:
+            deltas[facture.id_bc_id]['total_facture'] += facture.montant_ttc or Decimal('0')
+    else:
+        bc_ids = _paiement_bc_ids(instances)
+        for paiement in instances:
+            deltas[bc_ids.get(paiement.id_facture_id)]['total_paye'] += paiement.montant or Decimal('0')
+    apply_deltas(deltas)
+
+
+def total_facture_expression(get_model=django_apps.get_model):
+    totals = (
+        get_model('api.Facture')
+        ._default_manager.filter(id_bc=OuterRef('pk'))
+        .order_by()
+        .values('id_bc')
+        .annotate(total=Sum('montant_ttc'))
+        .values('total')
+    )
+    return Coalesce(Subquery(totals, output_field=MONEY), Value(Decimal('0')), output_field=MONEY)
+
+
+def total_paye_expression(get_model=django_apps.get_model):
+    totals = (
+        get_model('api.Paiement')
+        ._default_manager.filter(id_facture__id_bc=OuterRef('pk'))
+        .order_by()
+        .values('id_facture__id_bc')
+        .annotate(total=Sum('montant'))
+        .values('total')
+    )
+    return Coalesce(Subquery(totals, output_field=MONEY), Value(Decimal('0')), output_field=MONEY)
+
+
+def drifted(queryset, get_model=django_apps.get_model):
+    """
+    Bons de commande dont les totaux stockés diffèrent des totaux recalculés
+    (annotations ``total_facture_calcule`` et ``total_paye_calcule``).
+    """
+    return queryset.annotate(
+        total_facture_calcule=total_facture_expression(get_model),
+        total_paye_calcule=total_paye_expression(get_model),
+    ).filter(~Q(total_facture=F('total_facture_calcule')) | ~Q(total_paye=F('total_paye_calcule')))
+
+
+def repair_totaux(queryset=None, batch_size: int = 500, get_model=django_apps.get_model) -> int:
+    """
+    Recalcule ``total_facture`` et ``total_paye`` par lots (clé primaire
+    croissante) ; retourne le nombre de bons de commande corrigés.
+    """
+    bc_model = get_model('api.BonCommande')
+    manager = bc_model._default_manager
+    queryset = (queryset if queryset is not None else manager.all()).order_by('pk')
+    repaired = 0
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        pks = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            if repaired:
+                bump_model_version(bc_model)
+            return repaired
+        last_pk = pks[-1]
+        with transaction.atomic():
+            stale = list(drifted(manager.filter(pk__in=pks), get_model).values_list('pk', flat=True))
+            if stale:
+                repaired += manager.filter(pk__in=stale).update(
+                    total_facture=total_facture_expression(get_model),
+                    total_paye=total_paye_expression(get_model),
+                )
@@ -0,0 +1,152 @@
+"""
+Actions idempotentes : en-tête ``Idempotency-Key``.
+
+Une action déclarée dans ``idempotent_actions`` d'un ``AuditModelViewSet`` et
+appelée avec l'en-tête s'exécute dans une transaction qui commence par
+insérer la clé (``IdempotencyKey``, unique par utilisateur) et se termine par
+l'enregistrement de la réponse : clé, réponse et effets de l'action sont
+validés ensemble. Un nouvel envoi de la même clé rejoue la réponse
+enregistrée (en-tête ``Idempotent-Replayed``) sans exécuter l'action.
+
+Sur PostgreSQL, un doublon concurrent attend la première exécution sans
+polling : son insertion bloque sur l'index unique jusqu'à la fin de la
+transaction en cours, puis lit la réponse validée — ou s'exécute si la
+première a été annulée. SQLite n'admet qu'un écrivain à la fois : le
+doublon échoue (« database is locked ») si la première exécution dépasse le
+délai d'attente du verrou, et reçoit alors une réponse 409 ; le client
+renvoie la requête avec la même clé.
+
+Les erreurs client (4xx), retournées ou levées (``ValidationError``, 404…),
+sont enregistrées et rejouées ; les effets d'une exception levée sont
+annulés. Une erreur serveur (5xx) annule la clé et les effets de l'action
+ensemble : la requête peut être renvoyée avec la même clé. Les clés
+expirent après ``IDEMPOTENCY_KEY_TTL`` secondes (commande
+``purge_idempotency_keys``).
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def fingerprint(request) -> str:
+    """
+    Empreinte de la requête : méthode, chemin (paramètres compris) et corps.
+    """
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {name: values for name, values in data.lists()}
+    payload = json.dumps(
+        [request.method, request.get_full_path(), data],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _in_progress() -> Response:
+    return Response(
+        {'message': 'Conflit', 'detail': "Une requête avec cette clé d'idempotence est en cours."},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+def _replay(record, digest) -> Response:
+    if record is not None and record.fingerprint != digest:
+        return Response(
+            {
+                'message': 'Validation echouee',
+                'detail': "La clé d'idempotence a déjà été utilisée pour une autre requête.",
+            },
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record is None or record.response_status is None:
+        # Clé purgée entre-temps, ou insérée hors transaction : le client renvoie la requête.
+        return _in_progress()
+    return Response(record.response_body, status=record.response_status, headers={REPLAY_HEADER: 'true'})
+
+
+def _exception_response(request, exc) -> Response:
+    """
+    Réponse de la vue pour une exception levée par l'action (gestionnaire
+    d'exceptions DRF) ; les exceptions non gérées sont relancées.
+    """
+    view = request.parser_context.get('view')
+    if view is None:
+        raise exc
+    return view.handle_exception(exc)
+
+
+def execute(request, handler, *args, **kwargs):
+    """
+    Exécute ``handler`` une seule fois par (utilisateur, clé) ; rejoue la
+    réponse enregistrée pour les envois suivants.
+    """
+    key = request.headers.get(HEADER, '').strip()
+    if len(key) > MAX_KEY_LENGTH:
+        return Response(
+            {
+                'message': 'Validation echouee',
+                'detail': f"L'en-tête {HEADER} ne doit pas dépasser {MAX_KEY_LENGTH} caractères.",
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    digest = fingerprint(request)
+    now = timezone.now()
+    ttl = timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400))
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.filter(user=request.user, key=key, expires_at__lte=now).delete()
+                record = IdempotencyKey.objects.create(
+                    user=request.user,
+                    key=key,
+                    fingerprint=digest,
+                    method=request.method,
+                    path=request.get_full_path()[:500],
+                    expires_at=now + ttl,
+                )
+        except IntegrityError:
+            return _replay(IdempotencyKey.objects.filter(user=request.user, key=key).first(), digest)
+        except OperationalError:
+            # SQLite : base verrouillée par l'exécution concurrente (voir l'en-tête du module).
+            return _in_progress()
+
+        try:
+            with transaction.atomic():
+                response = handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = _exception_response(request, exc)
+        if not isinstance(response, Response) or response.status_code >= 500:
+            # Ni la clé ni les effets de l'action ne sont conservés.
+            transaction.set_rollback(True)
+            return response
+        record.response_status = response.status_code
+        record.response_body = response.data
+        record.save(update_fields=['response_status', 'response_body'])
+    return response
+
+
+def purge_expired(batch_size: int = 1000) -> int:
+    """
+    Supprime les clés expirées par lots ; retourne le nombre de clés supprimées.
+    """
+    deleted = 0
+    while True:
+        pks = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
@@ -0,0 +1,146 @@
+"""
+Import de bons de commande et de leurs documents (commande
+``import_bons_commande``).
+
+Le fichier JSON liste des bons de commande désignant leurs relations par
+leurs références métier (numéro de demande, code fournisseur, code
+département, code ISO de devise, login du rédacteur) et, pour chacun, les
+documents joints (fichiers relatifs au fichier d'import). Tout le fichier est
+validé avant écriture, les références étant résolues en une requête par
+modèle. Les entrées sont ensuite créées par lots (``bulk_create_numbered``),
+chaque lot dans sa transaction : les numéros manquants sont pris dans un
+seul bloc de séquence par lot et par type, et les numéros fournis relèvent
+d'abord la séquence de leur année.
+"""
+import os
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.core.files import File
+from django.db import transaction
+
+from . import sequences
+from .models import BonCommande, Demande, Departement, Devise, Document, Fournisseur, Utilisateur
+from .signals import post_bulk_create
+
+# Clé du fichier -> (champ du bon de commande, modèle référencé, champ de recherche).
+REFERENCES = {
+    'demande': ('id_demande', Demande, 'numero_demande'),
+    'fournisseur': ('id_fournisseur', Fournisseur, 'code_fournisseur'),
+    'departement': ('id_departement', Departement, 'code'),
+    'devise': ('id_devise', Devise, 'code_iso'),
+    'redacteur': ('id_redacteur', Utilisateur, 'login'),
+}
+DECIMAL_FIELDS = ('tva', 'remise', 'montant_engage')
+DOCUMENT_FIELDS = ('type_document', 'titre', 'description')
+DEFAULT_BATCH_SIZE = 500
+
+
+class ImportInvalide(ValueError):
+    """
+    Fichier d'import refusé ; ``errors`` liste les problèmes par entrée.
+    """
+
+    def __init__(self, errors):
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+
+def _resolve(entries) -> dict:
+    resolved = {}
+    for key, (_, model, lookup) in REFERENCES.items():
+        values = {entry.get(key) for entry in entries if entry.get(key)}
+        queryset = model.objects.filter(**{f'{lookup}__in': values}) if values else []
+        resolved[key] = {getattr(instance, lookup): instance for instance in queryset}
+    return resolved
+
+
+def _bon_commande(index, entry, resolved, errors):
+    fields = {}
+    for key, (field, _, _) in REFERENCES.items():
+        instance = resolved[key].get(entry.get(key))
+        if instance is None:
+            errors.append(f"#{index}: {key} introuvable ({entry.get(key)!r}).")
+        else:
+            fields[field] = instance
+    for name in DECIMAL_FIELDS:
+        if entry.get(name) in (None, ''):
+            continue
+        try:
+            fields[name] = Decimal(str(entry[name]))
+        except InvalidOperation:
+            errors.append(f"#{index}: {name} invalide ({entry[name]!r}).")
+    numero = (entry.get('numero_bc') or '').strip()
+    if numero and not sequences.BON_COMMANDE_PATTERN.match(numero):
+        errors.append(f"#{index}: numero_bc invalide ({numero!r}).")
+    return BonCommande(numero_bc=numero, id_ligne_budgetaire=entry.get('id_ligne_budgetaire') or None, **fields)
+
+
+def _documents(index, entry, base_dir, redacteur, errors) -> list:
+    documents = []
+    for document in entry.get('documents') or []:
+        path = os.path.join(base_dir, document.get('fichier') or '')
+        if not document.get('type_document') or not os.path.isfile(path):
+            errors.append(f"#{index}: document invalide ({document.get('fichier')!r}).")
+            continue
+        documents.append(
+            (Document(id_utilisateur=redacteur, **{name: document.get(name) or '' for name in DOCUMENT_FIELDS}), path)
+        )
+    return documents
+
+
+def parse_bons_commande(entries, base_dir: str) -> list:
+    """
+    [(bon de commande, [(document, chemin du fichier)])] non enregistrés ;
+    lève ``ImportInvalide`` si une entrée est invalide.
+    """
+    errors = []
+    resolved = _resolve(entries)
+    parsed = []
+    for index, entry in enumerate(entries, start=1):
+        bc = _bon_commande(index, entry, resolved, errors)
+        parsed.append((bc, _documents(index, entry, base_dir, getattr(bc, 'id_redacteur', None), errors)))
+    numeros = [bc.numero_bc for bc, _ in parsed if bc.numero_bc]
+    duplicates = {numero for numero in numeros if numeros.count(numero) > 1}
+    duplicates |= set(BonCommande.objects.filter(numero_bc__in=numeros).values_list('numero_bc', flat=True))
+    errors.extend(f"numero_bc déjà utilisé : {numero}." for numero in sorted(duplicates))
+    if errors:
+        raise ImportInvalide(errors)
+    return parsed
+
+
+def _create_batch(batch) -> tuple:
+    explicit = defaultdict(int)
+    for bc, _ in batch:
+        match = sequences.BON_COMMANDE_PATTERN.match(bc.numero_bc)
+        if match:
+            key = (sequences.BON_COMMANDE, match.group(2))
+            explicit[key] = max(explicit[key], int(match.group(1)))
+    with transaction.atomic():
+        sequences.ensure_at_least(explicit)
+        bons = BonCommande.bulk_create_numbered([bc for bc, _ in batch])
+        attachments = [(bc, document, path) for bc, (_, documents) in zip(bons, batch) for document, path in documents]
+        for _, document, path in attachments:
+            with open(path, 'rb') as handle:
+                document.chemin_fichier.save(os.path.basename(path), File(handle), save=False)
+        documents = Document.bulk_create_numbered([document for _, document, _ in attachments])
+        through = BonCommande.documents.through
+        links = through.objects.bulk_create(
+            [through(boncommande=bc, document=document) for bc, document, _ in attachments]
+        )
+        post_bulk_create.send(sender=through, instances=links)
+    return bons, documents
+
+
+def import_bons_commande(entries, base_dir: str, batch_size: int = DEFAULT_BATCH_SIZE) -> tuple:
+    """
+    Importe les bons de commande du fichier ; retourne (nombre de bons de
+    commande, nombre de documents) créés.
+    """
+    parsed = parse_bons_commande(entries, base_dir)
+    created_bons = created_documents = 0
+    for start in range(0, len(parsed), batch_size):
+        bons, documents = _create_batch(parsed[start:start + batch_size])
+        created_bons += len(bons)
+        created_documents += len(documents)
+    return created_bons, created_documents
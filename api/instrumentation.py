@@ -0,0 +1,163 @@
+"""
+Instrumentation des requêtes : nombre de requêtes SQL, temps base de données,
+temps de sérialisation, durée totale et taille de réponse par vue/action.
+
+``RequestInstrumentationMiddleware`` collecte les mesures, les expose dans
+l'en-tête ``Server-Timing`` et journalise (logger ``api.performance``) les
+requêtes qui dépassent les budgets définis par ``REQUEST_BUDGETS``.
+``InstrumentedViewMixin`` ajoute le temps passé dans ``to_representation``.
+Chaque requête alimente également le registre de ``api.metrics``.
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import record_request
+
+logger = logging.getLogger('api.performance')
+
+BUDGET_KEYS = ('queries', 'db_ms', 'serializer_ms', 'total_ms', 'response_bytes')
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.view = ''
+        self.queries = 0
+        self.db_ms = 0.0
+        self.serializer_ms = 0.0
+        self.total_ms = 0.0
+        self.response_bytes = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # Utilisé comme connection.execute_wrapper.
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_ms += (time.perf_counter() - start) * 1000
+
+    def as_dict(self) -> dict:
+        return {
+            'view': self.view,
+            'queries': self.queries,
+            'db_ms': round(self.db_ms, 2),
+            'serializer_ms': round(self.serializer_ms, 2),
+            'total_ms': round(self.total_ms, 2),
+            'response_bytes': self.response_bytes,
+        }
+
+    def server_timing(self) -> str:
+        return ', '.join(
+            [
+                f'db;dur={self.db_ms:.2f};desc="{self.queries} queries"',
+                f'ser;dur={self.serializer_ms:.2f}',
+                f'total;dur={self.total_ms:.2f}',
+            ]
+        )
+
+
+def view_key(view_func, method: str) -> str:
+    """
+    Identifiant ``Classe.action`` d'une vue (ex. ``BonCommandeViewSet.list``).
+    """
+    cls = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if cls is None:
+        return getattr(view_func, '__name__', '')
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get((method or '').lower()) or (method or '').lower()
+    return f'{cls.__name__}.{action}'
+
+
+def resolve_budget(key: str, budgets=None) -> dict:
+    """
+    Budget applicable à une vue : valeurs ``default`` surchargées par l'entrée
+    ``Classe.action`` puis ``Classe``.
+    """
+    budgets = getattr(settings, 'REQUEST_BUDGETS', {}) if budgets is None else budgets
+    budget = dict(budgets.get('default', {}))
+    budget.update(budgets.get(key.split('.', 1)[0], {}))
+    budget.update(budgets.get(key, {}))
+    return budget
+
+
+def budget_violations(metrics: RequestMetrics, budget: dict) -> list:
+    values = metrics.as_dict()
+    violations = []
+    for name in BUDGET_KEYS:
+        limit = budget.get(name)
+        value = values.get(name)
+        if limit is not None and value is not None and value > limit:
+            violations.append(f'{name}={value} > {limit}')
+    return violations
+
+
+def get_request_metrics(request):
+    request = getattr(request, '_request', request)
+    return getattr(request, 'request_metrics', None)
+
+
+class RequestInstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'REQUEST_INSTRUMENTATION', True):
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        request.request_metrics = metrics
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+        metrics.total_ms = (time.perf_counter() - start) * 1000
+        if not getattr(response, 'streaming', False):
+            metrics.response_bytes = len(response.content)
+        response.request_metrics = metrics
+        record_request(metrics.view, request.method, response.status_code, metrics.total_ms / 1000, metrics.queries)
+
+        if getattr(settings, 'REQUEST_INSTRUMENTATION_HEADERS', True):
+            response['Server-Timing'] = metrics.server_timing()
+        violations = budget_violations(metrics, resolve_budget(metrics.view))
+        if violations:
+            logger.warning(
+                'Budget dépassé pour %s %s (%s): %s',
+                request.method,
+                request.path,
+                metrics.view or '-',
+                ', '.join(violations),
+                extra={'request_metrics': metrics.as_dict()},
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = getattr(request, 'request_metrics', None)
+        if metrics is not None:
+            metrics.view = view_key(view_func, request.method)
+        return None
+
+
+class InstrumentedViewMixin:
+    """
+    Mesure le temps de ``to_representation`` des serializers de la vue.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        metrics = get_request_metrics(getattr(self, 'request', None))
+        if metrics is not None:
+            to_representation = serializer.to_representation
+
+            def timed_to_representation(instance):
+                start = time.perf_counter()
+                try:
+                    return to_representation(instance)
+                finally:
+                    metrics.serializer_ms += (time.perf_counter() - start) * 1000
+
+            serializer.to_representation = timed_to_representation
+        return serializer
@@ -0,0 +1,43 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.imports import DEFAULT_BATCH_SIZE, ImportInvalide, import_bons_commande
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe des bons de commande et leurs documents depuis un fichier JSON "
+        "(numéros pris par blocs de séquence, un bloc par lot)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "fichier",
+            help="Fichier JSON : liste de bons de commande (chemins des documents relatifs à ce fichier).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Nombre de bons de commande créés par lot (défaut : {DEFAULT_BATCH_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["fichier"]
+        try:
+            with open(path, encoding="utf-8") as handle:
+                entries = json.load(handle)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Fichier illisible : {exc}") from exc
+        if not isinstance(entries, list):
+            raise CommandError("Le fichier doit contenir une liste de bons de commande.")
+
+        try:
+            bons, documents = import_bons_commande(
+                entries, os.path.dirname(os.path.abspath(path)), batch_size=options["batch_size"]
+            )
+        except ImportInvalide as exc:
+            raise CommandError(f"Import refusé :\n{exc}") from exc
+        self.stdout.write(self.style.SUCCESS(f"{bons} bon(s) de commande et {documents} document(s) importé(s)."))
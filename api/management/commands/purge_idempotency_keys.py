@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Supprime les clés d'idempotence expirées (réponses enregistrées des actions idempotentes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Nombre de clés supprimées par lot (défaut : 1000).",
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} clé(s) d'idempotence expirée(s) supprimée(s)."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from api.budget import reconcile_lignes
+
+
+class Command(BaseCommand):
+    help = "Recalcule les montants engagés des lignes budgétaires depuis les bons de commande et régularise les écarts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Affiche les écarts sans modifier les lignes budgétaires.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        differences = reconcile_lignes(dry_run=dry_run)
+        for code, engage, engage_attendu, reste, reste_attendu in differences:
+            self.stdout.write(f"{code}: engagé {engage} -> {engage_attendu}, reste {reste} -> {reste_attendu}")
+        if not differences:
+            self.stdout.write(self.style.SUCCESS("Lignes budgétaires à jour, aucun écart."))
+        elif dry_run:
+            self.stdout.write(self.style.WARNING(f"{len(differences)} écart(s) détecté(s) (dry-run)."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(differences)} écart(s) corrigé(s)."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from api.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs matérialisés du tableau de bord et corrige les écarts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Affiche les écarts sans modifier les compteurs.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        differences = reconcile_counters(dry_run=dry_run)
+        for metric, departement_id, statut, stored, expected in differences:
+            scope = departement_id or "global"
+            self.stdout.write(f"{metric} [{scope}/{statut}]: {stored} -> {expected}")
+        if not differences:
+            self.stdout.write(self.style.SUCCESS("Compteurs à jour, aucun écart."))
+        elif dry_run:
+            self.stdout.write(self.style.WARNING(f"{len(differences)} écart(s) détecté(s) (dry-run)."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(differences)} écart(s) corrigé(s)."))
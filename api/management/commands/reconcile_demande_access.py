@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from api.access import reconcile_access
+
+
+class Command(BaseCommand):
+    help = "Recalcule la table d'accès des demandes et transferts et corrige les écarts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Affiche les écarts sans modifier la table d'accès.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        missing, stale = reconcile_access(dry_run=dry_run)
+        if not missing and not stale:
+            self.stdout.write(self.style.SUCCESS("Table d'accès à jour, aucun écart."))
+            return
+        summary = f"{missing} ligne(s) manquante(s), {stale} ligne(s) obsolète(s)"
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"{summary} (dry-run)."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{summary} corrigée(s)."))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from api.engagements import drifted, repair_montant_engage
+from api.models import BonCommande
+
+
+class Command(BaseCommand):
+    help = "Recalcule le montant engagé des bons de commande (SQL, par lots) et corrige les écarts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Nombre de bons de commande traités par lot (défaut : 500).",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Signale les écarts entre montant stocké et montant calculé sans rien modifier.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Nombre d'écarts détaillés en mode --check (défaut : 20).",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            queryset = drifted(BonCommande.objects.all())
+            count = queryset.count()
+            rows = queryset.order_by("-ecart").values_list("numero_bc", "montant_engage", "montant_engage_calcule")
+            for numero, stored, expected in rows[: options["limit"]]:
+                self.stdout.write(f"{numero}: {stored} -> {expected}")
+            if count:
+                self.stdout.write(self.style.WARNING(f"{count} bon(s) de commande en écart."))
+            else:
+                self.stdout.write(self.style.SUCCESS("Montants engagés à jour, aucun écart."))
+            return
+
+        repaired = repair_montant_engage(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{repaired} bon(s) de commande corrigé(s)."))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from api.facturation import drifted, repair_totaux
+from api.models import BonCommande
+
+
+class Command(BaseCommand):
+    help = "Recalcule les totaux facturés et payés des bons de commande (SQL, par lots) et corrige les écarts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Nombre de bons de commande traités par lot (défaut : 500).",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Signale les écarts entre totaux stockés et totaux calculés sans rien modifier.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Nombre d'écarts détaillés en mode --check (défaut : 20).",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            queryset = drifted(BonCommande.objects.all())
+            count = queryset.count()
+            rows = queryset.order_by("numero_bc").values_list(
+                "numero_bc", "total_facture", "total_facture_calcule", "total_paye", "total_paye_calcule"
+            )
+            for numero, facture, facture_calcule, paye, paye_calcule in rows[: options["limit"]]:
+                self.stdout.write(f"{numero}: facturé {facture} -> {facture_calcule}, payé {paye} -> {paye_calcule}")
+            if count:
+                self.stdout.write(self.style.WARNING(f"{count} bon(s) de commande en écart."))
+            else:
+                self.stdout.write(self.style.SUCCESS("Totaux à jour, aucun écart."))
+            return
+
+        repaired = repair_totaux(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{repaired} bon(s) de commande corrigé(s)."))
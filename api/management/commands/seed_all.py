@@ -243,8 +243,6 @@ class Command(BaseCommand):
                 "id_departement": dep_map["DAA"],
                 "id_devise": devise_map["XAF"],
                 "montant_budget": Decimal("100000000"),
-                "montant_engage": Decimal("0"),
-                "montant_reste": Decimal("100000000"),
             },
         )[0]
         lb2 = LigneBudgetaire.objects.update_or_create(
@@ -257,8 +255,6 @@ class Command(BaseCommand):
                 "id_departement": dep_map["DSI"],
                 "id_devise": devise_map["XAF"],
                 "montant_budget": Decimal("80000000"),
-                "montant_engage": Decimal("0"),
-                "montant_reste": Decimal("80000000"),
             },
         )[0]
         lb3 = LigneBudgetaire.objects.update_or_create(
@@ -271,8 +267,6 @@ class Command(BaseCommand):
                 "id_departement": dep_map["DPT"],
                 "id_devise": devise_map["XAF"],
                 "montant_budget": Decimal("50000000"),
-                "montant_engage": Decimal("0"),
-                "montant_reste": Decimal("50000000"),
             },
         )[0]
 
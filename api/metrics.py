@@ -0,0 +1,268 @@
+"""
+Registre de métriques en mémoire (compteurs, jauges, histogrammes) exposé au
+format texte Prometheus.
+
+Avec plusieurs workers gunicorn, chaque processus écrit périodiquement un
+instantané de ses métriques (jauges rafraîchies) dans ``METRICS_MULTIPROC_DIR``
+(un fichier par pid) ; l'endpoint ``/metrics/`` agrège tous les fichiers :
+compteurs et histogrammes sont additionnés, les jauges ne sont additionnées
+que pour les processus encore actifs. Les fichiers des workers arrêtés sont
+reportés dans ``archive.json`` puis supprimés : les compteurs restent
+monotones sans accumuler un fichier par pid. Vider le répertoire au démarrage
+du serveur remet les compteurs à zéro.
+"""
+import atexit
+import contextlib
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+ARCHIVE_FILE = 'archive.json'
+LOCK_FILE = '.lock'
+
+METRICS = {
+    'sgbc_http_requests_total': (COUNTER, 'Nombre de requêtes HTTP traitées.'),
+    'sgbc_http_request_duration_seconds': (HISTOGRAM, 'Durée de traitement des requêtes HTTP.'),
+    'sgbc_http_request_db_queries': (HISTOGRAM, 'Nombre de requêtes SQL par requête HTTP.'),
+    'sgbc_audit_queue_depth': (GAUGE, "Entrées d'audit en attente d'écriture."),
+    'sgbc_audit_entries_dropped_total': (COUNTER, "Entrées d'audit abandonnées (file pleine)."),
+    'sgbc_audit_entries_failed_total': (COUNTER, "Entrées d'audit en échec d'écriture."),
+}
+BUCKETS = {
+    'sgbc_http_request_duration_seconds': LATENCY_BUCKETS,
+    'sgbc_http_request_db_queries': QUERY_BUCKETS,
+}
+
+
+def _labels_key(labels: dict) -> str:
+    return json.dumps(sorted(labels.items()), separators=(',', ':'))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._last_dump = 0.0
+
+    def inc(self, name: str, labels: dict, amount: float = 1) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, labels: dict, value: float) -> None:
+        with self._lock:
+            self._values.setdefault(name, {})[_labels_key(labels)] = value
+
+    def observe(self, name: str, labels: dict, value: float) -> None:
+        buckets = BUCKETS[name]
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return json.loads(json.dumps(self._values))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values = {}
+            self._last_dump = 0.0
+
+    def dump(self, force: bool = False) -> None:
+        """
+        Écrit l'instantané du processus dans le répertoire partagé (si configuré),
+        au plus une fois par ``METRICS_FLUSH_INTERVAL`` sauf si ``force``.
+        """
+        directory = _multiproc_dir()
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_dump < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0):
+            return
+        self._last_dump = now
+        _collect_gauges()
+        _write(directory, f'metrics_{os.getpid()}.json', {'pid': os.getpid(), 'values': self.snapshot()})
+
+
+def _multiproc_dir():
+    directory = getattr(settings, 'METRICS_MULTIPROC_DIR', '')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _read(path):
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(directory: str, name: str, payload: dict) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics_')
+    with os.fdopen(fd, 'w') as handle:
+        json.dump(payload, handle)
+    os.replace(tmp_path, os.path.join(directory, name))
+
+
+@contextlib.contextmanager
+def _locked(directory: str):
+    """
+    Verrou exclusif entre processus sur le répertoire partagé (archivage).
+    """
+    import fcntl  # Workers gunicorn : plateformes POSIX uniquement.
+
+    with open(os.path.join(directory, LOCK_FILE), 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = MetricsRegistry()
+atexit.register(lambda: registry.dump(force=True))
+
+
+def record_request(view: str, method: str, status: int, duration: float, queries: int) -> None:
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        return
+    view_name, _, action = (view or 'unmatched').partition('.')
+    labels = {'view': view_name, 'action': action or (method or '').lower()}
+    registry.inc('sgbc_http_requests_total', {**labels, 'method': method, 'status': str(status)})
+    registry.observe('sgbc_http_request_duration_seconds', labels, duration)
+    registry.observe('sgbc_http_request_db_queries', labels, queries)
+    registry.dump()
+
+
+def _collect_gauges() -> None:
+    from .audit_writer import audit_queue_stats
+
+    stats = audit_queue_stats()
+    registry.set('sgbc_audit_queue_depth', {}, stats['queue_depth'])
+    # Totaux cumulés du processus : compteurs (additionnés entre workers, archivés à leur arrêt).
+    registry.set('sgbc_audit_entries_dropped_total', {}, stats['dropped'])
+    registry.set('sgbc_audit_entries_failed_total', {}, stats['failed'])
+
+
+def _merge(total: dict, values: dict, include_gauges: bool) -> None:
+    for name, series in values.items():
+        kind = METRICS.get(name, (None,))[0]
+        if kind is None or (kind == GAUGE and not include_gauges):
+            continue
+        merged = total.setdefault(name, {})
+        for key, value in series.items():
+            if kind == HISTOGRAM:
+                current = merged.setdefault(key, {'buckets': [0] * len(value['buckets']), 'sum': 0.0, 'count': 0})
+                current['buckets'] = [a + b for a, b in zip(current['buckets'], value['buckets'])]
+                current['sum'] += value['sum']
+                current['count'] += value['count']
+            else:
+                merged[key] = merged.get(key, 0) + value
+
+
+def collect() -> dict:
+    """
+    Retourne les valeurs agrégées de tous les processus (ou du seul processus
+    courant). Les fichiers des processus arrêtés sont archivés au passage.
+    """
+    directory = _multiproc_dir()
+    if not directory:
+        _collect_gauges()
+        return registry.snapshot()
+    registry.dump(force=True)
+    with _locked(directory):
+        archive = (_read(os.path.join(directory, ARCHIVE_FILE)) or {}).get('values', {})
+        total, dead = {}, []
+        _merge(total, archive, include_gauges=False)
+        for path in glob.glob(os.path.join(directory, 'metrics_*.json')):
+            data = _read(path)
+            if data is None:
+                continue
+            alive = _pid_alive(int(data.get('pid', 0)))
+            _merge(total, data.get('values', {}), include_gauges=alive)
+            if not alive:
+                _merge(archive, data.get('values', {}), include_gauges=False)
+                dead.append(path)
+        if dead:
+            _write(directory, ARCHIVE_FILE, {'values': archive})
+            for path in dead:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+    return total
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels:
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{escaped}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_number(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def render_prometheus(values=None) -> str:
+    values = collect() if values is None else values
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        series = values.get(name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for key in sorted(series):
+            labels = [tuple(item) for item in json.loads(key)]
+            value = series[key]
+            if kind != HISTOGRAM:
+                lines.append(f'{name}{_format_labels(labels)} {_format_number(value)}')
+                continue
+            for bound, count in zip(BUCKETS[name], value['buckets']):
+                le = _format_number(float(bound))
+                lines.append(f'{name}_bucket{_format_labels(labels + [("le", le)])} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels + [("le", "+Inf")])} {value["count"]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(round(value["sum"], 6))}')
+            lines.append(f'{name}_count{_format_labels(labels)} {value["count"]}')
+    return '\n'.join(lines) + '\n'
@@ -2,20 +2,33 @@ from typing import Optional
 
 from django.utils.deprecation import MiddlewareMixin
 
-from .auth_utils import get_client_ip, log_audit
+from .audit_policy import resolve_http_policy
+from .auth_utils import log_audit
 
 
 class AuditAllMiddleware(MiddlewareMixin):
     """
-    Middleware qui journalise chaque requête HTTP entrante (succès ou échec).
+    Middleware qui journalise les requêtes HTTP entrantes (succès ou échec)
+    selon la politique définie par AUDIT_HTTP_POLICIES (échantillonnage,
+    taille maximale de la charge utile conservée).
     """
 
     def process_response(self, request, response):
-        self._log(request, getattr(response, 'status_code', None), details=getattr(response, 'data', None))
+        status = getattr(response, 'status_code', None)
+        try:
+            policy = resolve_http_policy(getattr(request, 'method', ''), getattr(request, 'path', ''))
+            if not policy.should_audit(status):
+                return response
+            details = policy.render_payload(response)
+        except Exception:
+            return response
+        self._log(request, status, details=details)
         return response
 
     def process_exception(self, request, exception):
-        self._log(request, status=None, details=str(exception))
+        policy = resolve_http_policy(getattr(request, 'method', ''), getattr(request, 'path', ''))
+        if policy.should_audit(None):
+            self._log(request, status=None, details=str(exception))
         return None
 
     def _log(self, request, status: Optional[int], details=None):
@@ -29,7 +42,6 @@ class AuditAllMiddleware(MiddlewareMixin):
                 message += f'?{query}'
             if status is not None:
                 message += f' | status={status}'
-            ip = get_client_ip(request)
             log_audit(
                 user,
                 action,
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_alter_auditlog_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='auditlog_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='boncommande',
+            index=models.Index(fields=['-date_creation', '-id'], name='bc_date_creation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demande',
+            index=models.Index(fields=['-date_creation', '-id'], name='demande_date_creation_idx'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:51
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Métriques à la création de la table : (métrique, modèle, chemins des départements, champ de statut).
+COUNTERS = (
+    ('demandes', 'Demande', ('id_departement',), 'statut_demande'),
+    ('bons_commande', 'BonCommande', ('id_departement',), 'statut_bc'),
+    ('lignes_demande', 'LigneDemande', ('id_demande__id_departement',), ''),
+    ('lignes_bc', 'LigneBC', ('id_bc__id_departement',), ''),
+    ('documents', 'Document', ('id_utilisateur__id_departement',), ''),
+    (
+        'transferts',
+        'Transfert',
+        ('departement_source', 'departement_beneficiaire', 'id_demande__id_departement', 'id_bc__id_departement'),
+        '',
+    ),
+    ('factures', 'Facture', ('id_bc__id_departement',), ''),
+    ('paiements', 'Paiement', ('id_facture__id_bc__id_departement',), ''),
+    ('fournisseurs', 'Fournisseur', (), ''),
+    ('articles', 'Article', (), ''),
+    ('devises', 'Devise', (), ''),
+    ('departements', 'Departement', (), ''),
+    ('categories', 'Categorie', (), ''),
+    ('methodes_paiement', 'MethodePaiement', (), ''),
+    ('banques', 'Banque', (), ''),
+    ('fournisseurs_rib', 'FournisseurRIB', (), ''),
+    ('signatures_numeriques', 'SignatureNumerique', (), ''),
+    ('signatures_bc', 'SignatureBC', (), ''),
+    ('lignes_budgetaires', 'LigneBudgetaire', (), ''),
+)
+
+
+def backfill_counters(apps, schema_editor):
+    # Copie figée de ``api.counters.compute_counters`` : un objet compte pour la
+    # ligne globale (département NULL) et pour chacun de ses départements.
+    counter_model = apps.get_model('api', 'DashboardCounter')
+    rows = []
+    for metric, model_name, departements, statut in COUNTERS:
+        manager = apps.get_model('api', model_name).objects.order_by()
+        fields = [*departements, *([statut] if statut else [])]
+        keys = Counter()
+        if not fields:
+            keys[(None, '')] = manager.count()
+        else:
+            for values in manager.values_list(*fields).iterator(chunk_size=2000):
+                etat = (values[len(departements)] or '') if statut else ''
+                keys[(None, etat)] += 1
+                for departement_id in {pk for pk in values[: len(departements)] if pk is not None}:
+                    keys[(departement_id, etat)] += 1
+        rows += [
+            counter_model(metric=metric, departement_id=departement_id, statut=etat, valeur=total)
+            for (departement_id, etat), total in keys.items()
+            if total
+        ]
+    counter_model.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50)),
+                ('statut', models.CharField(blank=True, default='', max_length=20)),
+                ('valeur', models.BigIntegerField(default=0)),
+                ('date_modification', models.DateTimeField(auto_now=True)),
+                ('departement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='compteurs', to='api.departement')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('departement__isnull', False)), fields=('metric', 'departement', 'statut'), name='unique_dashboard_counter_departement'), models.UniqueConstraint(condition=models.Q(('departement__isnull', True)), fields=('metric', 'statut'), name='unique_dashboard_counter_global')],
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
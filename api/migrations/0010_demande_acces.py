@@ -0,0 +1,66 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+TRANSFERT_DEPARTEMENT_FIELDS = (
+    'departement_source_id',
+    'departement_beneficiaire_id',
+    'id_demande__id_departement_id',
+    'id_bc__id_departement_id',
+)
+
+
+def backfill_access(apps, schema_editor):
+    # Copie figée de ``api.access.expected_access`` (la table est vide).
+    acces_model = apps.get_model('api', 'DemandeAcces')
+    demande_model = apps.get_model('api', 'Demande')
+    rows = [
+        acces_model(departement_id=departement_id, demande_id=pk)
+        for pk, departement_id in demande_model.objects.exclude(id_departement__isnull=True).values_list(
+            'pk', 'id_departement_id'
+        )
+    ]
+    through = demande_model.utilisateurs_transferts.through
+    m2m_field = demande_model._meta.get_field('utilisateurs_transferts')
+    rows += [
+        acces_model(utilisateur_id=user_id, demande_id=demande_id)
+        for user_id, demande_id in through.objects.values_list(
+            m2m_field.m2m_reverse_field_name(), m2m_field.m2m_field_name()
+        )
+    ]
+    for pk, *departements in apps.get_model('api', 'Transfert').objects.values_list(
+        'pk', *TRANSFERT_DEPARTEMENT_FIELDS
+    ):
+        rows += [
+            acces_model(departement_id=departement_id, transfert_id=pk)
+            for departement_id in set(departements)
+            if departement_id
+        ]
+    acces_model.objects.bulk_create(rows, batch_size=2000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_dashboard_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandeAcces',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('demande', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='acces', to='api.demande')),
+                ('departement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='acces_demandes', to='api.departement')),
+                ('transfert', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='acces', to='api.transfert')),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='acces_demandes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('demande__isnull', False), ('departement__isnull', False)), fields=('departement', 'demande'), name='unique_acces_departement_demande'), models.UniqueConstraint(condition=models.Q(('demande__isnull', False), ('utilisateur__isnull', False)), fields=('utilisateur', 'demande'), name='unique_acces_utilisateur_demande'), models.UniqueConstraint(condition=models.Q(('departement__isnull', False), ('transfert__isnull', False)), fields=('departement', 'transfert'), name='unique_acces_departement_transfert')],
+            },
+        ),
+        migrations.RunPython(backfill_access, migrations.RunPython.noop),
+    ]
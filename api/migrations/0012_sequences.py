@@ -0,0 +1,79 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:06
+
+import re
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+DEMANDE_PATTERN = re.compile(r'DM/NUM(\d+)/(\d{4})/')
+BON_COMMANDE_PATTERN = re.compile(r'^BC/NUM(\d+)/DAA/DG/(\d{4})$')
+DEPARTEMENT_PATTERN = re.compile(r'^(.*?)(?:-(\d+))?$')
+
+
+def backfill_sequences(apps, schema_editor):
+    # Copie figée de ``api.sequences.existing_values`` : reprend les compteurs
+    # des anciennes tables puis les numéros déjà attribués.
+    values = defaultdict(int)
+
+    def keep(name, scope, value):
+        values[(name, scope)] = max(values[(name, scope)], value)
+
+    for year, last_sequence in apps.get_model('api', 'BonCommandeSequence').objects.values_list('year', 'last_sequence'):
+        keep('bon_commande', str(year), last_sequence)
+    for last_sequence in apps.get_model('api', 'DocumentSequence').objects.values_list('last_sequence', flat=True):
+        keep('document', '', last_sequence)
+    for numero in apps.get_model('api', 'Demande').objects.values_list('numero_demande', flat=True).iterator():
+        match = DEMANDE_PATTERN.search(numero or '')
+        if match:
+            keep('demande', match.group(2), int(match.group(1)))
+    for numero in apps.get_model('api', 'BonCommande').objects.values_list('numero_bc', flat=True).iterator():
+        match = BON_COMMANDE_PATTERN.match(numero or '')
+        if match:
+            keep('bon_commande', match.group(2), int(match.group(1)))
+    last_code = apps.get_model('api', 'Document').objects.aggregate(last=Max('code'))['last']
+    if last_code:
+        keep('document', '', last_code)
+    for code in apps.get_model('api', 'Departement').objects.values_list('code', flat=True).iterator():
+        base, suffix = DEPARTEMENT_PATTERN.match(code or '').groups()
+        # Le premier code d'un sigle n'a pas de suffixe (ex. DG, puis DG-02).
+        keep('departement', base, int(suffix) if suffix else 1)
+    sequence_model = apps.get_model('api', 'Sequence')
+    sequence_model.objects.bulk_create(
+        [sequence_model(name=name, scope=scope, last_sequence=value) for (name, scope), value in values.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_utilisateur_token_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('scope', models.CharField(blank=True, default='', max_length=100)),
+                ('last_sequence', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Séquence',
+                'verbose_name_plural': 'Séquences',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sequence',
+            constraint=models.UniqueConstraint(fields=('name', 'scope'), name='unique_sequence_scope'),
+        ),
+        migrations.RunPython(backfill_sequences, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='BonCommandeSequence',
+        ),
+        migrations.DeleteModel(
+            name='DocumentSequence',
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:18
+
+import uuid
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Q
+
+
+def _as_uuid(value):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def backfill_ledger(apps, schema_editor):
+    # Copie figée de ``api.budget.reconcile_lignes`` : un mouvement de reprise
+    # par ligne dont le montant engagé diffère des bons de commande.
+    ligne_model = apps.get_model('api', 'LigneBudgetaire')
+    mouvement_model = apps.get_model('api', 'MouvementBudgetaire')
+    by_reference = defaultdict(Decimal)
+    rows = (
+        apps.get_model('api', 'BonCommande')
+        .objects.exclude(Q(id_ligne_budgetaire__isnull=True) | Q(id_ligne_budgetaire=''))
+        .values_list('id_ligne_budgetaire', 'montant_engage')
+    )
+    for reference, value in rows.iterator(chunk_size=2000):
+        by_reference[reference] += Decimal(value or 0).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+    # Une référence désigne une ligne par son code, à défaut par son identifiant.
+    lignes = {}
+    for pk, code in ligne_model.objects.values_list('pk', 'code_ligne'):
+        lignes[pk] = pk
+        lignes.setdefault(code, pk)
+    expected = defaultdict(Decimal)
+    for reference, value in by_reference.items():
+        ligne_id = lignes.get(reference, lignes.get(_as_uuid(reference)))
+        if ligne_id is not None:
+            expected[ligne_id] += value
+
+    mouvements = []
+    for pk, engage in ligne_model.objects.values_list('pk', 'montant_engage'):
+        delta = expected.get(pk, Decimal('0')) - engage
+        if delta:
+            mouvements.append(
+                mouvement_model(
+                    id_ligne_budgetaire_id=pk,
+                    type_mouvement='engagement' if delta > 0 else 'desengagement',
+                    motif='reprise',
+                    montant=delta,
+                )
+            )
+            ligne_model.objects.filter(pk=pk).update(montant_engage=F('montant_engage') + delta)
+    mouvement_model.objects.bulk_create(mouvements, batch_size=500)
+    ligne_model.objects.exclude(montant_reste=F('montant_budget') - F('montant_engage')).update(
+        montant_reste=F('montant_budget') - F('montant_engage')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_sequences'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MouvementBudgetaire',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('numero_bc', models.CharField(blank=True, max_length=100)),
+                ('type_mouvement', models.CharField(choices=[('engagement', 'Engagement'), ('desengagement', 'Désengagement')], max_length=20)),
+                ('motif', models.CharField(choices=[('creation', 'Création du bon de commande'), ('modification', 'Modification du montant engagé'), ('changement_ligne', 'Changement de ligne budgétaire'), ('suppression', 'Suppression du bon de commande'), ('reprise', 'Reprise / régularisation')], max_length=20)),
+                ('montant', models.DecimalField(decimal_places=2, max_digits=18)),
+                ('date_mouvement', models.DateTimeField(auto_now_add=True)),
+                ('id_bc', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mouvements_budgetaires', to='api.boncommande')),
+                ('id_ligne_budgetaire', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mouvements', to='api.lignebudgetaire')),
+            ],
+            options={
+                'verbose_name': 'Mouvement budgétaire',
+                'verbose_name_plural': 'Mouvements budgétaires',
+                'ordering': ['-date_mouvement'],
+                'indexes': [models.Index(fields=['id_ligne_budgetaire', '-date_mouvement'], name='mouvement_ligne_date_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
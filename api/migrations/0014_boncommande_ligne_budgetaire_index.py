@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_budget_ledger'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='boncommande',
+            name='id_ligne_budgetaire',
+            field=models.CharField(blank=True, db_column='id_ligne_budgetaire_id', db_index=True, max_length=100, null=True),
+        ),
+    ]
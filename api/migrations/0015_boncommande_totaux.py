@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:23
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totaux(apps, schema_editor):
+    # Copie figée de ``api.facturation.repair_totaux`` (une seule mise à jour :
+    # les deux colonnes viennent d'être créées à 0).
+    money = models.DecimalField(max_digits=18, decimal_places=2)
+    factures = (
+        apps.get_model('api', 'Facture')
+        .objects.filter(id_bc=OuterRef('pk'))
+        .order_by()
+        .values('id_bc')
+        .annotate(total=Sum('montant_ttc'))
+        .values('total')
+    )
+    paiements = (
+        apps.get_model('api', 'Paiement')
+        .objects.filter(id_facture__id_bc=OuterRef('pk'))
+        .order_by()
+        .values('id_facture__id_bc')
+        .annotate(total=Sum('montant'))
+        .values('total')
+    )
+    apps.get_model('api', 'BonCommande').objects.update(
+        total_facture=Coalesce(Subquery(factures, output_field=money), Value(Decimal('0')), output_field=money),
+        total_paye=Coalesce(Subquery(paiements, output_field=money), Value(Decimal('0')), output_field=money),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_boncommande_ligne_budgetaire_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boncommande',
+            name='total_facture',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=18),
+        ),
+        migrations.AddField(
+            model_name='boncommande',
+            name='total_paye',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=18),
+        ),
+        migrations.RunPython(backfill_totaux, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from .base import BaseModel
+from .base import AtomicSaveModel, BaseModel
 from .organisation import Departement, Permission, Role, RolePermission, SignatureUtilisateur, Utilisateur
 from .parametres_financiers import Devise, MethodePaiement
 from .fournisseurs import Categorie, Article, Fournisseur, Banque, FournisseurRIB, TypeArticle
@@ -6,12 +6,17 @@ from .demandes import Demande, LigneDemande
 from .documents import Document, SignatureNumerique
 from .bon_commande import BonCommande, LigneBC, SignatureBC
 from .facturation_paiement import Facture, Paiement
-from .budget import LigneBudgetaire
+from .budget import LigneBudgetaire, MouvementBudgetaire
 from .audit import HistoriqueStatut, AuditLog
 from .transferts import Transfert
 from .security import TwoFactorCode, TwoFactorMethod
+from .dashboard import DashboardCounter
+from .acces import DemandeAcces
+from .sequences import Sequence
+from .idempotency import IdempotencyKey
 
 __all__ = [
+    'AtomicSaveModel',
     'BaseModel',
     'Departement',
     'Role',
@@ -37,9 +42,14 @@ __all__ = [
     'Facture',
     'Paiement',
     'LigneBudgetaire',
+    'MouvementBudgetaire',
     'HistoriqueStatut',
     'AuditLog',
     'Transfert',
     'TwoFactorCode',
     'TwoFactorMethod',
+    'DashboardCounter',
+    'DemandeAcces',
+    'Sequence',
+    'IdempotencyKey',
 ]
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.db import models
+
+
+class DemandeAcces(models.Model):
+    """
+    Droit de lecture matérialisé d'un département ou d'un utilisateur sur une
+    demande ou un transfert (cf. ``filter_demandes_for_user`` et
+    ``filter_transferts_for_user``).
+
+    Lignes tenues à jour par les signaux (``api.access``) :
+    - (département, demande) : département de rattachement de la demande ;
+    - (utilisateur, demande) : demande transférée à l'utilisateur ;
+    - (département, transfert) : départements source, bénéficiaire, de la
+      demande et du BC concernés par le transfert.
+    """
+
+    departement = models.ForeignKey(
+        'Departement',
+        on_delete=models.CASCADE,
+        related_name='acces_demandes',
+        null=True,
+        blank=True,
+    )
+    utilisateur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='acces_demandes',
+        null=True,
+        blank=True,
+    )
+    demande = models.ForeignKey(
+        'Demande',
+        on_delete=models.CASCADE,
+        related_name='acces',
+        null=True,
+        blank=True,
+    )
+    transfert = models.ForeignKey(
+        'Transfert',
+        on_delete=models.CASCADE,
+        related_name='acces',
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['departement', 'demande'],
+                condition=models.Q(departement__isnull=False, demande__isnull=False),
+                name='unique_acces_departement_demande',
+            ),
+            models.UniqueConstraint(
+                fields=['utilisateur', 'demande'],
+                condition=models.Q(utilisateur__isnull=False, demande__isnull=False),
+                name='unique_acces_utilisateur_demande',
+            ),
+            models.UniqueConstraint(
+                fields=['departement', 'transfert'],
+                condition=models.Q(departement__isnull=False, transfert__isnull=False),
+                name='unique_acces_departement_transfert',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        principal = f'departement={self.departement_id}' if self.departement_id else f'utilisateur={self.utilisateur_id}'
+        objet = f'demande={self.demande_id}' if self.demande_id else f'transfert={self.transfert_id}'
+        return f'{principal} -> {objet}'
@@ -2,6 +2,7 @@ import uuid
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class HistoriqueStatut(models.Model):
@@ -36,9 +37,14 @@ class AuditLog(models.Model):
     action = models.CharField(max_length=50)
     type_objet = models.CharField(max_length=50)
     id_objet = models.UUIDField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Horodatage fixé à la création de l'entrée (et non à son écriture différée).
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     ip_client = models.GenericIPAddressField(null=True, blank=True)
     details = models.TextField(blank=True)
 
+    class Meta:
+        # Index de tri utilisé par la pagination par curseur.
+        indexes = [models.Index(fields=['-timestamp', '-id'], name='auditlog_timestamp_idx')]
+
     def __str__(self) -> str:
         return f'{self.action} - {self.type_objet}'
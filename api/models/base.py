@@ -1,6 +1,6 @@
 import uuid
 
-from django.db import models
+from django.db import models, transaction
 
 
 class BaseModel(models.Model):
@@ -14,3 +14,21 @@ class BaseModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class AtomicSaveModel(models.Model):
+    """
+    Abstract base whose ``save()`` runs in a transaction (without savepoint),
+    so the row and the derived state written by its pre_save / post_save
+    receivers (dashboard counters, BC totals, budget ledger, access rows)
+    commit or roll back together. Deletes already get this from Django's
+    collector. Subclasses that write before calling ``super().save()``
+    (sequence numbers) wrap their own ``save()`` the same way.
+    """
+
+    class Meta:
+        abstract = True
+
+    @transaction.atomic(savepoint=False)
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
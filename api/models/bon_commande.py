@@ -1,10 +1,12 @@
-import re
 import uuid
 from datetime import datetime
 
 from django.conf import settings
 from django.db import models, transaction
 
+from .. import sequences
+from .base import AtomicSaveModel
+
 
 class StatutBC(models.TextChoices):
     EN_ATTENTE = ('en_attente', 'En attente')
@@ -17,16 +19,8 @@ class DecisionSignature(models.TextChoices):
     APPROUVE = ('approuve', 'Approuve')
     REFUSE = ('refuse', 'Refuse')
 
-class BonCommandeSequence(models.Model):
-    year = models.PositiveIntegerField(primary_key=True)
-    last_sequence = models.PositiveIntegerField(default=0)
-
-    class Meta:
-        verbose_name = 'Séquence bon de commande'
-        verbose_name_plural = 'Séquences bons de commande'
-
 
-class BonCommande(models.Model):
+class BonCommande(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     numero_bc = models.CharField(max_length=100, unique=True, blank=True)
     id_demande = models.ForeignKey(
@@ -93,7 +87,11 @@ class BonCommande(models.Model):
         null=True,
         blank=True,
         db_column='id_ligne_budgetaire_id',
+        db_index=True,
     )
+    # Totaux des factures (TTC) et des paiements, tenus par api.facturation.
+    total_facture = models.DecimalField(max_digits=18, decimal_places=2, default=0, editable=False)
+    total_paye = models.DecimalField(max_digits=18, decimal_places=2, default=0, editable=False)
     type_achat = models.CharField(max_length=100, blank=True)
     date_bc = models.DateField(null=True, blank=True)
     date_creation = models.DateTimeField(auto_now_add=True)
@@ -120,43 +118,50 @@ class BonCommande(models.Model):
         blank=True,
     )
 
+    class Meta:
+        # Index de tri utilisé par la pagination par curseur.
+        indexes = [models.Index(fields=['-date_creation', '-id'], name='bc_date_creation_idx')]
+
     def __str__(self) -> str:
         return self.numero_bc
 
     @staticmethod
-    def _next_sequence_for_year(year: int) -> int:
-        """
-        Retourne le prochain numéro séquentiel pour l'année donnée en se basant
-        sur la première partie de numero_bc (ex: 82/DAA/DG/2025 -> 82).
-        """
-        existing = BonCommande.objects.filter(numero_bc__endswith=f'/{year}').values_list('numero_bc', flat=True)
-        max_seq = 0
-        for numero in existing:
-            match = re.match(r'^(\\d+)', numero or '')
-            if match:
-                max_seq = max(max_seq, int(match.group(1)))
-        return max_seq + 1
+    def format_numero_bc(seq: int, year: int) -> str:
+        return f'BC/NUM{seq}/DAA/DG/{year}'
 
     @classmethod
     def generate_numero_bc(cls) -> str:
         year = datetime.now().year
-        with transaction.atomic():
-            sequence_obj, _ = BonCommandeSequence.objects.select_for_update().get_or_create(
-                year=year,
-                defaults={'last_sequence': 0},
-            )
-            next_sequence = sequence_obj.last_sequence + 1
-            sequence_obj.last_sequence = next_sequence
-            sequence_obj.save(update_fields=['last_sequence'])
-        return f'BC/NUM{next_sequence}/DAA/DG/{year}'
+        next_sequence = sequences.next_value(sequences.BON_COMMANDE, sequences.year_scope(year))
+        return cls.format_numero_bc(next_sequence, year)
 
+    @classmethod
+    def bulk_create_numbered(cls, bons, batch_size=None) -> list:
+        """
+        Crée des bons de commande en masse ; les numéros manquants sont pris
+        dans un seul bloc de la séquence de l'année.
+        """
+        from ..signals import post_bulk_create
+
+        bons = list(bons)
+        pending = [bc for bc in bons if not bc.numero_bc]
+        year = datetime.now().year
+        with transaction.atomic():
+            numbers = sequences.allocate_block(sequences.BON_COMMANDE, sequences.year_scope(year), len(pending))
+            for bc, seq in zip(pending, numbers):
+                bc.numero_bc = cls.format_numero_bc(seq, year)
+            created = cls.objects.bulk_create(bons, batch_size=batch_size)
+            post_bulk_create.send(sender=cls, instances=created)
+        return created
+
+    @transaction.atomic(savepoint=False)
     def save(self, *args, **kwargs):
         if not self.numero_bc:
             self.numero_bc = self.generate_numero_bc()
         super().save(*args, **kwargs)
 
 
-class LigneBC(models.Model):
+class LigneBC(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     id_bc = models.ForeignKey(
         'BonCommande',
@@ -202,7 +207,7 @@ class LigneBC(models.Model):
         return f'Ligne BC {self.id} - {self.id_bc}'
 
 
-class SignatureBC(models.Model):
+class SignatureBC(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     id_bc = models.ForeignKey(
         'BonCommande',
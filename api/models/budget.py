@@ -1,9 +1,12 @@
 import uuid
 
 from django.db import models
+from django.db.models import F
 
+from .base import AtomicSaveModel
 
-class LigneBudgetaire(models.Model):
+
+class LigneBudgetaire(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     exercice = models.PositiveIntegerField()
     chapitre = models.CharField(max_length=50)
@@ -36,5 +39,92 @@ class LigneBudgetaire(models.Model):
         default=0,
     )
 
+    # Totaux tenus par le registre des mouvements (``api.budget``) avec des
+    # mises à jour F() : save() ne les réécrit jamais depuis l'instance.
+    LEDGER_FIELDS = ('montant_engage', 'montant_reste')
+
     def __str__(self) -> str:
         return self.code_ligne
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.montant_reste = (self.montant_budget or 0) - (self.montant_engage or 0)
+            return super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+        update_fields = [name for name in update_fields if name not in self.LEDGER_FIELDS]
+        kwargs['update_fields'] = update_fields
+        previous_code = None
+        if 'code_ligne' in update_fields:
+            previous_code = type(self).objects.filter(pk=self.pk).values_list('code_ligne', flat=True).first()
+        super().save(*args, **kwargs)
+
+        if previous_code and previous_code != self.code_ligne:
+            # Les bons de commande référencent la ligne par son code.
+            from .bon_commande import BonCommande
+
+            BonCommande.objects.filter(id_ligne_budgetaire=previous_code).update(id_ligne_budgetaire=self.code_ligne)
+        if 'montant_budget' in update_fields:
+            type(self).objects.filter(pk=self.pk).update(montant_reste=F('montant_budget') - F('montant_engage'))
+            self.refresh_from_db(fields=self.LEDGER_FIELDS)
+
+
+class MouvementBudgetaire(models.Model):
+    """
+    Mouvement du registre d'une ligne budgétaire : engagement (montant
+    positif) ou désengagement (montant négatif) suite à la création, la
+    modification ou la suppression d'un bon de commande. Voir ``api.budget``.
+    """
+
+    TYPE_ENGAGEMENT = 'engagement'
+    TYPE_DESENGAGEMENT = 'desengagement'
+    TYPE_CHOICES = [
+        (TYPE_ENGAGEMENT, 'Engagement'),
+        (TYPE_DESENGAGEMENT, 'Désengagement'),
+    ]
+
+    MOTIF_CREATION = 'creation'
+    MOTIF_MODIFICATION = 'modification'
+    MOTIF_CHANGEMENT_LIGNE = 'changement_ligne'
+    MOTIF_SUPPRESSION = 'suppression'
+    MOTIF_REPRISE = 'reprise'
+    MOTIF_CHOICES = [
+        (MOTIF_CREATION, 'Création du bon de commande'),
+        (MOTIF_MODIFICATION, 'Modification du montant engagé'),
+        (MOTIF_CHANGEMENT_LIGNE, 'Changement de ligne budgétaire'),
+        (MOTIF_SUPPRESSION, 'Suppression du bon de commande'),
+        (MOTIF_REPRISE, 'Reprise / régularisation'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id_ligne_budgetaire = models.ForeignKey(
+        LigneBudgetaire,
+        on_delete=models.CASCADE,
+        related_name='mouvements',
+    )
+    id_bc = models.ForeignKey(
+        'BonCommande',
+        on_delete=models.SET_NULL,
+        related_name='mouvements_budgetaires',
+        null=True,
+        blank=True,
+    )
+    # Numéro du bon de commande, conservé après sa suppression.
+    numero_bc = models.CharField(max_length=100, blank=True)
+    type_mouvement = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    motif = models.CharField(max_length=20, choices=MOTIF_CHOICES)
+    montant = models.DecimalField(max_digits=18, decimal_places=2)
+    date_mouvement = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Mouvement budgétaire'
+        verbose_name_plural = 'Mouvements budgétaires'
+        ordering = ['-date_mouvement']
+        indexes = [
+            models.Index(fields=['id_ligne_budgetaire', '-date_mouvement'], name='mouvement_ligne_date_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.id_ligne_budgetaire_id} {self.type_mouvement} {self.montant}'
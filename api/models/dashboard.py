@@ -0,0 +1,40 @@
+from django.db import models
+
+
+class DashboardCounter(models.Model):
+    """
+    Compteur matérialisé du tableau de bord.
+
+    Une ligne sans département porte le total global d'une métrique ; les lignes
+    par département portent le total visible par les utilisateurs de ce
+    département (un transfert peut ainsi compter pour plusieurs départements).
+    """
+
+    metric = models.CharField(max_length=50)
+    departement = models.ForeignKey(
+        'Departement',
+        on_delete=models.CASCADE,
+        related_name='compteurs',
+        null=True,
+        blank=True,
+    )
+    statut = models.CharField(max_length=20, blank=True, default='')
+    valeur = models.BigIntegerField(default=0)
+    date_modification = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['metric', 'departement', 'statut'],
+                condition=models.Q(departement__isnull=False),
+                name='unique_dashboard_counter_departement',
+            ),
+            models.UniqueConstraint(
+                fields=['metric', 'statut'],
+                condition=models.Q(departement__isnull=True),
+                name='unique_dashboard_counter_global',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.metric} [{self.departement_id or "global"}/{self.statut}] = {self.valeur}'
@@ -1,9 +1,11 @@
-import re
 import uuid
 from datetime import datetime
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+
+from .. import sequences
+from .base import AtomicSaveModel
 
 
 class StatutDemande(models.TextChoices):
@@ -20,7 +22,7 @@ class DecisionDemande(models.TextChoices):
     REFUSE = ('refuse', 'Refuse')
 
 
-class Demande(models.Model):
+class Demande(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     numero_demande = models.CharField(max_length=100, unique=True)
     objet = models.CharField(max_length=255)
@@ -87,38 +89,27 @@ class Demande(models.Model):
         blank=True,
     )
 
+    class Meta:
+        # Index de tri utilisé par la pagination par curseur.
+        indexes = [models.Index(fields=['-date_creation', '-id'], name='demande_date_creation_idx')]
+
     def __str__(self) -> str:
         return self.numero_demande
 
-    @staticmethod
-    def _next_sequence_for_year(year: int) -> int:
-        """
-        Retourne le prochain numéro séquentiel pour l'année donnée.
-        Cherche les numéros existants au format DM/NUMXX/{year}/ pour continuer la séquence.
-        """
-        existing = Demande.objects.filter(numero_demande__endswith=f'/{year}/').values_list(
-            'numero_demande', flat=True
-        )
-        max_seq = 0
-        for numero in existing:
-            match = re.search(rf'DM/NUM(\d+)/{year}/', numero or '')
-            if match:
-                max_seq = max(max_seq, int(match.group(1)))
-        return max_seq + 1
-
     @classmethod
     def generate_numero_demande(cls) -> str:
         year = datetime.now().year
-        sequence = cls._next_sequence_for_year(year)
+        sequence = sequences.next_value(sequences.DEMANDE, sequences.year_scope(year))
         return f'DM/NUM{sequence:02d}/{year}/'
 
+    @transaction.atomic(savepoint=False)
     def save(self, *args, **kwargs):
         if not self.numero_demande:
             self.numero_demande = self.generate_numero_demande()
         super().save(*args, **kwargs)
 
 # on selectionne le type qui peut etre soit 'Article' soit 'Service'  puis une designation 
-class LigneDemande(models.Model):
+class LigneDemande(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     id_demande = models.ForeignKey(
         'Demande',
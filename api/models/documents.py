@@ -4,6 +4,9 @@ from datetime import datetime
 from django.conf import settings
 from django.db import models, transaction
 
+from .. import sequences
+from .base import AtomicSaveModel
+
 
 class StatutArchivage(models.TextChoices):
     ACTIF = ('actif', 'Actif')
@@ -16,16 +19,7 @@ class PrioriteDocument(models.IntegerChoices):
     TROIS = (3, '3')
 
 
-class DocumentSequence(models.Model):
-    year = models.PositiveIntegerField(primary_key=True)
-    last_sequence = models.PositiveIntegerField(default=0)
-
-    class Meta:
-        verbose_name = 'Sequence document'
-        verbose_name_plural = 'Sequences documents'
-
-
-class Document(models.Model):
+class Document(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     type_document = models.CharField(max_length=50)
     titre = models.CharField(max_length=255, blank=True)
@@ -53,43 +47,52 @@ class Document(models.Model):
     def __str__(self) -> str:
         return f'{self.type_document} - {self.reference_fonctionnelle}'
 
-    @staticmethod
-    def _global_sequence_year() -> int:
-        """
-        Utilise une seule séquence globale (pas de remise à zéro annuelle).
-        """
-        return 0
-
     @classmethod
     def _next_sequence(cls) -> int:
-        year = cls._global_sequence_year()
-        with transaction.atomic():
-            sequence_obj, _ = DocumentSequence.objects.select_for_update().get_or_create(
-                year=year,
-                defaults={'last_sequence': 0},
-            )
-            next_sequence = sequence_obj.last_sequence + 1
-            sequence_obj.last_sequence = next_sequence
-            sequence_obj.save(update_fields=['last_sequence'])
-        return next_sequence
+        # Séquence globale (pas de remise à zéro annuelle).
+        return sequences.next_value(sequences.DOCUMENT)
+
+    @staticmethod
+    def format_reference(seq: int) -> str:
+        return f'DOC/NUM{seq:06d}'
 
     @classmethod
     def generate_reference_fonctionnelle(cls) -> str:
-        seq = cls._next_sequence()
-        return f'DOC/NUM{seq:06d}'
+        return cls.format_reference(cls._next_sequence())
 
+    @classmethod
+    def bulk_create_numbered(cls, documents, batch_size=None) -> list:
+        """
+        Crée des documents en masse ; les codes manquants sont pris dans un
+        seul bloc de la séquence.
+        """
+        from ..signals import post_bulk_create
+
+        documents = list(documents)
+        pending = [document for document in documents if not document.code]
+        with transaction.atomic():
+            codes = sequences.allocate_block(sequences.DOCUMENT, sequences.GLOBAL_SCOPE, len(pending))
+            for document, seq in zip(pending, codes):
+                document.code = seq
+                if not document.reference_fonctionnelle:
+                    document.reference_fonctionnelle = cls.format_reference(seq)
+            created = cls.objects.bulk_create(documents, batch_size=batch_size)
+            post_bulk_create.send(sender=cls, instances=created)
+        return created
+
+    @transaction.atomic(savepoint=False)
     def save(self, *args, **kwargs):
         if not self.code:
             seq = self._next_sequence()
             self.code = seq
             if not self.reference_fonctionnelle:
-                self.reference_fonctionnelle = f'DOC/NUM{seq:06d}'
+                self.reference_fonctionnelle = self.format_reference(seq)
         elif not self.reference_fonctionnelle:
             self.reference_fonctionnelle = self.generate_reference_fonctionnelle()
         super().save(*args, **kwargs)
 
 
-class SignatureNumerique(models.Model):
+class SignatureNumerique(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     id_document = models.ForeignKey(
         'Document',
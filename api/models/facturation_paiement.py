@@ -3,6 +3,8 @@ import uuid
 from django.conf import settings
 from django.db import models
 
+from .base import AtomicSaveModel
+
 
 class StatutFacture(models.TextChoices):
     RECUE = ('recue', 'Recue')
@@ -19,7 +21,7 @@ class StatutPaiement(models.TextChoices):
     REJETE = ('rejete', 'Rejete')
 
 
-class Facture(models.Model):
+class Facture(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     id_bc = models.ForeignKey(
         'BonCommande',
@@ -60,7 +62,7 @@ class Facture(models.Model):
         return f'Facture {self.numero_facture}'
 
 
-class Paiement(models.Model):
+class Paiement(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     id_facture = models.ForeignKey(
         'Facture',
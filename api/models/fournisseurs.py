@@ -2,8 +2,10 @@ import uuid
 
 from django.db import models
 
+from .base import AtomicSaveModel
 
-class Categorie(models.Model):
+
+class Categorie(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     code = models.CharField(max_length=50, unique=True)
     libelle = models.CharField(max_length=150)
@@ -18,7 +20,7 @@ class TypeArticle(models.TextChoices):
     SERVICE = ('service', 'Service')
 
 
-class Article(models.Model):
+class Article(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     code_article = models.CharField(max_length=100, unique=True)
     designation = models.CharField(max_length=255)
@@ -54,7 +56,7 @@ class Article(models.Model):
         return f'{self.code_article} - {self.designation}'
 
 
-class Fournisseur(models.Model):
+class Fournisseur(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     code_fournisseur = models.CharField(max_length=100, unique=True)
     raison_sociale = models.CharField(max_length=255)
@@ -68,7 +70,7 @@ class Fournisseur(models.Model):
         return self.raison_sociale
 
 
-class Banque(models.Model):
+class Banque(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     nom = models.CharField(max_length=255)
     code_banque = models.CharField(max_length=50, unique=True)
@@ -80,7 +82,7 @@ class Banque(models.Model):
         return self.nom
 
 
-class FournisseurRIB(models.Model):
+class FournisseurRIB(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     id_fournisseur = models.ForeignKey(
         'Fournisseur',
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class IdempotencyKey(models.Model):
+    """
+    Réponse enregistrée d'une action appelée avec l'en-tête ``Idempotency-Key``.
+
+    La clé est propre à l'utilisateur ; ``fingerprint`` identifie la requête
+    (méthode, chemin, corps) pour refuser la réutilisation d'une clé avec une
+    autre requête. La ligne est insérée dans la transaction de l'action : elle
+    n'est visible qu'avec ses effets. Voir ``api.idempotency``.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Clé d'idempotence"
+        verbose_name_plural = "Clés d'idempotence"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_user'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.key} [{self.method} {self.path}] -> {self.response_status}'
@@ -6,11 +6,12 @@ from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 from django.utils.text import slugify
 
-from .base import BaseModel
+from .. import sequences
+from .base import AtomicSaveModel, BaseModel
 from .security import TwoFactorMethod
 
 
-class Departement(models.Model):
+class Departement(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     nom = models.CharField(max_length=150)
     description = models.TextField(blank=True)
@@ -21,16 +22,6 @@ class Departement(models.Model):
     def __str__(self) -> str:
         return f'{self.nom} ({self.code})'
 
-    @classmethod
-    def _next_seq_for_code(cls, base: str) -> int:
-        existing = cls.objects.filter(code__startswith=base).values_list('code', flat=True)
-        max_seq = 0
-        for code in existing:
-            m = re.match(rf'^{re.escape(base)}-(\d+)$', code or '')
-            if m:
-                max_seq = max(max_seq, int(m.group(1)))
-        return max_seq + 1
-
     @staticmethod
     def _sigle_from_nom(nom: str) -> str:
         """Construit un sigle à partir du nom (ex: 'Direction Generale' -> 'DG')."""
@@ -45,8 +36,12 @@ class Departement(models.Model):
     @classmethod
     def generate_code(cls, nom: str) -> str:
         base = cls._sigle_from_nom(nom)
-        seq = cls._next_seq_for_code(base)
-        return base if seq == 1 else f'{base}-{seq:02d}'
+        while True:
+            seq = sequences.next_value(sequences.DEPARTEMENT, base)
+            code = base if seq == 1 else f'{base}-{seq:02d}'
+            # Un code saisi manuellement peut avoir déjà consommé ce numéro.
+            if not cls.objects.filter(code=code).exists():
+                return code
 
     @classmethod
     def generate_slug(cls, nom: str, current_id=None) -> str:
@@ -66,7 +61,7 @@ class Departement(models.Model):
         super().save(*args, **kwargs)
 
 
-class Role(models.Model):
+class Role(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     code = models.CharField(max_length=20, unique=True)
     libelle = models.CharField(max_length=150)
@@ -142,7 +137,7 @@ class UtilisateurManager(BaseUserManager):
         return self.create_user(login, email, password, **extra_fields)
 
 
-class Utilisateur(AbstractUser, BaseModel):
+class Utilisateur(AbstractUser, BaseModel, AtomicSaveModel):
     profile_picture = models.ImageField(upload_to='profile_pictures/', null=True, blank=True)
     first_name = models.CharField(max_length=150)
     last_name = models.CharField(max_length=150)
@@ -172,6 +167,9 @@ class Utilisateur(AbstractUser, BaseModel):
         null=True,
         blank=True,
     )
+    # Incrémenté à chaque modification du compte ou de son rôle : invalide
+    # l'utilisateur mis en cache par l'authentification JWT (claim ``ver``).
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
     USERNAME_FIELD = 'login'
     REQUIRED_FIELDS = ['email', 'phone']
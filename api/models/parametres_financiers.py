@@ -2,8 +2,10 @@ import uuid
 
 from django.db import models
 
+from .base import AtomicSaveModel
 
-class Devise(models.Model):
+
+class Devise(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     code_iso = models.CharField(max_length=10, unique=True)
     libelle = models.CharField(max_length=100)
@@ -21,7 +23,7 @@ class Devise(models.Model):
         return self.code_iso
 
 
-class MethodePaiement(models.Model):
+class MethodePaiement(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     code = models.CharField(max_length=20, unique=True)
     libelle = models.CharField(max_length=150)
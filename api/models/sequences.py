@@ -0,0 +1,26 @@
+from django.db import models
+
+
+class Sequence(models.Model):
+    """
+    Compteur des numéros attribués (demandes, bons de commande, documents,
+    codes de département).
+
+    ``scope`` distingue les séquences d'une même famille : année pour une
+    numérotation annuelle, clé libre (ex. sigle de département) ou chaîne vide
+    pour une séquence globale. Voir ``api.sequences``.
+    """
+
+    name = models.CharField(max_length=50)
+    scope = models.CharField(max_length=100, blank=True, default='')
+    last_sequence = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Séquence'
+        verbose_name_plural = 'Séquences'
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'scope'], name='unique_sequence_scope'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name}[{self.scope}] = {self.last_sequence}'
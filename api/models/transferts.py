@@ -3,13 +3,15 @@ import uuid
 from django.conf import settings
 from django.db import models
 
+from .base import AtomicSaveModel
+
 
 class StatutTransfert(models.TextChoices):
     VALIDE = ('valide', 'Valide')
     REJETE = ('rejete', 'Rejete')
 
 
-class Transfert(models.Model):
+class Transfert(AtomicSaveModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     departement_source = models.ForeignKey(
         'Departement',
@@ -0,0 +1,140 @@
+"""
+Pagination par curseur (keyset) pour les listes de l'API.
+
+La pagination est optionnelle : elle ne s'active que si ``?cursor=`` ou
+``?page_size=`` est fourni, afin de conserver les réponses existantes.
+Le curseur encode les valeurs de tri de la dernière ligne renvoyée
+(tri du queryset + ``id`` en départage) ; la page suivante est obtenue par
+une condition ``WHERE (tri) > (curseur)`` dont le coût ne dépend pas de la
+profondeur de défilement.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    default_page_size = 50
+    max_page_size = 500
+
+    def __init__(self):
+        self.page = None
+        self.page_size = None
+        self.next_cursor = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.page_size = self._get_page_size(params)
+        ordering = self._get_ordering(queryset)
+        queryset = queryset.order_by(*[f'-{field.name}' if desc else field.name for field, desc in ordering])
+
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            values = self._decode_cursor(cursor, ordering)
+            queryset = queryset.filter(self._after_cursor(ordering, values))
+
+        rows = list(queryset[: self.page_size + 1])
+        has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        self.next_cursor = self._encode_cursor(self.page[-1], ordering) if has_next else None
+        return self.page
+
+    def get_pagination_meta(self) -> dict:
+        return {
+            'page_size': self.page_size,
+            'next_cursor': self.next_cursor,
+            'has_next': self.next_cursor is not None,
+        }
+
+    def get_paginated_response(self, data):
+        return Response({'results': data, 'pagination': self.get_pagination_meta()})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'results': schema,
+                'pagination': {
+                    'type': 'object',
+                    'properties': {
+                        'page_size': {'type': 'integer'},
+                        'next_cursor': {'type': 'string', 'nullable': True},
+                        'has_next': {'type': 'boolean'},
+                    },
+                },
+            },
+        }
+
+    def _get_page_size(self, params) -> int:
+        raw = params.get(self.page_size_query_param)
+        if raw in (None, ''):
+            return self.default_page_size
+        try:
+            size = int(raw)
+        except (TypeError, ValueError):
+            raise ValidationError({self.page_size_query_param: 'Valeur entière attendue.'})
+        if size <= 0:
+            raise ValidationError({self.page_size_query_param: 'La taille de page doit être positive.'})
+        return min(size, self.max_page_size)
+
+    @staticmethod
+    def _get_ordering(queryset):
+        """
+        Retourne [(champ, décroissant)] à partir du tri du queryset, complété
+        par l'identifiant. Seuls les champs locaux non nuls sont acceptés.
+        """
+        opts = queryset.model._meta
+        raw = list(queryset.query.order_by) or list(opts.ordering)
+        ordering = []
+        for item in raw:
+            if not isinstance(item, str) or item == '?':
+                raise ValidationError({'cursor': 'Tri incompatible avec la pagination par curseur.'})
+            desc = item.startswith('-')
+            name = item.lstrip('-+')
+            try:
+                field = opts.pk if name == 'pk' else opts.get_field(name)
+            except FieldDoesNotExist:
+                raise ValidationError({'cursor': 'Tri incompatible avec la pagination par curseur.'})
+            if field.null or not getattr(field, 'concrete', False):
+                raise ValidationError({'cursor': 'Tri incompatible avec la pagination par curseur.'})
+            if all(existing.name != field.name for existing, _ in ordering):
+                ordering.append((field, desc))
+        if all(field.name != opts.pk.name for field, _ in ordering):
+            ordering.append((opts.pk, ordering[-1][1] if ordering else False))
+        return ordering
+
+    @staticmethod
+    def _after_cursor(ordering, values) -> Q:
+        condition = Q()
+        for index, (field, desc) in enumerate(ordering):
+            clause = Q(**{prior.attname: value for (prior, _), value in zip(ordering[:index], values[:index])})
+            clause &= Q(**{f'{field.attname}__{"lt" if desc else "gt"}': values[index]})
+            condition |= clause
+        return condition
+
+    @staticmethod
+    def _encode_cursor(instance, ordering) -> str:
+        values = [field.value_to_string(instance) for field, _ in ordering]
+        payload = json.dumps(values, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def _decode_cursor(cursor: str, ordering):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError
+            return [field.to_python(value) for (field, _), value in zip(ordering, values)]
+        except (ValueError, TypeError, DjangoValidationError):
+            raise ValidationError({'cursor': 'Curseur invalide.'})
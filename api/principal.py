@@ -0,0 +1,66 @@
+"""
+Contexte d'autorisation de l'utilisateur courant, résolu une seule fois par requête.
+
+``Principal`` regroupe le rôle, le département, l'accès global et la clé de
+portée (``scope_key``) partagée par les utilisateurs voyant les mêmes données.
+Il est construit par ``PrincipalJWTAuthentication`` (utilisateur chargé avec
+son rôle et son département) et mémorisé sur l'objet utilisateur ;
+``get_principal`` le reconstruit au besoin pour les autres modes
+d'authentification.
+"""
+
+SUPER_ADMIN_ROLES = {'SAD', 'SD', 'DAA', 'BUDGET', 'DFC', 'TRESOR'}
+
+
+class Principal:
+    __slots__ = ('user', 'role_code', 'departement_id', 'has_global_access', 'scope_key')
+
+    def __init__(self, user, role_code: str = '', departement_id=None):
+        self.user = user
+        self.role_code = role_code
+        self.departement_id = departement_id
+        # Global sauf cas spécifique géré par les filtres dédiés (ex: demandes/BC pour SD).
+        self.has_global_access = role_code in SUPER_ADMIN_ROLES
+        self.scope_key = 'global' if self.has_global_access else f'dept:{departement_id or 0}'
+
+    @classmethod
+    def from_user(cls, user) -> 'Principal':
+        if user is None or not getattr(user, 'is_authenticated', False):
+            return cls(user)
+        role = getattr(user, 'id_role', None)
+        role_code = (getattr(role, 'code', '') or '').strip().upper()
+        return cls(user, role_code, getattr(user, 'id_departement_id', None))
+
+    @property
+    def is_authenticated(self) -> bool:
+        return bool(self.user is not None and getattr(self.user, 'is_authenticated', False))
+
+    @property
+    def is_sad(self) -> bool:
+        return self.role_code == 'SAD'
+
+    @property
+    def is_sd(self) -> bool:
+        return self.role_code == 'SD'
+
+    def __repr__(self) -> str:
+        return f'<Principal user={getattr(self.user, "pk", None)} role={self.role_code or "-"} scope={self.scope_key}>'
+
+
+def attach_principal(user) -> Principal:
+    principal = Principal.from_user(user)
+    if user is not None:
+        user._principal = principal
+    return principal
+
+
+def get_principal(user_or_principal) -> Principal:
+    """
+    Retourne le principal d'un utilisateur (ou le principal lui-même).
+    """
+    if isinstance(user_or_principal, Principal):
+        return user_or_principal
+    principal = getattr(user_or_principal, '_principal', None)
+    if principal is not None:
+        return principal
+    return attach_principal(user_or_principal)
@@ -0,0 +1,287 @@
+"""
+Cache des réponses agrégées (actions ``stats`` et tableau de bord).
+
+La clé combine l'endpoint, la portée d'accès de l'utilisateur (rôle global ou
+département, cf. ``filter_by_departement``), les paramètres de requête
+normalisés et la version de chaque modèle dont dépend la réponse. Toute
+écriture sur un modèle (signaux ``post_save``, ``post_delete``,
+``m2m_changed``, ``post_bulk_create``) incrémente sa version : seules les
+entrées qui en dépendent deviennent inaccessibles et expirent ensuite
+d'elles-mêmes (``RESPONSE_CACHE_TIMEOUT``).
+
+Le stockage utilise le framework de cache Django (``RESPONSE_CACHE_ALIAS``) ;
+le cache n'est actif qu'avec un backend partagé (``api.caching``), pour que les
+invalidations soient vues par tous les processus.
+"""
+import functools
+import hashlib
+import json
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, transaction
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from . import caching
+from .principal import get_principal
+
+VERSION_PREFIX = 'rc:v:'
+ENTRY_PREFIX = 'rc:e:'
+# Champs dont la mise à jour seule n'invalide rien (ex. connexion d'un utilisateur).
+IGNORED_UPDATE_FIELDS = frozenset({'last_login'})
+# Tables techniques écrites à chaque requête ou dérivées d'autres modèles.
+UNTRACKED_MODELS = frozenset({'api.AuditLog', 'api.DashboardCounter'})
+# Nombre maximal de formes de requête dont les dépendances sont mémorisées.
+DEPENDENCIES_MAX = 1024
+
+_dependencies = {}
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'RESPONSE_CACHE_ENABLED', True) and caching.is_shared(
+        getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')
+    )
+
+
+def _initial_version() -> int:
+    # Une version évincée du cache repart d'une valeur inédite, jamais de 1.
+    return time.time_ns()
+
+
+def model_versions(labels) -> list:
+    cache = _cache()
+    keys = [f'{VERSION_PREFIX}{label}' for label in labels]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bump(label: str) -> None:
+    cache = _cache()
+    key = f'{VERSION_PREFIX}{label}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), timeout=None)
+
+
+def bump_model_version(model) -> None:
+    """
+    Invalide les réponses dépendant de ``model`` : immédiatement, puis à la
+    validation de la transaction (une lecture concurrente ayant mis en cache
+    l'état antérieur entre-temps est ainsi écartée).
+    """
+    if not is_enabled():
+        return
+    label = model._meta.label
+    _bump(label)
+    transaction.on_commit(lambda: _bump(label))
+
+
+def related_models(model, depth: int = 2) -> set:
+    """
+    Modèles atteignables depuis ``model`` en ``depth`` relations (directes ou
+    inverses) : dépendances d'une représentation qu'on ne peut pas analyser.
+    """
+    seen = {model}
+    frontier = [model]
+    for _ in range(depth):
+        following = []
+        for current in frontier:
+            for field in current._meta.get_fields(include_hidden=True):
+                related = field.related_model if field.is_relation else None
+                if related is not None and not isinstance(related, str) and related not in seen:
+                    seen.add(related)
+                    following.append(related)
+        frontier = following
+    return {related._meta.label for related in seen}
+
+
+def serializer_dependencies(serializer) -> set:
+    """
+    Modèles lus par un serializer : son modèle, ceux des serializers imbriqués
+    et des listes d'identifiants. Les champs calculés et ``to_representation``
+    surchargés pouvant tout lire, ils ajoutent les modèles voisins.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None:
+        return set()
+    labels = {model._meta.label}
+    opaque = type(serializer).to_representation is not serializers.Serializer.to_representation
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            opaque = True
+        elif isinstance(field, serializers.BaseSerializer):
+            labels |= serializer_dependencies(field)
+        elif isinstance(field, serializers.ManyRelatedField):
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                opaque = True
+                continue
+            if model_field.related_model is not None:
+                labels.add(model_field.related_model._meta.label)
+            through = getattr(getattr(model_field, 'remote_field', None), 'through', None)
+            if model_field.many_to_many and through is not None and not isinstance(through, str):
+                labels.add(through._meta.label)
+    if opaque:
+        labels |= related_models(model)
+    return labels
+
+
+def query_dependencies(queryset) -> set:
+    """
+    Modèles dont les tables apparaissent dans le SQL du queryset (filtres,
+    jointures et sous-requêtes).
+    """
+    sql, _ = queryset.query.get_compiler(queryset.db).as_sql()
+    quote_name = connections[queryset.db].ops.quote_name
+    return {model._meta.label for model in tracked_models() if quote_name(model._meta.db_table) in sql}
+
+
+def view_dependencies(view, request) -> tuple:
+    """
+    Modèles dont dépend la réponse d'une vue, calculés une fois par classe de
+    vue et forme de requête : seuls la portée d'accès et les paramètres
+    présents changent les tables du queryset filtré.
+    """
+    principal = get_principal(request.user)
+    key = (
+        type(view),
+        getattr(view, 'action', None),
+        principal.role_code,
+        principal.departement_id is None,
+        tuple(sorted(request.query_params)),
+    )
+    labels = _dependencies.get(key)
+    if labels is None:
+        found = {view.queryset.model._meta.label}
+        found |= query_dependencies(view.filter_queryset(view.get_queryset()))
+        found |= serializer_dependencies(view.get_serializer())
+        labels = tuple(sorted(found & {model._meta.label for model in tracked_models()}))
+        if len(_dependencies) >= DEPENDENCIES_MAX:
+            _dependencies.clear()
+        _dependencies[key] = labels
+    return labels
+
+
+def access_scope(user, per_user: bool = False) -> str:
+    """
+    Portée d'accès partagée par les utilisateurs voyant les mêmes données.
+
+    ``per_user`` isole chaque utilisateur sans accès global : les demandes qui
+    lui ont été transférées sont visibles en dehors de son département.
+    """
+    principal = get_principal(user)
+    scope = principal.scope_key
+    if per_user and not principal.has_global_access and principal.is_authenticated:
+        scope += f':user:{principal.user.pk}'
+    return scope
+
+
+def response_cache_key(request, endpoint: str, labels, per_user: bool = False) -> str:
+    params = sorted((name, sorted(values)) for name, values in request.query_params.lists())
+    payload = [
+        endpoint,
+        access_scope(request.user, per_user=per_user),
+        request.get_host(),
+        params,
+        list(zip(labels, model_versions(labels))),
+    ]
+    digest = hashlib.sha256(json.dumps(payload, default=str).encode()).hexdigest()
+    return f'{ENTRY_PREFIX}{digest}'
+
+
+def cached_data(request, endpoint: str, labels, compute, per_user: bool = False) -> tuple:
+    """
+    Données calculées par ``compute()`` servies depuis le cache (même clé que
+    ``cache_response``) ; retourne (données, trouvé en cache).
+    """
+    if not is_enabled():
+        return compute(), False
+    key = response_cache_key(request, endpoint, labels, per_user=per_user)
+    cache = _cache()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, True
+    data = compute()
+    cache.set(key, data, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+    return data, False
+
+
+def cache_response(models=None, per_user: bool = False):
+    """
+    Décorateur de méthode de vue (GET) : sert la réponse depuis le cache.
+
+    ``models`` liste les modèles (labels) dont dépend la réponse ; par défaut
+    ``cache_dependencies`` de la vue, sinon ceux lus par le queryset filtré et
+    le serializer de la vue.
+    Seules les réponses 200 sont mises en cache ; l'en-tête ``X-Response-Cache``
+    indique HIT ou MISS.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if not is_enabled() or request.method != 'GET':
+                return method(view, request, *args, **kwargs)
+            labels = models or getattr(view, 'cache_dependencies', None) or view_dependencies(view, request)
+            action = getattr(view, 'action', None) or method.__name__
+            key = response_cache_key(request, f'{view.__class__.__name__}.{action}', labels, per_user=per_user)
+            cache = _cache()
+            cached = cache.get(key)
+            if cached is not None:
+                response = Response(cached, status=200)
+                response['X-Response-Cache'] = 'HIT'
+                return response
+            response = method(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+            response['X-Response-Cache'] = 'MISS'
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate_on_save(sender, update_fields=None, raw=False, **kwargs):
+    if update_fields is not None and set(update_fields) <= IGNORED_UPDATE_FIELDS:
+        return
+    bump_model_version(sender)
+
+
+def invalidate_on_delete(sender, **kwargs):
+    bump_model_version(sender)
+
+
+def invalidate_on_m2m_changed(sender, instance, action, model=None, **kwargs):
+    if not action.startswith('post_'):
+        return
+    bump_model_version(sender)
+    bump_model_version(type(instance))
+    if model is not None:
+        bump_model_version(model)
+
+
+def tracked_models() -> list:
+    return [
+        model
+        for model in apps.get_app_config('api').get_models(include_auto_created=True)
+        if model._meta.label not in UNTRACKED_MODELS
+    ]
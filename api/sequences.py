@@ -0,0 +1,140 @@
+"""
+Attribution des numéros séquentiels (table ``Sequence``).
+
+Chaque numéro est obtenu en verrouillant la ligne (nom, portée) de la
+séquence : coût constant et aucun doublon entre créations concurrentes.
+``allocate_block`` réserve N valeurs en une seule mise à jour (création en
+masse) ; avec ``SEQUENCE_BLOCK_SIZE`` > 1, ``next_value`` distribue dans le
+processus les valeurs d'un bloc réservé (hi-lo), au prix de trous et d'un
+ordre non strict entre processus.
+``existing_values`` et ``ensure_at_least`` alignent les séquences sur les
+numéros déjà présents en base (migration initiale, données importées).
+"""
+import re
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+DEMANDE = 'demande'
+BON_COMMANDE = 'bon_commande'
+DOCUMENT = 'document'
+DEPARTEMENT = 'departement'
+
+GLOBAL_SCOPE = ''
+
+DEMANDE_PATTERN = re.compile(r'DM/NUM(\d+)/(\d{4})/')
+BON_COMMANDE_PATTERN = re.compile(r'^BC/NUM(\d+)/DAA/DG/(\d{4})$')
+DEPARTEMENT_PATTERN = re.compile(r'^(.*?)(?:-(\d+))?$')
+
+
+def _sequence_model(get_model=django_apps.get_model):
+    return get_model('api.Sequence')
+
+
+def year_scope(year=None) -> str:
+    return str(year or datetime.now().year)
+
+
+def allocate_block(name: str, scope: str = GLOBAL_SCOPE, size: int = 1) -> range:
+    """
+    Réserve ``size`` valeurs consécutives de la séquence en une seule mise à
+    jour de la ligne verrouillée.
+    """
+    if size <= 0:
+        return range(0)
+    with transaction.atomic(savepoint=False):
+        sequence, _ = _sequence_model().objects.select_for_update().get_or_create(name=name, scope=scope)
+        first = sequence.last_sequence + 1
+        sequence.last_sequence += size
+        sequence.save(update_fields=['last_sequence'])
+    return range(first, first + size)
+
+
+class BlockAllocator:
+    """
+    Distribue dans le processus les valeurs de blocs réservés par
+    ``allocate_block`` : un accès à la table par bloc au lieu d'un par valeur.
+    """
+
+    def __init__(self):
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def take(self, name: str, scope: str, block_size: int) -> int:
+        with self._lock:
+            block = self._blocks.get((name, scope))
+            value = next(block, None) if block is not None else None
+            if value is None:
+                block = iter(allocate_block(name, scope, block_size))
+                self._blocks[(name, scope)] = block
+                value = next(block)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._blocks.clear()
+
+
+block_allocator = BlockAllocator()
+
+
+def next_value(name: str, scope: str = GLOBAL_SCOPE) -> int:
+    """
+    Prochaine valeur de la séquence ``name`` pour ``scope``.
+
+    Dans une transaction, la valeur est toujours prise directement dans la
+    table : un bloc mis en cache puis annulé par un rollback serait réattribué.
+    """
+    block_size = getattr(settings, 'SEQUENCE_BLOCK_SIZE', 1)
+    if block_size > 1 and not transaction.get_connection().in_atomic_block:
+        return block_allocator.take(name, scope, block_size)
+    return allocate_block(name, scope).start
+
+
+def existing_values(get_model=django_apps.get_model) -> dict:
+    """
+    Plus grande valeur déjà utilisée par séquence : {(nom, portée): valeur}.
+    """
+    values = defaultdict(int)
+
+    def keep(name, scope, value):
+        values[(name, scope)] = max(values[(name, scope)], value)
+
+    for numero in get_model('api.Demande').objects.values_list('numero_demande', flat=True).iterator():
+        match = DEMANDE_PATTERN.search(numero or '')
+        if match:
+            keep(DEMANDE, match.group(2), int(match.group(1)))
+    for numero in get_model('api.BonCommande').objects.values_list('numero_bc', flat=True).iterator():
+        match = BON_COMMANDE_PATTERN.match(numero or '')
+        if match:
+            keep(BON_COMMANDE, match.group(2), int(match.group(1)))
+    last_code = get_model('api.Document').objects.aggregate(last=Max('code'))['last']
+    if last_code:
+        keep(DOCUMENT, GLOBAL_SCOPE, last_code)
+    for code in get_model('api.Departement').objects.values_list('code', flat=True).iterator():
+        base, suffix = DEPARTEMENT_PATTERN.match(code or '').groups()
+        # Le premier code d'un sigle n'a pas de suffixe (ex. DG, puis DG-02).
+        keep(DEPARTEMENT, base, int(suffix) if suffix else 1)
+    return dict(values)
+
+
+def ensure_at_least(values: dict, get_model=django_apps.get_model) -> int:
+    """
+    Relève les séquences en dessous des valeurs données ; retourne le nombre
+    de séquences modifiées.
+    """
+    sequence_model = _sequence_model(get_model)
+    changed = 0
+    with transaction.atomic():
+        for (name, scope), value in values.items():
+            sequence, _ = sequence_model.objects.select_for_update().get_or_create(name=name, scope=scope)
+            if sequence.last_sequence < value:
+                sequence.last_sequence = value
+                sequence.save(update_fields=['last_sequence'])
+                changed += 1
+    return changed
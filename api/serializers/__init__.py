@@ -19,8 +19,10 @@ from .role import RoleSerializer  # noqa: F401
 from .resources import (  # noqa: F401
     ArticleSerializer,
     BanqueSerializer,
+    BonCommandeListSerializer,
     BonCommandeSerializer,
     CategorieSerializer,
+    DemandeListSerializer,
     DemandeSerializer,
     DeviseSerializer,
     DocumentSerializer,
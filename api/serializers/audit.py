@@ -1,3 +1,8 @@
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import models
 from rest_framework import serializers
 
 from ..models import (
@@ -35,6 +40,44 @@ from .resources import (
 from .organisation import DepartementSerializer
 
 
+# type_objet -> (modèle, serializer complet, champs du résumé)
+AUDITED_OBJECTS = {
+    'TRANSFERT': (Transfert, TransfertSerializer, ('statut', 'date_transfert', 'id_demande', 'id_bc')),
+    'DEMANDE': (Demande, DemandeSerializer, ('numero_demande', 'objet', 'statut_demande')),
+    'BON_COMMANDE': (BonCommande, BonCommandeSerializer, ('numero_bc', 'statut_bc', 'montant_engage')),
+    'ARTICLE': (Article, ArticleSerializer, ('code_article', 'designation')),
+    'DOCUMENT': (Document, DocumentSerializer, ('reference_fonctionnelle', 'titre', 'type_document')),
+    'FACTURE': (Facture, FactureSerializer, ('numero_facture', 'statut_facture', 'montant_ttc')),
+    'PAIEMENT': (Paiement, PaiementSerializer, ('montant', 'statut_paiement', 'reference_virement')),
+    'FOURNISSEUR': (Fournisseur, FournisseurSerializer, ('code_fournisseur', 'raison_sociale')),
+    'LIGNE_DEMANDE': (LigneDemande, LigneDemandeSerializer, ('designation', 'quantite', 'id_demande')),
+    'LIGNE_BC': (LigneBC, LigneBCSerializer, ('designation', 'quantite', 'prix_unitaire', 'id_bc')),
+    'SIGNATURE_BC': (SignatureBC, SignatureBCSerializer, ('niveau_validation', 'decision', 'id_bc')),
+    'SIGNATURE_NUMERIQUE': (SignatureNumerique, SignatureNumeriqueSerializer, ('id_document', 'date_signature')),
+    'DEPARTEMENT': (Departement, DepartementSerializer, ('nom', 'code')),
+    'METHODE_PAIEMENT': (MethodePaiement, MethodePaiementSerializer, ('code', 'libelle')),
+}
+
+
+def _summary_value(value):
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+class AuditLogListSerializer(serializers.ListSerializer):
+    """
+    Charge les objets audités de toute la page en une requête par type
+    avant de sérialiser chaque entrée.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        logs = list(iterable)
+        self.child.preload_objets(logs)
+        return [self.child.to_representation(log) for log in logs]
+
+
 class AuditLogSerializer(serializers.ModelSerializer):
     utilisateur_login = serializers.SerializerMethodField()
     utilisateur_email = serializers.SerializerMethodField()
@@ -64,6 +107,7 @@ class AuditLogSerializer(serializers.ModelSerializer):
             'utilisateur',
         ]
         read_only_fields = fields
+        list_serializer_class = AuditLogListSerializer
 
     def get_utilisateur_login(self, obj):
         user = obj.id_utilisateur
@@ -88,38 +132,57 @@ class AuditLogSerializer(serializers.ModelSerializer):
         user = obj.id_utilisateur
         return getattr(getattr(user, 'id_departement', None), 'nom', None) if user else None
 
+    def _expand_objet(self) -> bool:
+        request = self.context.get('request')
+        if request is None:
+            return False
+        expand = getattr(request, 'query_params', request.GET).get('expand') or ''
+        return 'objet' in {item.strip() for item in expand.split(',')}
+
+    def preload_objets(self, logs) -> None:
+        """
+        Regroupe les id_objet par type_objet et charge chaque modèle via un
+        seul ``in_bulk`` (restreint aux champs du résumé hors ?expand=objet).
+        """
+        ids_by_type = defaultdict(set)
+        for log in logs:
+            type_upper = (log.type_objet or '').upper()
+            if log.id_objet and type_upper in AUDITED_OBJECTS:
+                ids_by_type[type_upper].add(log.id_objet)
+
+        expand = self._expand_objet()
+        cache = {}
+        for type_upper, ids in ids_by_type.items():
+            model, _, summary_fields = AUDITED_OBJECTS[type_upper]
+            qs = model.objects.all() if expand else model.objects.only(*summary_fields)
+            for pk, instance in qs.in_bulk(list(ids)).items():
+                cache[(type_upper, pk)] = instance
+        self._objets_cache = cache
+
     def get_objet(self, obj):
         """
-        Retourne des informations minimales sur l'objet audité (id, label).
+        Retourne un résumé de l'objet audité (id + quelques champs scalaires),
+        ou sa représentation complète avec ?expand=objet.
         """
         type_upper = (obj.type_objet or '').upper()
         if not obj.id_objet:
             return None
-
-        serializer_mapping = {
-            'TRANSFERT': (Transfert, TransfertSerializer),
-            'DEMANDE': (Demande, DemandeSerializer),
-            'BON_COMMANDE': (BonCommande, BonCommandeSerializer),
-            'ARTICLE': (Article, ArticleSerializer),
-            'DOCUMENT': (Document, DocumentSerializer),
-            'FACTURE': (Facture, FactureSerializer),
-            'PAIEMENT': (Paiement, PaiementSerializer),
-            'FOURNISSEUR': (Fournisseur, FournisseurSerializer),
-            'LIGNE_DEMANDE': (LigneDemande, LigneDemandeSerializer),
-            'LIGNE_BC': (LigneBC, LigneBCSerializer),
-            'SIGNATURE_BC': (SignatureBC, SignatureBCSerializer),
-            'SIGNATURE_NUMERIQUE': (SignatureNumerique, SignatureNumeriqueSerializer),
-            'DEPARTEMENT': (Departement, DepartementSerializer),
-            'METHODE_PAIEMENT': (MethodePaiement, MethodePaiementSerializer),
-        }
-        model_serializer = serializer_mapping.get(type_upper)
-        if not model_serializer:
+        entry = AUDITED_OBJECTS.get(type_upper)
+        if not entry:
             return None
-        model, serializer_cls = model_serializer
-        instance = model.objects.filter(pk=obj.id_objet).first()
+        if getattr(self, '_objets_cache', None) is None:
+            self.preload_objets([obj])
+        instance = self._objets_cache.get((type_upper, obj.id_objet))
         if not instance:
             return None
-        return serializer_cls(instance, context=self.context).data
+        _, serializer_cls, summary_fields = entry
+        if self._expand_objet():
+            return serializer_cls(instance, context=self.context).data
+        summary = {'id': str(instance.pk), 'type': type_upper}
+        for name in summary_fields:
+            field = instance._meta.get_field(name)
+            summary[field.name] = _summary_value(getattr(instance, field.attname))
+        return summary
 
     def get_utilisateur(self, obj):
         user = obj.id_utilisateur
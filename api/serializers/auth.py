@@ -1,7 +1,10 @@
 from django.contrib.auth import get_user_model, password_validation
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 
 from ..models import TwoFactorMethod
+from ..tokens import UserRefreshToken
 
 
 User = get_user_model()
@@ -69,6 +72,22 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
 
+class UserTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Rafraîchissement recalculant les claims (rôle, département, version)
+    depuis le compte courant (``UserRefreshToken``) plutôt que de recopier
+    ceux du refresh token.
+    """
+
+    token_class = UserRefreshToken
+
+    def validate(self, attrs):
+        try:
+            return super().validate(attrs)
+        except User.DoesNotExist as e:
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account') from e
+
+
 class ChangePasswordSerializer(serializers.Serializer):
     old_password = serializers.CharField(write_only=True)
     new_password = serializers.CharField(write_only=True)
@@ -1,8 +1,14 @@
+from datetime import date
 from decimal import Decimal, ROUND_HALF_UP
 
-from django.db import models
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 
+from ..facturation import deferred_deltas, numero_facture_auto, totaux
+
 from ..models import (
     Article,
     Banque,
@@ -19,6 +25,7 @@ from ..models import (
     LigneBudgetaire,
     LigneDemande,
     MethodePaiement,
+    MouvementBudgetaire,
     Paiement,
     SignatureBC,
     SignatureUtilisateur,
@@ -27,11 +34,57 @@ from ..models import (
     TypeArticle,
     Utilisateur,
 )
+from ..models.facturation_paiement import StatutFacture, StatutPaiement
 from .organisation import DepartementSerializer
 from .auth import UserSerializer
 
 
-class BaseDepthSerializer(serializers.ModelSerializer):
+# Valeurs de ?expand= conservant la représentation imbriquée complète.
+EXPAND_ALL = frozenset({'*', 'all'})
+
+
+def parse_field_list(value):
+    """
+    Transforme ``"a,b,c"`` (ou une liste) en ensemble de noms ; None si vide.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    names = {name.strip() for name in value if name and name.strip()}
+    return names or None
+
+
+class DynamicFieldsMixin:
+    """
+    Accepte les arguments ``fields`` (champs conservés) et ``expand`` (relations
+    détaillées). Lorsque ``expand`` est fourni, les relations non listées sont
+    réduites à leur identifiant et les champs calculés sont retirés.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = parse_field_list(kwargs.pop('fields', None))
+        expand = parse_field_list(kwargs.pop('expand', None))
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+        if expand and not expand & EXPAND_ALL:
+            for name, field in list(self.fields.items()):
+                if name in expand or field.write_only:
+                    continue
+                if isinstance(field, serializers.SerializerMethodField):
+                    self.fields.pop(name)
+                elif isinstance(field, serializers.BaseSerializer):
+                    options = {'read_only': True}
+                    if field.source != name:
+                        options['source'] = field.source
+                    if isinstance(field, serializers.ListSerializer):
+                        options['many'] = True
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(**options)
+
+
+class BaseDepthSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         depth = 1
         fields = '__all__'
@@ -41,6 +94,27 @@ def _quantize_money(value: Decimal) -> Decimal:
     return value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
 
+def _prefetched(instance, relation):
+    """
+    Retourne la liste préchargée (prefetch_related) d'une relation, ou None.
+    """
+    cache = getattr(instance, '_prefetched_objects_cache', {})
+    if relation not in cache:
+        return None
+    return list(cache[relation])
+
+
+def _paiement_sort_key(paiement):
+    # Équivalent de order_by('-date_ordre', '-date_execution', '-id') avec reverse=True.
+    return (
+        paiement.date_ordre is not None,
+        paiement.date_ordre or date.min,
+        paiement.date_execution is not None,
+        paiement.date_execution or date.min,
+        paiement.id.hex,
+    )
+
+
 def _build_signature_utilisateur_payload(user):
     if not user:
         return None
@@ -210,6 +284,8 @@ class LigneBudgetaireSerializer(BaseDepthSerializer):
 
     class Meta(BaseDepthSerializer.Meta):
         model = LigneBudgetaire
+        # Tenus par le registre des mouvements (api.budget).
+        read_only_fields = LigneBudgetaire.LEDGER_FIELDS
 
     def to_internal_value(self, data):
         data = dict(data)
@@ -257,6 +333,13 @@ class LigneBudgetaireSerializer(BaseDepthSerializer):
         return instance
 
 
+
+class MouvementBudgetaireSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MouvementBudgetaire
+        fields = ['id', 'type_mouvement', 'motif', 'montant', 'id_bc', 'numero_bc', 'date_mouvement']
+
+
 class DocumentSerializer(BaseDepthSerializer):
     chemin_fichier = serializers.FileField(allow_empty_file=False)
     titre = serializers.CharField(required=False, allow_blank=True)
@@ -544,6 +627,39 @@ class DemandeReferenceSerializer(BaseDepthSerializer):
         )
 
 
+class DemandeListSerializer(BaseDepthSerializer):
+    """
+    Représentation résumée d'une demande pour les listes : champs scalaires et
+    identifiants des relations, sans sous-objets imbriqués.
+    """
+
+    class Meta(BaseDepthSerializer.Meta):
+        model = Demande
+        depth = 0
+        fields = (
+            'id',
+            'numero_demande',
+            'objet',
+            'description',
+            'source',
+            'canal',
+            'rapport_daa',
+            'statut_demande',
+            'decision',
+            'commentaire',
+            'date_creation',
+            'date_modification',
+            'date_validation_budget',
+            'date_signature',
+            'id_departement',
+            'id_fournisseur',
+            'agent_traitant',
+            'id_signataire',
+            'id_document_preuve',
+        )
+        read_only_fields = fields
+
+
 class SignatureBCDetailSerializer(serializers.ModelSerializer):
     id_signataire = UserSerializer(read_only=True)
     id_document_preuve = DocumentSerializer(read_only=True)
@@ -759,16 +875,37 @@ class BonCommandeSerializer(BaseDepthSerializer):
                 unique_users.append(user)
         return UserSerializer(unique_users, many=True).data
 
+    def _serialize_cached(self, serializer_class, instance):
+        """
+        Sérialise une banque / méthode de paiement une seule fois par réponse.
+        """
+        if instance is None:
+            return None
+        cache = self.__dict__.setdefault('_nested_cache', {})
+        key = (serializer_class, instance.pk)
+        if key not in cache:
+            cache[key] = serializer_class(instance).data
+        return cache[key]
+
     def get_paiements(self, obj):
+        factures = _prefetched(obj, 'factures')
+        if factures is not None and all(_prefetched(facture, 'paiements') is not None for facture in factures):
+            paiements = sorted(
+                (paiement for facture in factures for paiement in facture.paiements.all()),
+                key=_paiement_sort_key,
+                reverse=True,
+            )
+        else:
+            paiements = (
+                Paiement.objects.select_related('id_banque', 'id_methode_paiement', 'id_facture')
+                .filter(id_facture__id_bc=obj)
+                .order_by('-date_ordre', '-date_execution', '-id')
+            )
+
+        total_paye = obj.total_paye
         total_autorise = obj.montant_engage or Decimal('0')
         if total_autorise <= 0:
-            total_autorise = (
-                obj.factures.aggregate(total=models.Sum('montant_ttc')).get('total') or Decimal('0')
-            )
-        total_paye = (
-            Paiement.objects.filter(id_facture__id_bc=obj).aggregate(total=models.Sum('montant')).get('total')
-            or Decimal('0')
-        )
+            total_autorise = obj.total_facture
         reste = total_autorise - total_paye
         total_paye_pourcentage = (
             _quantize_money((total_paye / total_autorise) * Decimal('100')) if total_autorise > 0 else None
@@ -776,11 +913,6 @@ class BonCommandeSerializer(BaseDepthSerializer):
         reste_pourcentage = (
             _quantize_money((reste / total_autorise) * Decimal('100')) if total_autorise > 0 else None
         )
-        paiements = (
-            Paiement.objects.select_related('id_banque', 'id_methode_paiement', 'id_facture')
-            .filter(id_facture__id_bc=obj)
-            .order_by('-date_ordre', '-date_execution', '-id')
-        )
         items = []
         for paiement in paiements:
             pourcentage = (
@@ -809,10 +941,8 @@ class BonCommandeSerializer(BaseDepthSerializer):
                     if total_paye_pourcentage is not None
                     else None,
                     'reste_pourcentage': str(reste_pourcentage) if reste_pourcentage is not None else None,
-                    'banque': BanqueSerializer(paiement.id_banque).data if paiement.id_banque else None,
-                    'methode_paiement': MethodePaiementSerializer(paiement.id_methode_paiement).data
-                    if paiement.id_methode_paiement
-                    else None,
+                    'banque': self._serialize_cached(BanqueSerializer, paiement.id_banque),
+                    'methode_paiement': self._serialize_cached(MethodePaiementSerializer, paiement.id_methode_paiement),
                     'facture_id': str(paiement.id_facture_id) if paiement.id_facture_id else None,
                     'facture': (
                         {
@@ -831,6 +961,46 @@ class BonCommandeSerializer(BaseDepthSerializer):
         return items
 
 
+class BonCommandeListSerializer(BaseDepthSerializer):
+    """
+    Représentation résumée d'un bon de commande pour les listes : champs
+    scalaires et identifiants des relations, sans lignes ni paiements.
+    """
+
+    class Meta(BaseDepthSerializer.Meta):
+        model = BonCommande
+        depth = 0
+        fields = (
+            'id',
+            'numero_bc',
+            'statut_bc',
+            'type_achat',
+            'tva',
+            'remise',
+            'ca',
+            'montant_engage',
+            'id_ligne_budgetaire',
+            'transit',
+            'date_bc',
+            'echeance',
+            'date_envoi_fournisseur',
+            'conditions_paiement',
+            'delai_livraison',
+            'lieu_livraison',
+            'date_creation',
+            'date_modification',
+            'id_demande',
+            'id_fournisseur',
+            'id_departement',
+            'agent_traitant',
+            'id_demande_valider',
+            'id_methode_paiement',
+            'id_devise',
+            'id_redacteur',
+        )
+        read_only_fields = fields
+
+
 class SignatureBCSerializer(BaseDepthSerializer):
     id_bc_id = serializers.PrimaryKeyRelatedField(
         queryset=BonCommande.objects.all(),
@@ -1071,3 +1241,425 @@ class TransfertSerializer(BaseDepthSerializer):
 
     class Meta(BaseDepthSerializer.Meta):
         model = Transfert
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Clé étrangère résolue dans ``context['preloaded'][modèle]`` ({pk: objet},
+    chargé en une requête pour tout un lot) plutôt que par une requête par valeur.
+    """
+
+    def to_internal_value(self, data):
+        model = self.get_queryset().model
+        preloaded = self.context.get('preloaded', {}).get(model)
+        if preloaded is None:
+            return super().to_internal_value(data)
+        try:
+            pk = model._meta.pk.to_python(data)
+        except (DjangoValidationError, TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in preloaded:
+            self.fail('does_not_exist', pk_value=data)
+        return preloaded[pk]
+
+
+class BulkLigneSerializer(serializers.ModelSerializer):
+    """
+    Ligne d'un enregistrement en masse : ``id`` désigne une ligne existante à
+    modifier (validation partielle), sinon la ligne est créée.
+    """
+
+    id = serializers.UUIDField(required=False)
+    id_article_id = PreloadedPrimaryKeyRelatedField(
+        queryset=Article.objects.all(),
+        source='id_article',
+        required=False,
+        allow_null=True,
+    )
+    id_devise_id = PreloadedPrimaryKeyRelatedField(
+        queryset=Devise.objects.all(),
+        source='id_devise',
+        required=False,
+        allow_null=True,
+    )
+
+    # Identifiants de relations acceptés sous leur nom court (compat clients).
+    relation_aliases = {'id_article': 'id_article_id', 'id_devise': 'id_devise_id'}
+
+    @classmethod
+    def normalize(cls, item) -> dict:
+        item = dict(item)
+        for alias, name in cls.relation_aliases.items():
+            if alias in item and name not in item:
+                item[name] = item.pop(alias)
+        return item
+
+
+class LigneDemandeBulkSerializer(BulkLigneSerializer):
+    class Meta:
+        model = LigneDemande
+        fields = [
+            'id',
+            'id_article_id',
+            'id_devise_id',
+            'designation',
+            'quantite',
+            'prix_unitaire_estime',
+            'commentaire',
+        ]
+
+
+class LigneBCBulkSerializer(BulkLigneSerializer):
+    class Meta:
+        model = LigneBC
+        fields = [
+            'id',
+            'id_article_id',
+            'id_devise_id',
+            'designation',
+            'quantite',
+            'prix_unitaire',
+            'taux_tva',
+            'remise',
+            'ca',
+            'prix_net',
+        ]
+
+
+class BulkLignesSerializer(serializers.Serializer):
+    """
+    Enregistrement en masse des lignes d'un parent (demande, bon de commande) :
+    ``lignes`` à créer ou modifier et ``supprimer`` (identifiants des lignes à
+    supprimer). Les relations sont chargées une fois pour tout le lot ; les
+    écritures passent par ``bulk_create``/``bulk_update`` dans une transaction.
+    """
+
+    lignes = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    supprimer = serializers.ListField(child=serializers.UUIDField(), required=False, default=list)
+
+    item_serializer_class = None
+    parent_field = ''
+
+    def __init__(self, *args, parent_object=None, **kwargs):
+        self.parent_object = parent_object
+        super().__init__(*args, **kwargs)
+
+    @property
+    def item_model(self):
+        return self.item_serializer_class.Meta.model
+
+    def _preload(self, items) -> dict:
+        preloaded = {}
+        for name, field in self.item_serializer_class().fields.items():
+            if not isinstance(field, PreloadedPrimaryKeyRelatedField):
+                continue
+            model = field.get_queryset().model
+            values = set()
+            for item in items:
+                try:
+                    values.add(model._meta.pk.to_python(item.get(name)))
+                except (DjangoValidationError, TypeError, ValueError):
+                    continue
+            values.discard(None)
+            preloaded[model] = field.get_queryset().in_bulk(values) if values else {}
+        return preloaded
+
+    def validate(self, attrs):
+        items = [self.item_serializer_class.normalize(item) for item in attrs['lignes']]
+        limit = getattr(settings, 'BULK_LIGNES_MAX', 500)
+        if len(items) + len(attrs['supprimer']) > limit:
+            raise serializers.ValidationError(f'{limit} lignes au maximum par requête.')
+
+        errors = {}
+        ids = {}
+        for index, item in enumerate(items):
+            if item.get('id') in (None, ''):
+                continue
+            try:
+                ids[index] = self.item_model._meta.pk.to_python(item['id'])
+            except DjangoValidationError:
+                errors[index] = {'id': ['Identifiant invalide.']}
+        existing = self.item_model.objects.filter(
+            **{self.parent_field: self.parent_object}, pk__in=[*ids.values(), *attrs['supprimer']]
+        ).in_bulk()
+        unknown = [str(pk) for pk in attrs['supprimer'] if pk not in existing]
+        if unknown:
+            raise serializers.ValidationError({'supprimer': [f'Lignes introuvables : {", ".join(unknown)}.']})
+        deleted = set(attrs['supprimer'])
+
+        context = {**self.context, 'preloaded': self._preload(items)}
+        updates = []
+        creations = []
+        for index, item in enumerate(items):
+            if index in errors:
+                continue
+            instance = None
+            if index in ids:
+                instance = existing.get(ids[index])
+                if instance is None:
+                    errors[index] = {'id': ['Ligne introuvable.']}
+                    continue
+                if instance.pk in deleted:
+                    errors[index] = {'id': ['Ligne également supprimée.']}
+                    continue
+            serializer = self.item_serializer_class(instance, data=item, partial=instance is not None, context=context)
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+                continue
+            data = dict(serializer.validated_data)
+            data.pop('id', None)
+            if instance is None:
+                creations.append(data)
+            else:
+                updates.append((instance, data))
+        if errors:
+            raise serializers.ValidationError({'lignes': errors})
+        attrs['updates'] = updates
+        attrs['creations'] = creations
+        return attrs
+
+    def save(self, **kwargs):
+        from ..response_cache import bump_model_version
+        from ..signals import post_bulk_create
+
+        model = self.item_model
+        updates = self.validated_data['updates']
+        creations = self.validated_data['creations']
+        with transaction.atomic():
+            deleted = 0
+            if self.validated_data['supprimer']:
+                _, per_model = model.objects.filter(
+                    **{self.parent_field: self.parent_object}, pk__in=self.validated_data['supprimer']
+                ).delete()
+                deleted = per_model.get(model._meta.label, 0)
+            fields = set()
+            for instance, data in updates:
+                for name, value in data.items():
+                    setattr(instance, name, value)
+                fields.update(data)
+            if updates and fields:
+                model.objects.bulk_update([instance for instance, _ in updates], sorted(fields))
+                bump_model_version(model)
+            created = model.objects.bulk_create([model(**{self.parent_field: self.parent_object}, **data) for data in creations])
+            if created:
+                post_bulk_create.send(sender=model, instances=created)
+        return {'crees': len(created), 'modifies': len(updates), 'supprimes': deleted}
+
+
+class LignesDemandeBulkSerializer(BulkLignesSerializer):
+    item_serializer_class = LigneDemandeBulkSerializer
+    parent_field = 'id_demande'
+
+
+class LignesBCBulkSerializer(BulkLignesSerializer):
+    item_serializer_class = LigneBCBulkSerializer
+    parent_field = 'id_bc'
+
+
+class OrdreVirementItemSerializer(serializers.Serializer):
+    """
+    Ordre de virement d'un lot : bon de commande, pourcentage du total
+    autorisé et, au besoin, valeurs propres à l'ordre (banque, facture...).
+    """
+
+    bc_id = serializers.UUIDField()
+    pourcentage = serializers.DecimalField(max_digits=9, decimal_places=4)
+    banque_id = serializers.UUIDField(required=False, allow_null=True)
+    methode_paiement_id = serializers.UUIDField(required=False, allow_null=True)
+    facture_id = serializers.UUIDField(required=False, allow_null=True)
+    numero_facture = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    date_facture = serializers.DateField(required=False, allow_null=True)
+    date_ordre = serializers.DateField(required=False, allow_null=True)
+    date_execution = serializers.DateField(required=False, allow_null=True)
+    reference_virement = serializers.CharField(required=False, allow_blank=True, max_length=150)
+
+    # Noms acceptés par l'action unitaire ``ordre-virement`` (compat clients).
+    aliases = {
+        'id_bc': 'bc_id',
+        'bon_commande_id': 'bc_id',
+        'pourcentage_paiement': 'pourcentage',
+        'id_banque': 'banque_id',
+        'id_methode_paiement': 'methode_paiement_id',
+        'id_facture': 'facture_id',
+    }
+
+    @classmethod
+    def normalize(cls, item) -> dict:
+        item = dict(item)
+        for alias, name in cls.aliases.items():
+            if alias in item and name not in item:
+                item[name] = item.pop(alias)
+        return item
+
+    def validate_pourcentage(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Le pourcentage doit etre superieur a 0.')
+        return value
+
+
+class OrdresVirementBatchSerializer(serializers.Serializer):
+    """
+    Génération groupée d'ordres de virement : ``ordres`` et valeurs communes
+    (banque, méthode de paiement, dates). Tout le lot est validé avant
+    écriture, bons de commande verrouillés (la vue appelle ``is_valid`` et
+    ``save`` dans une même transaction) ; factures et paiements sont créés par
+    ``bulk_create`` et les totaux de chaque bon de commande mis à jour en une
+    requête.
+    """
+
+    ordres = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+    banque_id = serializers.UUIDField(required=False, allow_null=True)
+    methode_paiement_id = serializers.UUIDField(required=False, allow_null=True)
+    date_ordre = serializers.DateField(required=False, allow_null=True)
+    date_execution = serializers.DateField(required=False, allow_null=True)
+
+    def __init__(self, *args, bc_queryset=None, **kwargs):
+        self.bc_queryset = bc_queryset if bc_queryset is not None else BonCommande.objects.all()
+        super().__init__(*args, **kwargs)
+
+    def validate(self, attrs):
+        items = [OrdreVirementItemSerializer.normalize(item) for item in attrs['ordres']]
+        limit = getattr(settings, 'ORDRES_VIREMENT_BATCH_MAX', 500)
+        if len(items) > limit:
+            raise serializers.ValidationError(f'{limit} ordres au maximum par requête.')
+
+        errors = {}
+        valid = {}
+        for index, item in enumerate(items):
+            serializer = OrdreVirementItemSerializer(data=item)
+            if serializer.is_valid():
+                valid[index] = serializer.validated_data
+            else:
+                errors[index] = serializer.errors
+
+        def defaulted(data, name):
+            return data.get(name) or attrs.get(name)
+
+        bc_ids = {data['bc_id'] for data in valid.values()}
+        visible = list(self.bc_queryset.filter(pk__in=bc_ids).values_list('pk', flat=True))
+        bcs = BonCommande.objects.select_for_update().filter(pk__in=visible).in_bulk()
+        banques = Banque.objects.in_bulk({defaulted(data, 'banque_id') for data in valid.values()} - {None})
+        methodes = MethodePaiement.objects.in_bulk(
+            {defaulted(data, 'methode_paiement_id') for data in valid.values()} - {None}
+        )
+        methode_vir = None
+        if any(not defaulted(data, 'methode_paiement_id') for data in valid.values()):
+            methode_vir = MethodePaiement.objects.filter(code__iexact='VIR').first()
+        factures = Facture.objects.in_bulk({data.get('facture_id') for data in valid.values()} - {None})
+
+        paye_courant = {}
+        ordres = []
+        for index, data in valid.items():
+            bc = bcs.get(data['bc_id'])
+            if bc is None:
+                errors[index] = {'bc_id': ['Bon de commande introuvable.']}
+                continue
+            banque_id = defaulted(data, 'banque_id')
+            if not banque_id or banque_id not in banques:
+                detail = 'Banque introuvable.' if banque_id else 'Le champ banque_id est requis.'
+                errors[index] = {'banque_id': [detail]}
+                continue
+            methode_id = defaulted(data, 'methode_paiement_id')
+            methode = methodes.get(methode_id) if methode_id else methode_vir
+            if methode is None:
+                detail = 'Methode de paiement introuvable.' if methode_id else 'Methode de paiement VIR introuvable.'
+                errors[index] = {'methode_paiement_id': [detail]}
+                continue
+            facture = None
+            if data.get('facture_id'):
+                facture = factures.get(data['facture_id'])
+                if facture is None or facture.id_bc_id != bc.pk:
+                    errors[index] = {'facture_id': ['Facture introuvable pour ce bon de commande.']}
+                    continue
+
+            total_autorise, total_paye = totaux(bc)
+            # Plusieurs ordres d'un même bon de commande se cumulent dans le lot.
+            total_paye = paye_courant.get(bc.pk, total_paye)
+            if total_autorise <= 0:
+                errors[index] = {'bc_id': ['Impossible de calculer le total autorise pour ce bon de commande.']}
+                continue
+            reste = total_autorise - total_paye
+            if reste <= 0:
+                errors[index] = {'bc_id': ['Le montant total autorise est deja entierement paye.']}
+                continue
+            montant = min(_quantize_money((total_autorise * data['pourcentage']) / Decimal('100')), _quantize_money(reste))
+            if montant <= 0:
+                errors[index] = {'pourcentage': ['Le montant calcule est insuffisant.']}
+                continue
+            paye_courant[bc.pk] = total_paye + montant
+            ordres.append(
+                {
+                    'index': index,
+                    'bc': bc,
+                    'banque': banques[banque_id],
+                    'methode': methode,
+                    'facture': facture,
+                    'montant': montant,
+                    'total_autorise': total_autorise,
+                    'total_paye': total_paye,
+                    'data': data,
+                }
+            )
+        if errors:
+            raise serializers.ValidationError({'ordres': dict(sorted(errors.items()))})
+        attrs['ordres_valides'] = ordres
+        return attrs
+
+    def save(self, **kwargs):
+        from ..signals import post_bulk_create
+
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        tresorier = user if getattr(user, 'id', None) else None
+        today = timezone.now().date()
+        ordres = self.validated_data['ordres_valides']
+        factures = []
+        paiements = []
+        for ordre in ordres:
+            bc, data = ordre['bc'], ordre['data']
+            if ordre['facture'] is None:
+                ordre['facture'] = Facture(
+                    id_bc=bc,
+                    numero_facture=data.get('numero_facture') or numero_facture_auto(bc, f"-{ordre['index'] + 1}"),
+                    id_devise_id=bc.id_devise_id,
+                    montant_ht=ordre['montant'],
+                    montant_ttc=ordre['montant'],
+                    date_facture=data.get('date_facture') or today,
+                    statut_facture=StatutFacture.ATTENTE_PAIEMENT,
+                )
+                ordre['facture_creee'] = True
+                factures.append(ordre['facture'])
+            ordre['paiement'] = Paiement(
+                id_facture=ordre['facture'],
+                id_banque=ordre['banque'],
+                id_methode_paiement=ordre['methode'],
+                montant=ordre['montant'],
+                date_ordre=data.get('date_ordre') or self.validated_data.get('date_ordre') or ordre['facture'].date_facture,
+                date_execution=data.get('date_execution') or self.validated_data.get('date_execution'),
+                reference_virement=data.get('reference_virement', ''),
+                statut_paiement=StatutPaiement.EN_ATTENTE,
+                id_tresorier=tresorier,
+            )
+            paiements.append(ordre['paiement'])
+        with transaction.atomic(), deferred_deltas():
+            if factures:
+                Facture.objects.bulk_create(factures)
+                post_bulk_create.send(sender=Facture, instances=factures)
+            Paiement.objects.bulk_create(paiements)
+            post_bulk_create.send(sender=Paiement, instances=paiements)
+        return [
+            {
+                'index': ordre['index'],
+                'bc_id': str(ordre['bc'].pk),
+                'numero_bc': ordre['bc'].numero_bc,
+                'paiement_id': str(ordre['paiement'].pk),
+                'facture_id': str(ordre['facture'].pk),
+                'facture_creee': ordre.get('facture_creee', False),
+                'montant': str(ordre['montant']),
+                'pourcentage': str(ordre['data']['pourcentage']),
+                'total_autorise': str(ordre['total_autorise']),
+                'total_paye': str(ordre['total_paye']),
+                'reste': str(_quantize_money(ordre['total_autorise'] - ordre['total_paye'] - ordre['montant'])),
+            }
+            for ordre in ordres
+        ]
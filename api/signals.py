@@ -1,8 +1,18 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.apps import apps
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
 
+from . import access, budget, counters, facturation, response_cache
+from .authentication import bump_user_version, forget_users
+from .models.bon_commande import BonCommande
+from .models.demandes import Demande
+from .models.facturation_paiement import Facture, Paiement
+from .models.organisation import Role, Utilisateur
 from .models.transferts import Transfert
 
+# Émis après un bulk_create (qui ne déclenche pas post_save) : sender=modèle, instances=objets créés.
+post_bulk_create = Signal()
+
 
 @receiver(post_save, sender=Transfert)
 def retain_demande_access_on_transfer(sender, instance, created, **kwargs):
@@ -12,3 +22,183 @@ def retain_demande_access_on_transfer(sender, instance, created, **kwargs):
     agent = instance.agent
     if demande and agent:
         demande.utilisateurs_transferts.add(agent)
+
+
+def _touches_departement(update_fields) -> bool:
+    return update_fields is None or bool({'id_departement', 'id_departement_id'} & set(update_fields))
+
+
+@receiver(post_save, sender=Demande)
+def sync_demande_access(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches_departement(update_fields):
+        return
+    access.sync_demande(instance)
+    if not created:
+        access.sync_transferts(id_demande=instance.pk)
+
+
+@receiver(post_save, sender=BonCommande)
+def sync_bc_access(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or created or not _touches_departement(update_fields):
+        return
+    access.sync_transferts(id_bc=instance.pk)
+
+
+@receiver(post_save, sender=Transfert)
+def sync_transfert_access(sender, instance, raw=False, **kwargs):
+    if not raw:
+        access.sync_transferts(pk=instance.pk)
+
+
+@receiver(pre_delete, sender=Demande)
+@receiver(pre_delete, sender=BonCommande)
+def snapshot_transferts_access(sender, instance, **kwargs):
+    # Les transferts liés passent à NULL (SET_NULL, sans signal) : ils sont resynchronisés après suppression.
+    lookup = 'id_demande' if sender is Demande else 'id_bc'
+    instance._acces_transferts = list(Transfert.objects.filter(**{lookup: instance.pk}).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Demande)
+@receiver(post_delete, sender=BonCommande)
+def sync_transferts_access_on_delete(sender, instance, **kwargs):
+    transfert_ids = instance.__dict__.pop('_acces_transferts', None)
+    if transfert_ids:
+        access.sync_transferts(pk__in=transfert_ids)
+
+
+@receiver(m2m_changed, sender=Demande.utilisateurs_transferts.through)
+def sync_transferred_users_access(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add' and pk_set:
+        pairs = [(instance.pk, pk) for pk in pk_set] if reverse else [(pk, instance.pk) for pk in pk_set]
+        access.grant_users(pairs)
+    elif action == 'post_remove' and pk_set:
+        if reverse:
+            access.revoke_users(utilisateur_id=instance.pk, demande_id__in=pk_set)
+        else:
+            access.revoke_users(demande_id=instance.pk, utilisateur_id__in=pk_set)
+    elif action == 'post_clear':
+        if reverse:
+            access.revoke_users(utilisateur_id=instance.pk)
+        else:
+            access.revoke_users(demande_id=instance.pk)
+
+
+@receiver(post_save, sender=Utilisateur)
+def bump_token_version_on_user_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or created:
+        return
+    if update_fields is not None and set(update_fields) <= response_cache.IGNORED_UPDATE_FIELDS:
+        return
+    bump_user_version(pk=instance.pk)
+    instance.refresh_from_db(fields=['token_version'])
+
+
+@receiver(post_delete, sender=Utilisateur)
+def forget_deleted_user(sender, instance, **kwargs):
+    forget_users([instance.pk])
+
+
+@receiver(post_save, sender=Role)
+def bump_token_version_on_role_save(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        bump_user_version(id_role=instance.pk)
+
+
+def snapshot_counters(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        counters.before_save(instance, update_fields)
+
+
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        counters.after_save(instance, created)
+
+
+def snapshot_counters_on_delete(sender, instance, **kwargs):
+    counters.before_delete(instance)
+
+
+def update_counters_on_delete(sender, instance, **kwargs):
+    counters.after_delete(instance)
+
+
+@receiver(pre_save, sender=BonCommande)
+def snapshot_budget_engagement(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        budget.before_save(instance, update_fields)
+
+
+@receiver(post_save, sender=BonCommande)
+def post_budget_engagement(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        budget.after_save(instance, created)
+
+
+@receiver(pre_delete, sender=BonCommande)
+def snapshot_budget_engagement_on_delete(sender, instance, **kwargs):
+    budget.before_delete(instance)
+
+
+@receiver(post_delete, sender=BonCommande)
+def release_budget_engagement_on_delete(sender, instance, **kwargs):
+    budget.after_delete(instance)
+
+
+@receiver(post_bulk_create, sender=BonCommande)
+def post_budget_engagements_on_bulk_create(sender, instances, **kwargs):
+    budget.after_bulk_create(instances)
+
+
+@receiver(pre_save, sender=Facture)
+@receiver(pre_save, sender=Paiement)
+def snapshot_bc_totaux(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        facturation.before_save(instance, update_fields)
+
+
+@receiver(post_save, sender=Facture)
+@receiver(post_save, sender=Paiement)
+def update_bc_totaux(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        facturation.after_save(instance, created)
+
+
+@receiver(pre_delete, sender=Facture)
+@receiver(pre_delete, sender=Paiement)
+def snapshot_bc_totaux_on_delete(sender, instance, **kwargs):
+    facturation.before_delete(instance)
+
+
+@receiver(post_delete, sender=Facture)
+@receiver(post_delete, sender=Paiement)
+def update_bc_totaux_on_delete(sender, instance, **kwargs):
+    facturation.after_delete(instance)
+
+
+@receiver(post_bulk_create, sender=Facture)
+@receiver(post_bulk_create, sender=Paiement)
+def update_bc_totaux_on_bulk_create(sender, instances, **kwargs):
+    facturation.after_bulk_create(sender, instances)
+
+
+@receiver(post_bulk_create)
+def update_counters_on_bulk_create(sender, instances, **kwargs):
+    counters.after_bulk_create(sender, instances)
+    response_cache.bump_model_version(sender)
+
+
+for _label in {*counters.SPECS_BY_MODEL, *counters.DEPENDENT_MOVES}:
+    _model = apps.get_model(_label)
+    pre_save.connect(snapshot_counters, sender=_model, dispatch_uid=f'counters_pre_save_{_label}')
+    post_save.connect(update_counters_on_save, sender=_model, dispatch_uid=f'counters_post_save_{_label}')
+    pre_delete.connect(snapshot_counters_on_delete, sender=_model, dispatch_uid=f'counters_pre_delete_{_label}')
+    post_delete.connect(update_counters_on_delete, sender=_model, dispatch_uid=f'counters_post_delete_{_label}')
+
+for _model in response_cache.tracked_models():
+    _label = _model._meta.label
+    post_save.connect(response_cache.invalidate_on_save, sender=_model, dispatch_uid=f'response_cache_save_{_label}')
+    post_delete.connect(response_cache.invalidate_on_delete, sender=_model, dispatch_uid=f'response_cache_delete_{_label}')
+    if _model._meta.auto_created:
+        m2m_changed.connect(
+            response_cache.invalidate_on_m2m_changed, sender=_model, dispatch_uid=f'response_cache_m2m_{_label}'
+        )
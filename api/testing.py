@@ -0,0 +1,137 @@
+"""
+Outils de test : budgets de requêtes par route et croissance du nombre de
+requêtes avec le volume de données.
+
+Exemple dans un TestCase (client authentifié, données de test créées) ::
+
+    from api.testing import assert_route_budgets
+
+    def test_budgets(self):
+        assert_route_budgets(self.client)
+
+Chaque action GET des viewsets enregistrés dans ``api.routes.resources``
+(liste, détail, actions supplémentaires) ainsi que le tableau de bord est
+appelée ; les mesures de ``RequestInstrumentationMiddleware`` sont comparées
+aux budgets (``REQUEST_BUDGETS`` par défaut) et tout dépassement lève une
+``AssertionError`` listant les routes fautives.
+
+``assert_constant_queries`` appelle les mêmes routes avant et après un
+accroissement des données (par exemple de N à 2N lignes) et échoue si le
+nombre de requêtes d'une route a changé : un N+1 est détecté quel que soit
+le plafond configuré ::
+
+    def test_requetes_constantes(self):
+        assert_constant_queries(self.client, lambda: self.peupler(6))
+"""
+from django.core.cache import caches
+from django.urls import NoReverseMatch, reverse
+
+from .instrumentation import budget_violations, resolve_budget
+
+
+def _route_paths(registry, namespace: str):
+    """
+    (nom de route, chemin) des routes GET du routeur.
+    """
+    for prefix, viewset, basename in registry:
+        queryset = getattr(viewset, 'queryset', None)
+        instance = queryset.order_by().first() if queryset is not None else None
+        yield f'{namespace}:{basename}-list', reverse(f'{namespace}:{basename}-list')
+        if instance is not None:
+            yield f'{namespace}:{basename}-detail', reverse(f'{namespace}:{basename}-detail', args=[instance.pk])
+        for extra in viewset.get_extra_actions():
+            if 'get' not in extra.mapping:
+                continue
+            name = f'{namespace}:{basename}-{extra.url_name}'
+            try:
+                if extra.detail:
+                    if instance is None:
+                        continue
+                    yield name, reverse(name, args=[instance.pk])
+                else:
+                    yield name, reverse(name)
+            except NoReverseMatch:
+                continue
+
+
+def _routes(registry=None, extra_paths=None) -> list:
+    from .routes import resources as resources_routes
+
+    registry = resources_routes.router.registry if registry is None else registry
+    routes = list(_route_paths(registry, 'resources'))
+    if extra_paths is None:
+        extra_paths = [reverse('resources:dashboard')]
+    return routes + [(path, path) for path in extra_paths]
+
+
+def _get(client, path):
+    response = client.get(path)
+    metrics = getattr(response, 'request_metrics', None)
+    if metrics is None:
+        raise AssertionError('RequestInstrumentationMiddleware inactif : aucune mesure disponible.')
+    return response, metrics
+
+
+def assert_route_budgets(client, *, budgets=None, limits=('queries',), registry=None, extra_paths=None):
+    """
+    Vérifie les budgets de toutes les routes GET du routeur des ressources.
+
+    ``limits`` restreint les mesures contrôlées (le nombre de requêtes par
+    défaut, les durées étant trop variables en CI). Retourne les mesures
+    collectées, indexées par chemin.
+    """
+    measures = {}
+    failures = []
+    for _, path in _routes(registry, extra_paths):
+        response, metrics = _get(client, path)
+        measures[path] = metrics.as_dict()
+        if response.status_code >= 400:
+            if response.status_code not in (403, 404):
+                failures.append(f'{path} ({metrics.view}): statut {response.status_code}')
+            continue
+        budget = {key: value for key, value in resolve_budget(metrics.view, budgets).items() if key in limits}
+        violations = budget_violations(metrics, budget)
+        if violations:
+            failures.append(f'{path} ({metrics.view}): {", ".join(violations)}')
+    if failures:
+        raise AssertionError('Budgets de requêtes dépassés :\n' + '\n'.join(failures))
+    return measures
+
+
+def route_query_counts(client, *, routes=None, registry=None, extra_paths=None) -> dict:
+    """
+    Nombre de requêtes SQL de chaque route GET, indexé par nom de route (les
+    caches sont vidés avant chaque appel). ``routes`` : couples (nom, chemin)
+    déjà résolus, sinon ceux du routeur.
+    """
+    counts = {}
+    failures = []
+    for name, path in routes if routes is not None else _routes(registry, extra_paths):
+        for cache in caches.all():
+            cache.clear()
+        response, metrics = _get(client, path)
+        if response.status_code >= 400 and response.status_code not in (403, 404):
+            failures.append(f'{path} ({metrics.view}): statut {response.status_code}')
+        counts[name] = metrics.queries
+    if failures:
+        raise AssertionError('Routes en erreur :\n' + '\n'.join(failures))
+    return counts
+
+
+def assert_constant_queries(client, grow, *, registry=None, extra_paths=None) -> dict:
+    """
+    Vérifie que ``grow()`` (qui accroît les données, par exemple de N à 2N
+    lignes) ne change le nombre de requêtes d'aucune route GET. Les routes de
+    détail visent les mêmes objets avant et après. Retourne les nombres de
+    requêtes mesurés après accroissement.
+    """
+    routes = _routes(registry, extra_paths)
+    before = route_query_counts(client, routes=routes)
+    grow()
+    after = route_query_counts(client, routes=routes)
+    failures = [
+        f'{name}: {before[name]} -> {count} requêtes' for name, count in after.items() if count != before[name]
+    ]
+    if failures:
+        raise AssertionError('Nombre de requêtes dépendant du volume :\n' + '\n'.join(failures))
+    return after
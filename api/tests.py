@@ -1,3 +1,1031 @@
-from django.test import TestCase
+import datetime
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import (
+    access,
+    authentication,
+    budget,
+    caching,
+    counters,
+    execution,
+    facturation,
+    idempotency,
+    metrics,
+    response_cache,
+    sequences,
+)
+from .auth_utils import generate_tokens_for_user, log_audit
+from .engagements import compute_montant_engage
+from .facturation import drifted
+from .models import (
+    AuditLog,
+    Banque,
+    BonCommande,
+    Demande,
+    DemandeAcces,
+    Departement,
+    Devise,
+    Document,
+    Facture,
+    Fournisseur,
+    IdempotencyKey,
+    LigneBC,
+    LigneBudgetaire,
+    LigneDemande,
+    MethodePaiement,
+    Paiement,
+    Role,
+    Sequence,
+    Transfert,
+    Utilisateur,
+)
+from .models.demandes import StatutDemande
+from .pagination import KeysetPagination
+from .serializers import AuditLogSerializer
+from .signals import post_bulk_create
+from .testing import assert_constant_queries
+
+
+def utiliser_un_cache_partage(test):
+    """
+    Cache par défaut sur des fichiers (backend partagé) le temps d'un test.
+    """
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory)
+    test.enterContext(override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory},
+    }))
+
+
+class ApiTestCase(TestCase):
+    """
+    Données communes : deux départements, un super administrateur et un agent,
+    six demandes et bons de commande répartis entre les départements.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = Role.objects.create(code='SAD', libelle='Super administrateur')
+        cls.role_agent = Role.objects.create(code='AGENT', libelle='Agent')
+        cls.dept = Departement.objects.create(nom='Direction Generale')
+        cls.dept2 = Departement.objects.create(nom='Direction Commerciale')
+        cls.user = Utilisateur.objects.create_user(
+            'admin', 'admin@example.com', 'pw', phone='1', id_role=cls.role, id_departement=cls.dept, is_staff=True
+        )
+        cls.agent = Utilisateur.objects.create_user(
+            'agent', 'agent@example.com', 'pw', phone='2', id_role=cls.role_agent, id_departement=cls.dept2
+        )
+        cls.devise = Devise.objects.create(code_iso='XAF', libelle='Franc CFA', symbole='F')
+        cls.fournisseur = Fournisseur.objects.create(code_fournisseur='F1', raison_sociale='Fournisseur')
+        cls.banque = Banque.objects.create(code_banque='B1', nom='Banque')
+        cls.virement = MethodePaiement.objects.create(code='VIR', libelle='Virement')
+        cls.demandes = []
+        cls.bcs = []
+        for index in range(6):
+            departement = cls.dept if index % 2 else cls.dept2
+            demande = Demande.objects.create(objet=f'Demande {index}', id_departement=departement)
+            LigneDemande.objects.create(id_demande=demande, designation='Ligne', quantite=1, prix_unitaire_estime=10)
+            bc = BonCommande.objects.create(
+                id_demande=demande,
+                id_fournisseur=cls.fournisseur,
+                id_departement=departement,
+                id_devise=cls.devise,
+                id_redacteur=cls.user,
+                tva=Decimal('18'),
+            )
+            LigneBC.objects.create(id_bc=bc, designation='Ligne', quantite=2, prix_unitaire=100)
+            cls.demandes.append(demande)
+            cls.bcs.append(bc)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + generate_tokens_for_user(user)['access'])
+        return client
+
+    def facture(self, bc, montant_ttc, numero='F'):
+        return Facture.objects.create(
+            id_bc=bc,
+            numero_facture=numero,
+            id_devise=self.devise,
+            montant_ht=montant_ttc,
+            montant_ttc=Decimal(montant_ttc),
+            date_facture=datetime.date(2026, 1, 1),
+        )
+
+    def paiement(self, facture, montant):
+        return Paiement.objects.create(
+            id_facture=facture,
+            id_banque=self.banque,
+            id_methode_paiement=self.virement,
+            montant=Decimal(montant),
+        )
+
+
+class ExecutionBudgetaireTests(ApiTestCase):
+    def test_paye_par_code_ou_identifiant(self):
+        ligne = LigneBudgetaire.objects.create(
+            exercice=2026,
+            chapitre='C1',
+            article_budgetaire='A',
+            code_ligne='L1',
+            id_departement=self.dept,
+            id_devise=self.devise,
+            montant_budget=Decimal('1000'),
+        )
+        par_code, par_identifiant = self.bcs[1], self.bcs[3]
+        for bc, reference in ((par_code, 'L1'), (par_identifiant, str(ligne.pk))):
+            bc.id_ligne_budgetaire = reference
+            bc.montant_engage = Decimal('100')
+            bc.save()
+        self.paiement(self.facture(par_code, '100'), '40')
+        self.paiement(self.facture(par_identifiant, '100'), '25')
+
+        response = self.client_for(self.user).get('/lignes-budget/execution/')
+        self.assertEqual(response.status_code, 200, response.content)
+        total = response.json()['data'][-1]
+        self.assertEqual((total['montant_engage'], total['montant_paye']), ('200.00', '65.00'))
+
+    def test_paye_en_requetes_constantes(self):
+        payes = {}
+        for index, bc in enumerate(self.bcs):
+            ligne = LigneBudgetaire.objects.create(
+                exercice=2026,
+                chapitre=f'C{index % 2}',
+                article_budgetaire='A',
+                code_ligne=f'L{index}',
+                id_departement=self.dept,
+                id_devise=self.devise,
+                montant_budget=Decimal('1000'),
+            )
+            bc.id_ligne_budgetaire = ligne.code_ligne if index % 3 else str(ligne.pk)
+            bc.save()
+            if index in (3, 5):
+                continue
+            self.paiement(self.facture(bc, '100', numero=f'F{index}'), index + 1)
+            payes[f'C{index % 2}'] = payes.get(f'C{index % 2}', 0) + index + 1
+            with CaptureQueriesContext(connection) as queries:
+                rows = execution.execution_rows(LigneBudgetaire.objects.all())
+            # Rapport, paiements par référence, références résolues, lignes payées.
+            self.assertEqual(len(queries), 4)
+            self.assertFalse([query['sql'] for query in queries if 'REPLACE' in query['sql'].upper()])
+        chapitres = {row['chapitre']: row['montant_paye'] for row in rows if row['niveau'] == 'chapitre'}
+        self.assertEqual(chapitres, {'C0': f'{payes["C0"]}.00', 'C1': f'{payes["C1"]}.00'})
+
+    def test_disponibilite_montant_invalide(self):
+        ligne = LigneBudgetaire.objects.create(
+            exercice=2026,
+            chapitre='C1',
+            article_budgetaire='A',
+            code_ligne='L1',
+            id_departement=self.dept,
+            id_devise=self.devise,
+            montant_budget=Decimal('1000'),
+        )
+        client = self.client_for(self.user)
+        for montant in ('NaN', 'sNaN', 'Infinity', '-inf', 'abc'):
+            response = client.get(f'/lignes-budget/{ligne.pk}/disponibilite/', {'montant': montant})
+            self.assertEqual(response.status_code, 400, montant)
+        response = client.get(f'/lignes-budget/{ligne.pk}/disponibilite/', {'montant': '1e3'})
+        self.assertIs(response.json()['data']['suffisant'], True)
+
+
+class PaginationCurseurTests(ApiTestCase):
+    def parcourir(self, client, page_size):
+        """
+        Suit les curseurs d'une liste paginée ; retourne les identifiants par page.
+        """
+        pages, params = [], {'page_size': page_size}
+        while True:
+            response = client.get('/demandes/', params)
+            self.assertEqual(response.status_code, 200, response.content)
+            body = response.json()
+            pages.append([row['id'] for row in body['data']])
+            if not body['pagination']['has_next']:
+                self.assertIsNone(body['pagination']['next_cursor'])
+                return pages
+            params = {'page_size': page_size, 'cursor': body['pagination']['next_cursor']}
+
+    def test_aller_retour_des_curseurs(self):
+        client = self.client_for(self.user)
+        complete = [row['id'] for row in client.get('/demandes/').json()['data']]
+        pages = self.parcourir(client, 4)
+        self.assertEqual([len(page) for page in pages], [4, 2])
+        self.assertEqual(sum(pages, []), complete)
+
+    def test_egalite_sur_le_champ_de_tri(self):
+        # Même date de création partout : l'identifiant départage sans doublon ni oubli.
+        Demande.objects.update(date_creation=datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc))
+        attendu = [str(pk) for pk in Demande.objects.order_by('-id').values_list('pk', flat=True)]
+        pages = self.parcourir(self.client_for(self.user), 4)
+        self.assertEqual([len(page) for page in pages], [4, 2])
+        self.assertEqual(sum(pages, []), attendu)
+
+    def test_curseur_invalide(self):
+        response = self.client_for(self.user).get('/demandes/', {'cursor': 'invalide'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json())
+
+    def test_tri_sur_un_champ_nullable(self):
+        request = Request(APIRequestFactory().get('/demandes/', {'page_size': 2}))
+        paginator = KeysetPagination()
+        with self.assertRaises(ValidationError) as context:
+            paginator.paginate_queryset(Demande.objects.order_by('description'), request)
+        self.assertEqual(context.exception.status_code, 400)
+        self.assertIn('cursor', context.exception.detail)
+        self.assertEqual(len(paginator.paginate_queryset(Demande.objects.order_by('objet'), request)), 2)
+
+
+class BudgetsRoutesTests(ApiTestCase):
+    def peupler(self, nombre):
+        """
+        Ajoute ``nombre`` demandes et bons de commande avec lignes, facture,
+        paiement et transfert.
+        """
+        depart = Demande.objects.count()
+        for index in range(depart, depart + nombre):
+            departement = self.dept if index % 2 else self.dept2
+            demande = Demande.objects.create(objet=f'Demande {index}', id_departement=departement)
+            LigneDemande.objects.create(id_demande=demande, designation='Ligne', quantite=1, prix_unitaire_estime=10)
+            bc = BonCommande.objects.create(
+                id_demande=demande,
+                id_fournisseur=self.fournisseur,
+                id_departement=departement,
+                id_devise=self.devise,
+                id_redacteur=self.user,
+                tva=Decimal('18'),
+            )
+            LigneBC.objects.create(id_bc=bc, designation='Ligne', quantite=2, prix_unitaire=100)
+            self.paiement(self.facture(bc, '100', numero=f'F{index}'), '10')
+            Transfert.objects.create(
+                departement_source=self.dept,
+                departement_beneficiaire=self.dept2,
+                agent=self.user,
+                id_demande=demande,
+                id_bc=bc,
+            )
+
+    def test_requetes_constantes_de_n_a_2n(self):
+        for index, bc in enumerate(self.bcs):
+            self.paiement(self.facture(bc, '100', numero=f'F{index}'), '10')
+            Transfert.objects.create(
+                departement_source=self.dept,
+                departement_beneficiaire=self.dept2,
+                agent=self.user,
+                id_demande=self.demandes[index],
+                id_bc=bc,
+            )
+        for user in (self.user, self.agent):
+            with self.subTest(user=user.login):
+                assert_constant_queries(self.client_for(user), lambda: self.peupler(len(self.bcs)))
+
+
+class StatsRequetesTests(ApiTestCase):
+    ROUTES = ('/factures/stats/', '/paiements/stats/', '/transferts/stats/')
+
+    def compter(self, client, path):
+        for cache in caches.all():
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(context)
+
+    def ajouter(self, index):
+        bc = self.bcs[index]
+        self.paiement(self.facture(bc, '100', numero=f'F{index}'), '10')
+        Transfert.objects.create(
+            departement_source=self.dept,
+            departement_beneficiaire=self.dept2,
+            agent=self.user,
+            id_demande=self.demandes[index],
+            id_bc=bc,
+        )
+
+    def test_nombre_de_requetes_constant(self):
+        client = self.client_for(self.user)
+        self.ajouter(0)
+        avant = {path: self.compter(client, path) for path in self.ROUTES}
+        for index in range(1, 6):
+            self.ajouter(index)
+        apres = {path: self.compter(client, path) for path in self.ROUTES}
+        self.assertEqual(apres, avant)
+
+
+class MetriquesMultiprocessusTests(TestCase):
+    def test_archive_des_processus_arretes(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(metrics.registry.reset)
+        requests_key = metrics._labels_key({'view': 'DemandeViewSet', 'action': 'list'})
+        dead = os.path.join(directory, 'metrics_999999999.json')
+        with open(dead, 'w') as handle:
+            json.dump(
+                {
+                    'pid': 999999999,
+                    'values': {
+                        'sgbc_http_requests_total': {requests_key: 5},
+                        'sgbc_audit_entries_dropped_total': {'[]': 2},
+                        'sgbc_audit_queue_depth': {'[]': 7},
+                    },
+                },
+                handle,
+            )
+        metrics.registry.reset()
+        with override_settings(METRICS_MULTIPROC_DIR=directory):
+            for _ in range(2):
+                values = metrics.collect()
+                self.assertEqual(values['sgbc_http_requests_total'][requests_key], 5)
+                self.assertEqual(values['sgbc_audit_entries_dropped_total']['[]'], 2)
+                self.assertEqual(values['sgbc_audit_queue_depth']['[]'], 0)
+                self.assertFalse(os.path.exists(dead))
+        self.assertIn('# TYPE sgbc_audit_entries_dropped_total counter', metrics.render_prometheus(values))
+
+
+class AuthentificationCacheTests(ApiTestCase):
+    """
+    ``_users`` est remis dans son état antérieur pour simuler un autre worker
+    ayant encore l'entrée en mémoire.
+    """
+
+    def setUp(self):
+        utiliser_un_cache_partage(self)
+        self.addCleanup(authentication._users.clear)
+
+    def test_desactivation(self):
+        client = self.client_for(self.agent)
+        self.assertEqual(client.get('/devises/').status_code, 200)
+        entree = authentication._users[str(self.agent.pk)]
+
+        response = self.client_for(self.user).post(f'/utilisateurs/{self.agent.pk}/desactiver/')
+        self.assertEqual(response.status_code, 200, response.content)
+        authentication._users[str(self.agent.pk)] = entree
+        self.assertEqual(client.get('/devises/').status_code, 401)
+
+    def test_changement_de_mot_de_passe(self):
+        self.enterContext(mock.patch.object(authentication.api_settings, 'CHECK_REVOKE_TOKEN', True))
+        client = self.client_for(self.agent)
+        self.assertEqual(client.get('/devises/').status_code, 200)
+        entree = authentication._users[str(self.agent.pk)]
+
+        response = client.post(
+            '/auth/change-password/', {'old_password': 'pw', 'new_password': 'Nouveau-mot-2026'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        authentication._users[str(self.agent.pk)] = entree
+        self.assertEqual(client.get('/devises/').status_code, 401)
+
+    def test_backend_local_non_utilise(self):
+        self.enterContext(override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }))
+        self.assertEqual([message.id for message in caching.check_shared_caches(None)], ['api.W001'] * 2)
+        client = self.client_for(self.agent)
+        self.assertEqual(client.get('/devises/').status_code, 200)
+        self.assertEqual(authentication._users, {})
+
+        # Sans signal : seul un relu en base voit la désactivation.
+        Utilisateur.objects.filter(pk=self.agent.pk).update(is_active=False)
+        self.assertEqual(client.get('/devises/').status_code, 401)
+
+    def test_rafraichissement_recalcule_les_claims(self):
+        refresh = generate_tokens_for_user(self.agent)['refresh']
+        self.agent.id_departement = self.dept
+        self.agent.save()
+        self.agent.refresh_from_db()
+
+        response = self.client.post('/auth/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        access = AccessToken(response.json()['access'])
+        self.assertEqual((access['dept'], access['ver']), (str(self.dept.pk), self.agent.token_version))
+
+        self.agent.delete()
+        self.assertEqual(self.client.post('/auth/refresh/', {'refresh': refresh}, format='json').status_code, 401)
+
+
+class CacheReponsesTests(ApiTestCase):
+    def setUp(self):
+        utiliser_un_cache_partage(self)
+        self.addCleanup(authentication._users.clear)
+        self.addCleanup(response_cache._dependencies.clear)
+
+    def test_dependances_calculees_une_fois(self):
+        client = self.client_for(self.user)
+        with mock.patch.object(response_cache, 'query_dependencies', wraps=response_cache.query_dependencies) as spy:
+            self.assertEqual(client.get('/devises/stats/')['X-Response-Cache'], 'MISS')
+            Devise.objects.create(code_iso='EUR', libelle='Euro', symbole='E')
+            response = client.get('/devises/stats/')
+        self.assertEqual(response['X-Response-Cache'], 'MISS')
+        self.assertEqual(response.json()['data']['total'], 2)
+        self.assertEqual(spy.call_count, 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get('/devises/stats/')['X-Response-Cache'], 'HIT')
+
+    def test_portee_par_utilisateur_sans_requete(self):
+        client = self.client_for(self.agent)
+        total = client.get('/demandes/stats/').json()['data']['total']
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get('/demandes/stats/')['X-Response-Cache'], 'HIT')
+
+        self.demandes[1].utilisateurs_transferts.add(self.agent)
+        response = client.get('/demandes/stats/')
+        self.assertEqual(response['X-Response-Cache'], 'MISS')
+        self.assertEqual(response.json()['data']['total'], total + 1)
+
+    def test_backend_local_non_utilise(self):
+        self.enterContext(override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }))
+        client = self.client_for(self.user)
+        for _ in range(2):
+            self.assertNotIn('X-Response-Cache', client.get('/devises/stats/'))
+
+
+@override_settings(AUDIT_ASYNC=False)
+class ExportAuditTests(ApiTestCase):
+    def test_export_json_en_flux(self):
+        for index in range(3):
+            log_audit(self.user, 'export_test', details=f'ligne {index}\nsuite')
+        client = self.client_for(self.user)
+        response = client.get('/audit/logs/export/', {'format': 'json', 'action': 'export_test'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(sorted(row['details'] for row in rows), ['ligne 0\nsuite', 'ligne 1\nsuite', 'ligne 2\nsuite'])
+
+        response = client.get('/audit/logs/export/', {'format': 'json', 'action': 'aucune', 'compression': 'gzip'})
+        self.assertEqual(json.loads(gzip.decompress(b''.join(response.streaming_content))), [])
+
+    @override_settings(AUDIT_EXPORT_CHUNK_SIZE=2)
+    def test_export_json_champs_du_serializer(self):
+        for bc in self.bcs[:3]:
+            log_audit(self.user, 'export_test', type_objet='BON_COMMANDE', id_objet=bc.pk)
+        log_audit(self.user, 'export_test')
+        logs = AuditLog.objects.filter(action='export_test').order_by('-timestamp')
+        attendu = json.loads(JSONRenderer().render(AuditLogSerializer(logs, many=True).data))
+
+        response = self.client_for(self.user).get('/audit/logs/export/', {'format': 'json', 'action': 'export_test'})
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(rows, attendu)
+        self.assertEqual(rows[-1]['objet']['type'], 'BON_COMMANDE')
+        self.assertEqual(rows[0]['utilisateur']['login'], self.user.login)
+
+
+class AccesTransfertsTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.agent_dg = Utilisateur.objects.create_user(
+            'agent_dg', 'agent_dg@example.com', 'pw', phone='3', id_role=cls.role_agent, id_departement=cls.dept
+        )
+
+    def visibles(self, user, url):
+        response = self.client_for(user).get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return {row['id'] for row in response.json()['data']}
+
+    def transferer(self, url):
+        body = {'departement_id': str(self.dept2.pk), 'raison': 'Réaffectation'}
+        response = self.client_for(self.user).post(url, body)
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_transfert_de_demande(self):
+        demande = self.demandes[1]
+        self.assertIn(str(demande.pk), self.visibles(self.agent_dg, '/demandes/'))
+        self.transferer(f'/demandes/{demande.pk}/transfer/')
+        transfert = str(Transfert.objects.get(id_demande=demande).pk)
+
+        self.assertIn(str(demande.pk), self.visibles(self.agent, '/demandes/'))
+        self.assertNotIn(str(demande.pk), self.visibles(self.agent_dg, '/demandes/'))
+        # Le transfert reste visible du département source comme du bénéficiaire.
+        self.assertEqual(self.visibles(self.agent, '/transferts/'), {transfert})
+        self.assertEqual(self.visibles(self.agent_dg, '/transferts/'), {transfert})
+
+    def test_transfert_de_bon_de_commande(self):
+        bc = self.bcs[3]
+        self.transferer(f'/bons-commande/{bc.pk}/transfer/')
+        transfert = str(Transfert.objects.get(id_bc=bc).pk)
+
+        self.assertIn(str(bc.pk), self.visibles(self.agent, '/bons-commande/'))
+        self.assertNotIn(str(bc.pk), self.visibles(self.agent_dg, '/bons-commande/'))
+        # La demande liée suit le bon de commande.
+        self.assertIn(str(bc.id_demande_id), self.visibles(self.agent, '/demandes/'))
+        self.assertNotIn(str(bc.id_demande_id), self.visibles(self.agent_dg, '/demandes/'))
+        self.assertEqual(self.visibles(self.agent_dg, '/transferts/'), {transfert})
+
+    def test_agent_du_transfert_garde_la_demande(self):
+        demande = self.demandes[1]
+        demande.id_departement = self.dept2
+        demande.save(update_fields=['id_departement'])
+        Transfert.objects.create(
+            departement_source=self.dept, departement_beneficiaire=self.dept2, agent=self.agent_dg, id_demande=demande
+        )
+        self.assertIn(str(demande.pk), self.visibles(self.agent_dg, '/demandes/'))
+
+    def test_reconcile_demande_access(self):
+        demande = self.demandes[1]
+        Transfert.objects.create(
+            departement_source=self.dept, departement_beneficiaire=self.dept2, agent=self.agent_dg, id_demande=demande
+        )
+        expected = set(DemandeAcces.objects.values_list(*access.ACCES_FIELDS))
+        DemandeAcces.objects.filter(demande=demande).delete()
+        DemandeAcces.objects.create(departement=self.dept2, demande=self.demandes[3])
+
+        out = io.StringIO()
+        call_command('reconcile_demande_access', '--dry-run', stdout=out)
+        self.assertIn('2 ligne(s) manquante(s), 1 ligne(s) obsolète(s) (dry-run)', out.getvalue())
+        self.assertNotIn(str(demande.pk), self.visibles(self.agent_dg, '/demandes/'))
+
+        call_command('reconcile_demande_access', stdout=io.StringIO())
+        self.assertEqual(set(DemandeAcces.objects.values_list(*access.ACCES_FIELDS)), expected)
+        self.assertIn(str(demande.pk), self.visibles(self.agent_dg, '/demandes/'))
+        self.assertEqual(access.reconcile_access(dry_run=True), (0, 0))
+
+
+class TotauxFacturationTests(ApiTestCase):
+    def totaux(self, bc):
+        bc.refresh_from_db(fields=['total_facture', 'total_paye'])
+        return bc.total_facture, bc.total_paye
+
+    def assertSansEcart(self):
+        self.assertFalse(drifted(BonCommande.objects.all()).exists())
+
+    def test_creation_modification_suppression(self):
+        bc = self.bcs[0]
+        facture = self.facture(bc, '100')
+        paiement = self.paiement(facture, '30')
+        autre = self.paiement(facture, '20')
+        self.assertEqual(self.totaux(bc), (Decimal('100'), Decimal('50')))
+
+        paiement.montant = Decimal('35')
+        paiement.save()
+        facture.montant_ttc = Decimal('120')
+        facture.save(update_fields=['montant_ttc'])
+        self.assertEqual(self.totaux(bc), (Decimal('120'), Decimal('55')))
+        self.assertSansEcart()
+
+        paiement.delete()
+        self.assertEqual(self.totaux(bc), (Decimal('120'), Decimal('20')))
+        autre.delete()
+        facture.delete()
+        self.assertEqual(self.totaux(bc), (Decimal('0'), Decimal('0')))
+        self.assertSansEcart()
+
+    def test_deplacement_entre_bons_de_commande(self):
+        source, cible = self.bcs[0], self.bcs[1]
+        facture = self.facture(source, '100')
+        paiement = self.paiement(facture, '40')
+        facture.id_bc = cible
+        facture.save()
+        self.assertEqual(self.totaux(source), (Decimal('0'), Decimal('0')))
+        self.assertEqual(self.totaux(cible), (Decimal('100'), Decimal('40')))
+
+        paiement.id_facture = self.facture(source, '10', numero='F2')
+        paiement.save()
+        self.assertEqual(self.totaux(source), (Decimal('10'), Decimal('40')))
+        self.assertEqual(self.totaux(cible), (Decimal('100'), Decimal('0')))
+        self.assertSansEcart()
+
+    def test_creation_en_masse(self):
+        bc = self.bcs[2]
+        factures = Facture.objects.bulk_create(
+            Facture(
+                id_bc=bc,
+                numero_facture=f'F{index}',
+                id_devise=self.devise,
+                montant_ht=Decimal('50'),
+                montant_ttc=Decimal('50'),
+                date_facture=datetime.date(2026, 1, 1),
+            )
+            for index in range(3)
+        )
+        post_bulk_create.send(sender=Facture, instances=factures)
+        paiements = Paiement.objects.bulk_create(
+            Paiement(id_facture=facture, id_banque=self.banque, id_methode_paiement=self.virement, montant=Decimal('5'))
+            for facture in factures
+        )
+        post_bulk_create.send(sender=Paiement, instances=paiements)
+        self.assertEqual(self.totaux(bc), (Decimal('150'), Decimal('15')))
+        self.assertSansEcart()
+
+
+class CompteursTests(ApiTestCase):
+    def test_compteurs_suivent_les_ecritures(self):
+        demande = Demande.objects.create(objet='Nouvelle', id_departement=self.dept)
+        LigneDemande.objects.create(id_demande=demande, designation='Ligne', quantite=1, prix_unitaire_estime=10)
+        demande.statut_demande = StatutDemande.EN_TRAITEMENT
+        demande.save(update_fields=['statut_demande'])
+        demande.id_departement = self.dept2
+        demande.save()
+        self.bcs[0].delete()
+        self.assertEqual(counters.reconcile_counters(dry_run=True), [])
+
+        valeurs = counters.read_counters(self.dept2.pk)
+        self.assertEqual(valeurs['demandes'][StatutDemande.EN_TRAITEMENT], 1)
+        self.assertEqual(counters.counter_total(valeurs, 'lignes_demande'), 4)
+
+
+class BonCommandeTransactionTests(ApiTestCase):
+    def test_creation_et_montant_engage_ensemble(self):
+        payload = {
+            'id_demande_id': str(Demande.objects.create(objet='Nouvelle', id_departement=self.dept).pk),
+            'id_fournisseur_id': str(self.fournisseur.pk),
+            'id_departement_id': str(self.dept.pk),
+            'id_redacteur_id': str(self.user.pk),
+            'id_devise_id': str(self.devise.pk),
+        }
+        with mock.patch('api.views.resources.compute_montant_engage', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client_for(self.user).post('/bons-commande/', payload, format='json')
+        self.assertEqual(BonCommande.objects.count(), len(self.bcs))
+
+
+class EcrituresAtomiquesTests(TransactionTestCase):
+    """
+    Hors transaction de test (autocommit) : l'écriture et ses effets dérivés
+    sont validés ou annulés ensemble.
+    """
+
+    def setUp(self):
+        self.dept = Departement.objects.create(nom='Direction Generale')
+
+    def test_echec_des_compteurs_annule_la_creation(self):
+        with mock.patch.object(counters, 'apply_deltas', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                Demande.objects.create(objet='Demande', id_departement=self.dept)
+        self.assertFalse(Demande.objects.exists())
+        self.assertFalse(Sequence.objects.filter(name='demande').exists())
+
+    def bon_commande(self, **kwargs):
+        self.devise = Devise.objects.create(code_iso='XAF', libelle='Franc CFA', symbole='F')
+        return BonCommande.objects.create(
+            id_demande=Demande.objects.create(objet='Demande', id_departement=self.dept),
+            id_fournisseur=Fournisseur.objects.create(code_fournisseur='F1', raison_sociale='Fournisseur'),
+            id_departement=self.dept,
+            id_devise=self.devise,
+            id_redacteur=Utilisateur.objects.create_user('admin', 'admin@example.com', 'pw', phone='1'),
+            **kwargs,
+        )
+
+    def test_echec_du_registre_annule_la_modification(self):
+        bc = self.bon_commande(id_ligne_budgetaire='L1')
+        LigneBudgetaire.objects.create(
+            exercice=2026,
+            chapitre='C1',
+            article_budgetaire='A',
+            code_ligne='L1',
+            id_departement=self.dept,
+            id_devise=self.devise,
+            montant_budget=Decimal('1000'),
+        )
+        bc.montant_engage = Decimal('100')
+        with mock.patch.object(budget, 'post', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                bc.save()
+        bc.refresh_from_db()
+        self.assertEqual(bc.montant_engage, Decimal('0'))
+        self.assertEqual(budget.reconcile_lignes(dry_run=True), [])
+
+    def test_echec_des_totaux_annule_la_modification(self):
+        bc = self.bon_commande()
+        facture = Facture.objects.create(
+            id_bc=bc,
+            numero_facture='F1',
+            id_devise=self.devise,
+            montant_ht=Decimal('100'),
+            montant_ttc=Decimal('100'),
+            date_facture=datetime.date(2026, 1, 1),
+        )
+        facture.montant_ttc = Decimal('150')
+        with mock.patch.object(facturation, 'apply_deltas', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                facture.save()
+        facture.refresh_from_db()
+        self.assertEqual(facture.montant_ttc, Decimal('100'))
+        self.assertFalse(drifted(BonCommande.objects.all()).exists())
+
+
+class LignesBulkTests(ApiTestCase):
+    def endpoints(self):
+        """(url, modèle de ligne, lignes existantes, champ du prix) par parent."""
+        demande, bc = self.demandes[1], self.bcs[1]
+        ligne_demande, ligne_bc = demande.lignes.get(), bc.lignes.get()
+        autre_demande = LigneDemande.objects.create(id_demande=demande, designation='Autre', quantite=1)
+        autre_bc = LigneBC.objects.create(id_bc=bc, designation='Autre', quantite=1, prix_unitaire=10)
+        return (
+            (f'/demandes/{demande.pk}/lignes/bulk/', LigneDemande, ligne_demande, autre_demande, 'prix_unitaire_estime'),
+            (f'/bons-commande/{bc.pk}/lignes/bulk/', LigneBC, ligne_bc, autre_bc, 'prix_unitaire'),
+        )
+
+    def test_creation_modification_suppression(self):
+        client = self.client_for(self.user)
+        for url, model, ligne, supprimee, prix in self.endpoints():
+            with self.subTest(url=url):
+                body = {
+                    'lignes': [
+                        {'designation': 'Nouvelle', 'quantite': '1', prix: '50'},
+                        {'id': str(ligne.pk), 'quantite': '3'},
+                    ],
+                    'supprimer': [str(supprimee.pk)],
+                }
+                response = client.post(url, body, format='json')
+                self.assertEqual(response.status_code, 200, response.content)
+                data = response.json()['data']
+                self.assertEqual((data['crees'], data['modifies'], data['supprimes']), (1, 1, 1))
+                self.assertEqual(model.objects.get(pk=ligne.pk).quantite, 3)
+                self.assertFalse(model.objects.filter(pk=supprimee.pk).exists())
+                self.assertEqual(len(data['lignes']), 2)
+        self.assertEqual(counters.reconcile_counters(dry_run=True), [])
+
+    def test_ligne_modifiee_et_supprimee(self):
+        client = self.client_for(self.user)
+        for url, model, ligne, _, _ in self.endpoints():
+            with self.subTest(url=url):
+                body = {'lignes': [{'id': str(ligne.pk), 'quantite': '3'}], 'supprimer': [str(ligne.pk)]}
+                response = client.post(url, body, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['lignes'], {'0': {'id': ['Ligne également supprimée.']}})
+                self.assertTrue(model.objects.filter(pk=ligne.pk, quantite=ligne.quantite).exists())
+
+    @override_settings(BULK_LIGNES_MAX=2)
+    def test_limite(self):
+        client = self.client_for(self.user)
+        for url, model, ligne, _, prix in self.endpoints():
+            with self.subTest(url=url):
+                nouvelle = {'designation': 'Nouvelle', 'quantite': '1', prix: '50'}
+                body = {'lignes': [nouvelle, nouvelle], 'supprimer': [str(ligne.pk)]}
+                response = client.post(url, body, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('2 lignes au maximum par requête.', response.json()['non_field_errors'])
+                self.assertFalse(model.objects.filter(designation='Nouvelle').exists())
+
+    def test_un_seul_recalcul_du_montant_engage(self):
+        bc = self.bcs[1]
+        ligne = bc.lignes.get()
+        lignes = [{'designation': f'Nouvelle {index}', 'quantite': '1', 'prix_unitaire': '50'} for index in range(3)]
+        lignes.append({'id': str(ligne.pk), 'quantite': '3'})
+        client = self.client_for(self.user)
+        with mock.patch('api.views.resources.compute_montant_engage', wraps=compute_montant_engage) as compute:
+            response = client.post(f'/bons-commande/{bc.pk}/lignes/bulk/', {'lignes': lignes}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(compute.call_count, 1)
+        bc.refresh_from_db()
+        # (3 x 100 + 3 x 50) TTC à 18 %.
+        self.assertEqual(bc.montant_engage, Decimal('531'))
+        self.assertEqual(Decimal(str(response.json()['data']['montant_engage'])), bc.montant_engage)
+
+
+class OrdresVirementLotTests(ApiTestCase):
+    url = '/bons-commande/ordres-virement/batch/'
+
+    def setUp(self):
+        BonCommande.objects.filter(pk__in=[bc.pk for bc in self.bcs]).update(montant_engage=Decimal('1000'))
+
+    def lot(self, *ordres):
+        return {'banque_id': str(self.banque.pk), 'ordres': [{'bc_id': str(bc.pk), 'pourcentage': p} for bc, p in ordres]}
+
+    def totaux(self, bc):
+        bc.refresh_from_db(fields=['total_facture', 'total_paye'])
+        return bc.total_facture, bc.total_paye
+
+    def test_ordres_cumules_par_bon_de_commande(self):
+        a, b = self.bcs[1], self.bcs[3]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_for(self.user).post(self.url, self.lot((a, '30'), (a, '80'), (b, '10')), format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        ordres = response.json()['data']['ordres']
+        # Le second ordre de ``a`` est plafonné au reste après le premier.
+        self.assertEqual([ordre['montant'] for ordre in ordres], ['300.00', '700.00', '100.00'])
+        self.assertEqual(ordres[1]['reste'], '0.00')
+        self.assertEqual(self.totaux(a), (Decimal('1000'), Decimal('1000')))
+        self.assertEqual(self.totaux(b), (Decimal('100'), Decimal('100')))
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "api_boncommande"')]
+        self.assertEqual(len(updates), 2)
+        self.assertFalse(drifted(BonCommande.objects.all()).exists())
+
+    def test_tout_ou_rien(self):
+        a = self.bcs[1]
+        response = self.client_for(self.user).post(self.url, self.lot((a, '30'), (a, '0'), (self.bcs[3], '200')), format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(sorted(response.json()['ordres']), ['1'])
+        self.assertFalse(Paiement.objects.exists())
+        self.assertFalse(Facture.objects.exists())
+        self.assertEqual(self.totaux(a), (Decimal('0'), Decimal('0')))
+
+    def test_rejeu_idempotent(self):
+        client = self.client_for(self.user)
+        body = self.lot((self.bcs[1], '30'), (self.bcs[3], '50'))
+        premiere = client.post(self.url, body, format='json', HTTP_IDEMPOTENCY_KEY='lot')
+        self.assertEqual(premiere.status_code, 201, premiere.content)
+        seconde = client.post(self.url, body, format='json', HTTP_IDEMPOTENCY_KEY='lot')
+        self.assertEqual((seconde.status_code, seconde.json()), (201, premiere.json()))
+        self.assertEqual(seconde[idempotency.REPLAY_HEADER], 'true')
+        self.assertEqual(Paiement.objects.count(), 2)
+        self.assertEqual(self.totaux(self.bcs[1]), (Decimal('300'), Decimal('300')))
+
+
+class SequencesTests(TestCase):
+    def derniere_valeur(self, name):
+        return Sequence.objects.get(name=name, scope=sequences.GLOBAL_SCOPE).last_sequence
+
+    def test_allocate_block(self):
+        premier = sequences.allocate_block('test', size=3)
+        second = sequences.allocate_block('test', size=2)
+        self.assertEqual((list(premier), list(second)), ([1, 2, 3], [4, 5]))
+        self.assertEqual(sequences.allocate_block('test', size=0), range(0))
+        self.assertEqual(self.derniere_valeur('test'), 5)
+
+    def test_next_value_par_portee(self):
+        self.assertEqual([sequences.next_value('test', '2025') for _ in range(2)], [1, 2])
+        self.assertEqual(sequences.next_value('test', '2026'), 1)
+        self.assertEqual(sequences.ensure_at_least({('test', '2026'): 41, ('test', '2025'): 1}), 1)
+        self.assertEqual(sequences.next_value('test', '2026'), 42)
+
+    def test_numero_de_demande(self):
+        annee = sequences.year_scope()
+        sequences.ensure_at_least({(sequences.DEMANDE, annee): 41})
+        departement = Departement.objects.create(nom='Direction Generale')
+        demande = Demande.objects.create(objet='Demande', id_departement=departement)
+        self.assertEqual(demande.numero_demande, f'DM/NUM42/{annee}/')
+
+    @override_settings(SEQUENCE_BLOCK_SIZE=10)
+    def test_next_value_en_transaction(self):
+        # Dans une transaction, pas de bloc en cache : une valeur par appel.
+        self.assertEqual([sequences.next_value('test') for _ in range(3)], [1, 2, 3])
+        self.assertEqual(self.derniere_valeur('test'), 3)
+
+    def test_blocs_en_memoire(self):
+        allocator = sequences.BlockAllocator()
+        self.assertEqual(allocator.take('test', '', 4), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual([allocator.take('test', '', 4) for _ in range(3)], [2, 3, 4])
+        self.assertEqual(allocator.take('test', '', 4), 5)
+        self.assertEqual(self.derniere_valeur('test'), 8)
+
+
+class ImportBonsCommandeTests(ApiTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.enterContext(override_settings(MEDIA_ROOT=os.path.join(self.directory, 'media')))
+        for name in ('devis.pdf', 'proforma.pdf'):
+            with open(os.path.join(self.directory, name), 'wb') as handle:
+                handle.write(b'%PDF-1.4')
+
+    def importer(self, entries, **options):
+        path = os.path.join(self.directory, 'import.json')
+        with open(path, 'w') as handle:
+            json.dump(entries, handle)
+        call_command('import_bons_commande', path, stdout=io.StringIO(), **options)
+
+    def entree(self, index, **extra):
+        return {
+            'demande': self.demandes[index].numero_demande,
+            'fournisseur': self.fournisseur.code_fournisseur,
+            'departement': self.dept.code,
+            'devise': self.devise.code_iso,
+            'redacteur': self.user.login,
+            'tva': '18',
+            **extra,
+        }
+
+    def test_un_bloc_par_lot(self):
+        annee = datetime.date.today().year
+        document = {'fichier': 'devis.pdf', 'type_document': 'DEVIS', 'titre': 'Devis'}
+        entries = [
+            self.entree(0, documents=[document, {**document, 'fichier': 'proforma.pdf'}]),
+            self.entree(1, numero_bc=f'BC/NUM40/DAA/DG/{annee}'),
+            self.entree(2, montant_engage='150', documents=[document]),
+        ]
+        with mock.patch.object(sequences, 'allocate_block', wraps=sequences.allocate_block) as spy:
+            self.importer(entries, batch_size=2)
+        self.assertEqual(
+            [call.args for call in spy.call_args_list],
+            [
+                (sequences.BON_COMMANDE, str(annee), 1),
+                (sequences.DOCUMENT, sequences.GLOBAL_SCOPE, 2),
+                (sequences.BON_COMMANDE, str(annee), 1),
+                (sequences.DOCUMENT, sequences.GLOBAL_SCOPE, 1),
+            ],
+        )
+
+        # Le numéro fourni relève la séquence avant l'attribution du lot.
+        importes = BonCommande.objects.exclude(pk__in=[bc.pk for bc in self.bcs])
+        numeros = sorted(importes.values_list('numero_bc', flat=True))
+        self.assertEqual(numeros, [f'BC/NUM{n}/DAA/DG/{annee}' for n in (40, 41, 42)])
+        references = sorted(Document.objects.values_list('reference_fonctionnelle', flat=True))
+        self.assertEqual(references, ['DOC/NUM000001', 'DOC/NUM000002', 'DOC/NUM000003'])
+        bc = importes.get(numero_bc=f'BC/NUM41/DAA/DG/{annee}')
+        self.assertEqual(sorted(bc.documents.values_list('titre', flat=True)), ['Devis', 'Devis'])
+        self.assertTrue(all(os.path.exists(document.chemin_fichier.path) for document in bc.documents.all()))
+        self.assertEqual(counters.reconcile_counters(dry_run=True), [])
+
+    def test_import_refuse(self):
+        with self.assertRaisesMessage(CommandError, "#2: fournisseur introuvable ('INCONNU')."):
+            self.importer([self.entree(0), self.entree(1, fournisseur='INCONNU')])
+        self.assertEqual(BonCommande.objects.count(), len(self.bcs))
+
+
+class IdempotenceTests(ApiTestCase):
+    def executer(self, handler, key='cle', body=None):
+        request = Request(
+            APIRequestFactory().post('/action/', body or {'montant': '10'}, format='json', HTTP_IDEMPOTENCY_KEY=key),
+            parsers=[JSONParser()],
+        )
+        request.user = self.user
+        return idempotency.execute(request, handler)
+
+    def handler(self, status_code):
+        appels = []
+
+        def handler(request):
+            appels.append(request)
+            return Response({'appel': len(appels)}, status=status_code)
+
+        return handler, appels
+
+    def test_rejoue_la_reponse(self):
+        handler, appels = self.handler(201)
+        premiere = self.executer(handler)
+        seconde = self.executer(handler)
+        self.assertEqual(len(appels), 1)
+        self.assertEqual((seconde.status_code, seconde.data), (201, premiere.data))
+        self.assertEqual(seconde[idempotency.REPLAY_HEADER], 'true')
+
+    def test_cle_reutilisee_pour_une_autre_requete(self):
+        handler, appels = self.handler(201)
+        self.executer(handler)
+        response = self.executer(handler, body={'montant': '20'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(len(appels), 1)
+
+    def test_erreur_client_enregistree(self):
+        handler, appels = self.handler(400)
+        self.executer(handler)
+        response = self.executer(handler)
+        self.assertEqual((response.status_code, len(appels)), (400, 1))
+        self.assertEqual(response[idempotency.REPLAY_HEADER], 'true')
+
+    def test_erreur_serveur_annule_la_cle_et_les_effets(self):
+        def handler(request):
+            Departement.objects.create(nom='Effet')
+            return Response({}, status=500)
+
+        self.assertEqual(self.executer(handler).status_code, 500)
+        self.assertFalse(IdempotencyKey.objects.filter(key='cle').exists())
+        self.assertFalse(Departement.objects.filter(nom='Effet').exists())
+
+    def test_erreurs_levees_enregistrees(self):
+        client = self.client_for(self.user)
+        url = '/bons-commande/ordres-virement/batch/'
+        body = {'ordres': [{'bc_id': str(self.bcs[1].pk), 'pourcentage': '30', 'banque_id': str(self.banque.pk)}]}
+        premiere = client.post(url, body, format='json', HTTP_IDEMPOTENCY_KEY='lot')
+        self.assertEqual(premiere.status_code, 400, premiere.content)
+        BonCommande.objects.filter(pk=self.bcs[1].pk).update(montant_engage=Decimal('1000'))
+        seconde = client.post(url, body, format='json', HTTP_IDEMPOTENCY_KEY='lot')
+        self.assertEqual((seconde.status_code, seconde.json()), (400, premiere.json()))
+        self.assertEqual(seconde[idempotency.REPLAY_HEADER], 'true')
+        self.assertFalse(Paiement.objects.exists())
+
+        url = '/bons-commande/00000000-0000-0000-0000-000000000000/ordre-virement/'
+        for _ in range(2):
+            response = client.post(url, body['ordres'][0], format='json', HTTP_IDEMPOTENCY_KEY='absent')
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(response[idempotency.REPLAY_HEADER], 'true')
+
+    def test_base_verrouillee(self):
+        handler, appels = self.handler(201)
+        with mock.patch.object(IdempotencyKey.objects, 'create', side_effect=OperationalError('database is locked')):
+            response = self.executer(handler)
+        self.assertEqual((response.status_code, len(appels)), (409, 0))
+        self.assertEqual(self.executer(handler).status_code, 201)
+
+
+class MontantEngageTests(ApiTestCase):
+    def test_ca_numerique(self):
+        bc = self.bcs[0]
+        ligne = bc.lignes.get()
+        for ca, attendu in (('', '236.00'), ('1e3', '1236.00'), (' 2.5E-1 ', '236.25'), ('-.5e1', '231.00'), ('1e', '236.00')):
+            ligne.ca = ca
+            ligne.save(update_fields=['ca'])
+            self.assertEqual(compute_montant_engage(bc), Decimal(attendu), ca)
@@ -0,0 +1,60 @@
+"""
+Jetons JWT portant le contexte d'autorisation de l'utilisateur.
+
+En plus de l'identifiant, les jetons émis embarquent le code du rôle
+(``role``), le département (``dept``) et la version du compte (``ver``,
+``Utilisateur.token_version``). La version permet à
+``PrincipalJWTAuthentication`` de servir l'utilisateur depuis son cache sans
+relire la base ; le rafraîchissement recalcule ces claims depuis le compte.
+"""
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+ROLE_CLAIM = 'role'
+DEPARTEMENT_CLAIM = 'dept'
+VERSION_CLAIM = 'ver'
+
+
+def user_claims(user) -> dict:
+    role = getattr(user, 'id_role', None)
+    departement_id = getattr(user, 'id_departement_id', None)
+    return {
+        ROLE_CLAIM: (getattr(role, 'code', '') or '').strip().upper(),
+        DEPARTEMENT_CLAIM: str(departement_id) if departement_id else None,
+        VERSION_CLAIM: getattr(user, 'token_version', 0),
+    }
+
+
+class UserRefreshToken(RefreshToken):
+    """
+    Refresh token dont l'access token dérivé recopie les claims utilisateur.
+
+    Un refresh token relu (rafraîchissement) recalcule ces claims depuis le
+    compte courant avant de dériver l'access token.
+    """
+
+    _user_claims_set = False
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.set_user_claims(user)
+        return token
+
+    def set_user_claims(self, user) -> None:
+        for claim, value in user_claims(user).items():
+            self[claim] = value
+        self._user_claims_set = True
+
+    @property
+    def access_token(self):
+        if not self._user_claims_set:
+            user = (
+                get_user_model().objects.select_related('id_role')
+                .filter(**{api_settings.USER_ID_FIELD: self.payload.get(api_settings.USER_ID_CLAIM)})
+                .first()
+            )
+            if user is not None:
+                self.set_user_claims(user)
+        return super().access_token
@@ -1,11 +1,18 @@
 import csv
+import json
+import zlib
 from datetime import datetime, time
+from itertools import islice
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import generics, permissions, status
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
 from ..models import AuditLog
@@ -46,19 +53,139 @@ def _apply_filters(queryset, request):
     return queryset
 
 
+AUDIT_USER_RELATED = ('id_utilisateur', 'id_utilisateur__id_role', 'id_utilisateur__id_departement')
+
+EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('action', 'action'),
+    ('type_objet', 'type_objet'),
+    ('id_objet', 'id_objet'),
+    ('timestamp', 'timestamp'),
+    ('user_login', 'id_utilisateur__login'),
+    ('user_email', 'id_utilisateur__email'),
+    ('ip_client', 'ip_client'),
+    ('details', 'details'),
+)
+EXPORT_BUFFER_ROWS = 500
+
+
+class EchoBuffer:
+    """Pseudo-fichier pour csv.writer : retourne la ligne au lieu de l'écrire."""
+
+    def write(self, value):
+        return value
+
+
+def _iter_export_rows(qs, chunk_size: int):
+    """
+    Parcourt les journaux en lecture seule (``values_list`` + ``iterator``)
+    sans instancier de modèles ni charger la table en mémoire.
+    """
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS]
+    for row in qs.values_list(*lookups).iterator(chunk_size=chunk_size):
+        (log_id, action, type_objet, id_objet, timestamp, login, email, ip_client, details) = row
+        yield {
+            'id': str(log_id),
+            'action': action,
+            'type_objet': type_objet,
+            'id_objet': str(id_objet) if id_objet else None,
+            'timestamp': timestamp.isoformat() if timestamp else None,
+            'user_login': login or '',
+            'user_email': email or '',
+            'ip_client': ip_client or '',
+            'details': details.replace('\n', ' ') if details else '',
+        }
+
+
+def _iter_serialized_logs(qs, chunk_size: int):
+    """
+    Journaux sérialisés par ``AuditLogSerializer`` (mêmes champs que la liste)
+    par lots de ``chunk_size`` : les objets audités d'un lot sont chargés en
+    une requête par type.
+    """
+    logs = qs.iterator(chunk_size=chunk_size)
+    while batch := list(islice(logs, chunk_size)):
+        yield from AuditLogSerializer(batch, many=True).data
+
+
+def _csv_chunks(rows):
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow([column for column, _ in EXPORT_COLUMNS])
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow([row[column] or '' for column, _ in EXPORT_COLUMNS]))
+        if len(buffer) >= EXPORT_BUFFER_ROWS:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _ndjson_chunks(rows):
+    buffer = []
+    for row in rows:
+        buffer.append(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+        if len(buffer) >= EXPORT_BUFFER_ROWS:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _json_chunks(rows):
+    """
+    Tableau JSON produit au fil des journaux sérialisés, encodé comme par le
+    ``JSONRenderer`` de DRF.
+    """
+    yield '['
+    buffer = []
+    for index, row in enumerate(rows):
+        buffer.append((',' if index else '') + json.dumps(row, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')))
+        if len(buffer) >= EXPORT_BUFFER_ROWS:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+    yield ']'
+
+
+def _encode_chunks(chunks, *, gzip_enabled: bool):
+    if not gzip_enabled:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """
+    Le paramètre ``format`` désigne ici le format d'export (csv, ndjson, json)
+    et non un renderer DRF : les réponses non streamées restent en JSON.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderer = renderers[0]
+        return renderer, renderer.media_type
+
+
 class AuditLogListView(generics.ListAPIView):
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        base = AuditLog.objects.select_related('id_utilisateur').order_by('-timestamp')
+        base = AuditLog.objects.select_related(*AUDIT_USER_RELATED).order_by('-timestamp')
         return _apply_filters(base, self.request)
 
 
 class AuditLogDetailView(generics.RetrieveAPIView):
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAuthenticated]
-    queryset = AuditLog.objects.select_related('id_utilisateur')
+    queryset = AuditLog.objects.select_related(*AUDIT_USER_RELATED)
     lookup_field = 'id'
     lookup_url_kwarg = 'pk'
 
@@ -68,7 +195,7 @@ class AuditObjectHistoryView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        base = AuditLog.objects.select_related('id_utilisateur').filter(
+        base = AuditLog.objects.select_related(*AUDIT_USER_RELATED).filter(
             type_objet=self.kwargs['type_objet'],
             id_objet=self.kwargs['id_objet'],
         ).order_by('-timestamp')
@@ -77,34 +204,32 @@ class AuditObjectHistoryView(generics.ListAPIView):
 
 class AuditLogExportView(APIView):
     permission_classes = [permissions.IsAdminUser]
+    content_negotiation_class = ExportContentNegotiation
 
     def get(self, request):
         format_param = request.GET.get('format', 'csv').lower()
-        qs = _apply_filters(AuditLog.objects.select_related('id_utilisateur').order_by('-timestamp'), request)
-
-        if format_param == 'json':
-            serializer = AuditLogSerializer(qs, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-
-        if format_param != 'csv':
-            return Response({'detail': "Format supportés: csv, json"}, status=status.HTTP_400_BAD_REQUEST)
-
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="audit_logs.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['id', 'action', 'type_objet', 'id_objet', 'timestamp', 'user_login', 'user_email', 'ip_client', 'details'])
-
-        for log in qs:
-            writer.writerow([
-                log.id,
-                log.action,
-                log.type_objet,
-                log.id_objet,
-                log.timestamp.isoformat(),
-                getattr(log.id_utilisateur, 'login', ''),
-                getattr(log.id_utilisateur, 'email', ''),
-                log.ip_client or '',
-                log.details.replace('\n', ' ') if log.details else '',
-            ])
-
+        compression = (request.GET.get('compression') or '').lower()
+        qs = _apply_filters(AuditLog.objects.select_related(*AUDIT_USER_RELATED).order_by('-timestamp'), request)
+
+        if format_param not in ('csv', 'ndjson', 'json'):
+            return Response({'detail': "Format supportés: csv, ndjson, json"}, status=status.HTTP_400_BAD_REQUEST)
+        if compression not in ('', 'gzip'):
+            return Response({'detail': 'Compression supportée: gzip'}, status=status.HTTP_400_BAD_REQUEST)
+
+        chunk_size = getattr(settings, 'AUDIT_EXPORT_CHUNK_SIZE', 2000)
+        if format_param == 'csv':
+            chunks, content_type, filename = _csv_chunks(_iter_export_rows(qs, chunk_size)), 'text/csv', 'audit_logs.csv'
+        elif format_param == 'ndjson':
+            chunks = _ndjson_chunks(_iter_export_rows(qs, chunk_size))
+            content_type, filename = 'application/x-ndjson', 'audit_logs.ndjson'
+        else:
+            # Mêmes champs que l'export JSON historique (AuditLogSerializer).
+            chunks = _json_chunks(_iter_serialized_logs(qs, chunk_size))
+            content_type, filename = 'application/json', 'audit_logs.json'
+
+        gzip_enabled = compression == 'gzip'
+        if gzip_enabled:
+            content_type, filename = 'application/gzip', f'{filename}.gz'
+        response = StreamingHttpResponse(_encode_chunks(chunks, gzip_enabled=gzip_enabled), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
@@ -6,7 +6,6 @@ from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from ..auth_utils import (
@@ -26,6 +25,7 @@ from ..serializers.auth import (
     TwoFAVerifySerializer,
     UserProfileUpdateSerializer,
     UserSerializer,
+    UserTokenRefreshSerializer,
 )
 
 User = get_user_model()
@@ -96,7 +96,7 @@ class RefreshView(APIView):
             return Response({'detail': 'Refresh token invalide'}, status=status.HTTP_401_UNAUTHORIZED)
 
         user = get_user_from_id(submitted_token.get('user_id'))
-        serializer = TokenRefreshSerializer(data={'refresh': token_str})
+        serializer = UserTokenRefreshSerializer(data={'refresh': token_str})
         try:
             serializer.is_valid(raise_exception=True)
         except InvalidToken as exc:
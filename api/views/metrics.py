@@ -0,0 +1,30 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+from ..metrics import render_prometheus
+
+
+class IsAdminOrMetricsToken(permissions.BasePermission):
+    """
+    Accès réservé aux administrateurs ou aux collecteurs présentant METRICS_TOKEN
+    (en-tête X-Metrics-Token ou paramètre ?token=).
+    """
+
+    def has_permission(self, request, view):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and user.is_staff:
+            return True
+        expected = getattr(settings, 'METRICS_TOKEN', '')
+        provided = request.headers.get('X-Metrics-Token') or request.query_params.get('token') or ''
+        return bool(expected) and hmac.compare_digest(provided.encode(), expected.encode())
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminOrMetricsToken]
+
+    def get(self, request):
+        return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
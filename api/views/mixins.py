@@ -1,11 +1,231 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import BooleanField, Case, Count, F, Prefetch, Value, When, Window
+from django.db.models.functions import RowNumber
 from rest_framework import mixins, permissions, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
 
+from .. import idempotency
 from ..auth_utils import log_audit
+from ..instrumentation import InstrumentedViewMixin
+from ..principal import get_principal
+from ..serializers.resources import EXPAND_ALL, DynamicFieldsMixin, parse_field_list
+
+
+def request_wants_expand(request) -> bool:
+    """
+    Indique si le client demande explicitement la représentation complète (?expand=).
+    """
+    return bool(request is not None and request.query_params.get('expand'))
+
+
+def _select_related_paths(select_related, prefix=''):
+    for name, children in select_related.items():
+        path = f'{prefix}{name}'
+        if children:
+            yield from _select_related_paths(children, f'{path}__')
+        else:
+            yield path
+
+
+def _lookup_root(lookup) -> str:
+    path = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+    return path.split('__', 1)[0]
+
+
+def _relation_accessor(model_field) -> str:
+    if not model_field.concrete and hasattr(model_field, 'get_accessor_name'):
+        return model_field.get_accessor_name()
+    return model_field.name
+
+
+def apply_sparse_fieldset(queryset, serializer, fields=None, expand=None):
+    """
+    Ajuste le queryset aux champs réellement sérialisés : les relations
+    préchargées sont limitées aux champs conservés (et détaillés si ``expand``),
+    les relations multiples réduites à leurs identifiants sont préchargées sans
+    colonnes superflues et ``fields`` se traduit par un ``.only()``.
+
+    Les champs calculés (SerializerMethodField) pouvant lire n'importe quel
+    attribut, leur présence désactive l'optimisation.
+    """
+    select_related = queryset.query.select_related
+    if select_related is True:
+        return queryset
+    readable = {name: field for name, field in serializer.fields.items() if not field.write_only}
+    if any(field.source == '*' or '.' in field.source for field in readable.values()):
+        return queryset
+
+    opts = queryset.model._meta
+    columns = {opts.pk.name}
+    relations = {}
+    for name, field in readable.items():
+        try:
+            model_field = opts.get_field(field.source)
+        except FieldDoesNotExist:
+            if fields:
+                return queryset
+            continue
+        if model_field.concrete:
+            columns.add(model_field.name)
+        if model_field.is_relation:
+            relations[name] = model_field
+
+    expand_all = bool(expand and expand & EXPAND_ALL)
+    collapsed = set() if not expand or expand_all else set(relations) - expand
+    allowed_roots = {_relation_accessor(f) for name, f in relations.items() if name not in collapsed}
+
+    kept_select = [
+        path for path in _select_related_paths(select_related or {}) if path.split('__', 1)[0] in allowed_roots
+    ]
+    kept_prefetch = [lookup for lookup in queryset._prefetch_related_lookups if _lookup_root(lookup) in allowed_roots]
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if kept_select:
+        queryset = queryset.select_related(*kept_select)
+    if kept_prefetch:
+        queryset = queryset.prefetch_related(*kept_prefetch)
+
+    if expand and not expand_all:
+        selected = {path.split('__', 1)[0] for path in kept_select}
+        prefetched = {_lookup_root(lookup) for lookup in kept_prefetch}
+        for name, model_field in relations.items():
+            accessor = _relation_accessor(model_field)
+            many = model_field.many_to_many or model_field.one_to_many
+            if name not in collapsed:
+                if many and accessor not in prefetched:
+                    queryset = queryset.prefetch_related(accessor)
+                elif not many and accessor not in selected:
+                    queryset = queryset.select_related(accessor)
+            elif many:
+                # Relation réduite aux identifiants : seules les clés sont chargées.
+                related_model = model_field.related_model
+                only = [related_model._meta.pk.name]
+                if model_field.one_to_many:
+                    only.append(model_field.field.name)
+                queryset = queryset.prefetch_related(
+                    Prefetch(accessor, queryset=related_model._default_manager.only(*only))
+                )
+
+    # Un sous-serializer peut relire l'objet parent (ex. LigneBC.id_bc) : le
+    # .only() n'est appliqué que si toutes les relations sont réduites aux identifiants.
+    if fields and not any(isinstance(field, BaseSerializer) for field in readable.values()):
+        for item in queryset.query.order_by:
+            name = item.lstrip('-+') if isinstance(item, str) else ''
+            if name and '__' not in name:
+                columns.add(opts.pk.name if name == 'pk' else name)
+        queryset = queryset.only(*columns)
+    return queryset
+
+
+def without_duplicates(queryset):
+    """
+    Remplace un queryset ``distinct()`` (jointures multiples, ex. OR sur une
+    relation M2M) par un filtre ``pk__in`` : agrégats et fenêtres portent alors
+    sur des lignes uniques.
+    """
+    if not queryset.query.distinct:
+        return queryset
+    flat = queryset.model._default_manager.filter(pk__in=queryset.order_by().values('pk'))
+    select_related = queryset.query.select_related
+    if select_related is True:
+        flat = flat.select_related()
+    elif select_related:
+        flat = flat.select_related(*_select_related_paths(select_related))
+    if queryset._prefetch_related_lookups:
+        flat = flat.prefetch_related(*queryset._prefetch_related_lookups)
+    flat.query.deferred_loading = queryset.query.deferred_loading
+    return flat
+
+
+def aggregate_counts(queryset, counts=None) -> dict:
+    """
+    Total et compteurs conditionnels (``{clé: Q}``) en une seule requête.
+    """
+    queryset = without_duplicates(queryset).order_by()
+    aggregates = {'total': Count('pk')}
+    for key, condition in (counts or {}).items():
+        aggregates[key] = Count('pk', filter=condition)
+    return queryset.aggregate(**aggregates)
+
+
+def latest_by_group(queryset, groups, order_by, limit: int = 5) -> dict:
+    """
+    Les ``limit`` derniers objets de chaque groupe (``{clé: Q ou None}``, None
+    désignant tout le queryset) en une seule requête fenêtrée :
+    ``ROW_NUMBER() OVER (PARTITION BY <appartenance au groupe> ORDER BY ...)``.
+    """
+    if not groups:
+        return {}
+    queryset = without_duplicates(queryset).order_by()
+    annotations = {}
+    keep = []
+    for index, condition in enumerate(groups.values()):
+        member = f'_stats_in_{index}'
+        rank = f'_stats_rank_{index}'
+        if condition is None:
+            annotations[member] = Value(True, output_field=BooleanField())
+            annotations[rank] = Window(RowNumber(), order_by=list(order_by))
+        else:
+            annotations[member] = Case(When(condition, then=Value(True)), default=Value(False), output_field=BooleanField())
+            annotations[rank] = Window(RowNumber(), partition_by=[F(member)], order_by=list(order_by))
+        keep.append(When(**{member: True, f'{rank}__lte': limit}, then=Value(True)))
+    queryset = queryset.annotate(**annotations).annotate(
+        _stats_keep=Case(*keep, default=Value(False), output_field=BooleanField())
+    )
+    rows = list(queryset.filter(_stats_keep=True))
+    result = {}
+    for index, key in enumerate(groups):
+        member = f'_stats_in_{index}'
+        rank = f'_stats_rank_{index}'
+        selected = [row for row in rows if getattr(row, member) and getattr(row, rank) <= limit]
+        result[key] = sorted(selected, key=lambda row: getattr(row, rank))
+    return result
+
+
+def serialize_groups(serializer_factory, groups: dict) -> dict:
+    """
+    Sérialise une seule fois les objets communs à plusieurs groupes.
+    """
+    unique = {}
+    for rows in groups.values():
+        for row in rows:
+            unique.setdefault(row.pk, row)
+    if not unique:
+        return {key: [] for key in groups}
+    payloads = dict(zip(unique, serializer_factory(list(unique.values()), many=True).data))
+    return {key: [payloads[row.pk] for row in rows] for key, rows in groups.items()}
+
+
+class IdempotentActionsMixin:
+    """
+    Exécute une seule fois les actions de ``idempotent_actions`` appelées avec
+    l'en-tête ``Idempotency-Key`` (voir ``api.idempotency``).
+    """
+
+    idempotent_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            getattr(self, 'action', None) in self.idempotent_actions
+            and request.method not in permissions.SAFE_METHODS
+            and request.headers.get(idempotency.HEADER, '').strip()
+            and getattr(request.user, 'is_authenticated', False)
+        ):
+            # Le handler est résolu par dispatch() après initial() : il est remplacé ici.
+            method = request.method.lower()
+            handler = getattr(self, method)
+
+            def idempotent_handler(request, *args, **kwargs):
+                return idempotency.execute(request, handler, *args, **kwargs)
+
+            setattr(self, method, idempotent_handler)
 
 
 class AuditModelViewSet(
+    IdempotentActionsMixin,
+    InstrumentedViewMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
     mixins.RetrieveModelMixin,
@@ -20,6 +240,66 @@ class AuditModelViewSet(
     permission_classes = [permissions.IsAuthenticated]
     audit_prefix = ''
     audit_type = ''
+    # Serializer résumé (champs scalaires + identifiants) utilisé par les actions
+    # de liste, sauf si ?expand= est fourni.
+    summary_serializer_class = None
+    summary_actions = ('list', 'stats')
+    # Actions n'utilisant aucune relation préchargée de l'objet (ex. écritures en masse).
+    bare_object_actions = ()
+
+    @property
+    def principal(self):
+        """
+        Contexte d'autorisation (rôle, département, portée) de l'utilisateur courant.
+        """
+        return get_principal(self.request.user)
+
+    def uses_summary_serializer(self) -> bool:
+        return (
+            self.summary_serializer_class is not None
+            and getattr(self, 'action', None) in self.summary_actions
+            and not request_wants_expand(getattr(self, 'request', None))
+        )
+
+    # Actions de lecture acceptant ?fields= et ?expand=.
+    sparse_actions = ('list', 'retrieve', 'stats')
+
+    def get_sparse_params(self):
+        """
+        Retourne (fields, expand) demandés par le client pour une action de lecture.
+        """
+        request = getattr(self, 'request', None)
+        if request is None or getattr(self, 'action', None) not in self.sparse_actions:
+            return None, None
+        return (
+            parse_field_list(request.query_params.get('fields')),
+            parse_field_list(request.query_params.get('expand')),
+        )
+
+    def get_serializer_class(self):
+        if self.uses_summary_serializer():
+            return self.summary_serializer_class
+        return super().get_serializer_class()
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, DynamicFieldsMixin):
+            fields, expand = self.get_sparse_params()
+            if fields:
+                kwargs.setdefault('fields', fields)
+            if expand:
+                kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.uses_summary_serializer() or getattr(self, 'action', None) in self.bare_object_actions:
+            # La représentation résumée n'a besoin d'aucune relation préchargée.
+            qs = qs.select_related(None).prefetch_related(None)
+        fields, expand = self.get_sparse_params()
+        if (fields or expand) and issubclass(self.get_serializer_class(), DynamicFieldsMixin):
+            qs = apply_sparse_fieldset(qs, self.get_serializer(), fields=fields, expand=expand)
+        return qs
 
     def perform_create(self, serializer):
         instance = serializer.save()
@@ -67,6 +347,18 @@ class AuditModelViewSet(
         queryset = self.filter_queryset(self.get_queryset())
         return Response({'message': 'Compteur calculé avec succès', 'data': {'count': queryset.count()}})
 
+    def build_stats(self, queryset, *, counts=None, lists=None, order_by=(), limit: int = 5) -> dict:
+        """
+        Statistiques d'une action ``stats`` en deux requêtes : ``total`` et
+        compteurs conditionnels (``counts`` : {clé: Q}), puis les ``limit``
+        derniers objets de chaque liste (``lists`` : {clé: Q ou None}) triés par
+        ``order_by``.
+        """
+        data = aggregate_counts(queryset, counts)
+        groups = latest_by_group(queryset, lists or {}, order_by, limit)
+        data.update(serialize_groups(self.get_serializer, groups))
+        return data
+
     @staticmethod
     def _wrap_response(response, message: str):
         return Response(
@@ -77,6 +369,16 @@ class AuditModelViewSet(
 
     def list(self, request, *args, **kwargs):
         response = super().list(request, *args, **kwargs)
+        if self.paginator is not None and getattr(self.paginator, 'page', None) is not None:
+            # Pagination par curseur demandée : la méta est placée à côté de 'data'.
+            return Response(
+                {
+                    'message': 'Liste récupérée avec succès',
+                    'data': response.data['results'],
+                    'pagination': response.data['pagination'],
+                },
+                status=response.status_code,
+            )
         return self._wrap_response(response, 'Liste récupérée avec succès')
 
     def retrieve(self, request, *args, **kwargs):
@@ -1,7 +1,9 @@
+import csv
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 
 from django.db import models, transaction
 from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.utils.dateparse import parse_date
@@ -11,8 +13,16 @@ from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
-from .mixins import AuditModelViewSet
-from ..auth_utils import log_audit
+from .audit import EchoBuffer, ExportContentNegotiation
+from .mixins import AuditModelViewSet, latest_by_group, request_wants_expand, serialize_groups
+from .. import budget, facturation
+from ..access import visible_demandes, visible_transferts
+from ..auth_utils import log_audit, log_audit_many
+from ..counters import COUNTER_SPECS, GLOBAL_ONLY_METRICS, counter_total, read_counters
+from ..engagements import compute_montant_engage
+from ..execution import COLUMNS as EXECUTION_COLUMNS, execution_rows
+from ..principal import get_principal
+from ..response_cache import cache_response, cached_data
 from ..models import (
     Article,
     AuditLog,
@@ -30,6 +40,7 @@ from ..models import (
     LigneBudgetaire,
     LigneDemande,
     MethodePaiement,
+    MouvementBudgetaire,
     Paiement,
     SignatureBC,
     SignatureNumerique,
@@ -46,8 +57,10 @@ from ..serializers.auth import UserSerializer
 from ..serializers.resources import (
     ArticleSerializer,
     BanqueSerializer,
+    BonCommandeListSerializer,
     BonCommandeSerializer,
     CategorieSerializer,
+    DemandeListSerializer,
     DemandeReferenceSerializer,
     DemandeSerializer,
     DeviseSerializer,
@@ -56,89 +69,91 @@ from ..serializers.resources import (
     FournisseurRIBSerializer,
     FournisseurSerializer,
     LigneBCSerializer,
+    LignesBCBulkSerializer,
     LigneBudgetaireSerializer,
     LigneDemandeSerializer,
+    LignesDemandeBulkSerializer,
     MethodePaiementSerializer,
+    MouvementBudgetaireSerializer,
+    OrdresVirementBatchSerializer,
     PaiementSerializer,
     SignatureBCSerializer,
     SignatureNumeriqueSerializer,
     TransfertSerializer,
 )
 
-SUPER_ADMIN_ROLES = {'SAD', 'SD', 'DAA', 'BUDGET', 'DFC', 'TRESOR'}
-
 
 def _user_role_code(user) -> str:
-    return (getattr(getattr(user, 'id_role', None), 'code', '') or '').strip().upper()
+    return get_principal(user).role_code
 
 
 def user_is_sad(user) -> bool:
-    return _user_role_code(user) == 'SAD'
+    return get_principal(user).is_sad
 
 
 def user_is_sd(user) -> bool:
-    return _user_role_code(user) == 'SD'
+    return get_principal(user).is_sd
 
 
 def user_has_global_access(user) -> bool:
     # Global sauf cas spécifique géré par les filtres dédiés (ex: demandes/BC pour SD).
-    return _user_role_code(user) in SUPER_ADMIN_ROLES
+    return get_principal(user).has_global_access
 
 
 def user_departement_id(user):
-    departement = getattr(user, 'id_departement', None)
-    return getattr(departement, 'id', None)
+    return get_principal(user).departement_id
 
 
 def filter_by_departement(qs, user, field_name: str):
     """
-    Restreint un queryset au département de l'utilisateur connecté,
-    sauf pour les rôles globaux (SAD/SD/superuser).
+    Restreint un queryset au département de l'utilisateur connecté (ou de son
+    ``Principal``), sauf pour les rôles globaux (SAD/SD/superuser).
     """
-    if user_has_global_access(user):
+    principal = get_principal(user)
+    if principal.has_global_access:
         return qs
-    departement_id = user_departement_id(user)
-    if not departement_id:
+    if not principal.departement_id:
         return qs.none()
-    return qs.filter(**{field_name: departement_id})
+    return qs.filter(**{field_name: principal.departement_id})
 
 
 def filter_transferts_for_user(qs, user):
-    if user_has_global_access(user):
+    """
+    Transferts visibles : source, bénéficiaire, demande ou BC du département
+    (semi-jointure sur la table d'accès ``DemandeAcces``).
+    """
+    principal = get_principal(user)
+    if principal.has_global_access:
         return qs
-    departement_id = user_departement_id(user)
-    if not departement_id:
+    if not principal.departement_id:
         return qs.none()
-    return qs.filter(
-        Q(departement_source_id=departement_id)
-        | Q(departement_beneficiaire_id=departement_id)
-        | Q(id_demande__id_departement_id=departement_id)
-        | Q(id_bc__id_departement_id=departement_id)
-    )
+    return qs.filter(pk__in=visible_transferts(principal.departement_id))
 
 
 def filter_demandes_for_user(qs, user):
-    if user_has_global_access(user):
+    """
+    Demandes du département de l'utilisateur ou qui lui ont été transférées
+    (semi-jointure sur la table d'accès ``DemandeAcces``).
+    """
+    principal = get_principal(user)
+    if principal.has_global_access:
         return qs
-    departement_id = user_departement_id(user)
-    has_user_access = bool(user and getattr(user, 'is_authenticated', False))
-    transfert_filter = Q(utilisateurs_transferts=user) if has_user_access else Q(pk__isnull=True)
-    dept_qs = filter_by_departement(qs, user, 'id_departement_id')
-    if not user:
-        return dept_qs
-    return (dept_qs | qs.filter(transfert_filter)).distinct()
+    if principal.user is None:
+        return qs.none()
+    return qs.filter(pk__in=visible_demandes(principal.user, principal.departement_id))
 
 
 def filter_bc_for_user(qs, user):
-    if user_has_global_access(user):
+    principal = get_principal(user)
+    if principal.has_global_access:
         return qs
-    departement_id = user_departement_id(user)
-    if user_is_sd(user):
+    departement_id = principal.departement_id
+    if principal.is_sd:
         brouillon_filter = ~Q(id_demande__statut_demande=StatutDemande.BROUILLON)
         if departement_id:
             return qs.filter(brouillon_filter | Q(id_departement_id=departement_id))
         return qs.filter(brouillon_filter)
-    return filter_by_departement(qs, user, 'id_departement_id')
+    return filter_by_departement(qs, principal, 'id_departement_id')
 
 
 def _quantize_money(value: Decimal) -> Decimal:
@@ -156,38 +171,136 @@ def _safe_decimal(value) -> Decimal:
         return Decimal('0')
 
 
-def _compute_montant_engage(bc) -> Decimal:
-    if not bc:
-        return Decimal('0')
-    total = Decimal('0')
-    bc_tva = _safe_decimal(getattr(bc, 'tva', None))
-    for ligne in bc.lignes.all():
-        base = _safe_decimal(ligne.quantite) * _safe_decimal(ligne.prix_unitaire)
-        taux_tva = _safe_decimal(ligne.taux_tva) if ligne.taux_tva is not None else bc_tva
-        tva_amount = base * (taux_tva / Decimal('100')) if taux_tva else Decimal('0')
-        ca_amount = _safe_decimal(ligne.ca)
-        total += base + tva_amount + ca_amount
-    return _quantize_money(total)
-
-
 def _update_bc_montant_engage(bc) -> None:
     if not bc:
         return
-    bc.montant_engage = _compute_montant_engage(bc)
+    bc.montant_engage = compute_montant_engage(bc)
     bc.save(update_fields=['montant_engage'])
 
 
-def _paiement_totaux(bc):
-    total_autorise = bc.montant_engage or Decimal('0')
-    if total_autorise <= 0:
-        total_autorise = (
-            bc.factures.aggregate(total=models.Sum('montant_ttc')).get('total') or Decimal('0')
+def _bulk_details(result: dict) -> str:
+    return f"créées: {result['crees']} | modifiées: {result['modifies']} | supprimées: {result['supprimes']}"
+
+
+def with_paiements(queryset):
+    """
+    Précharge factures / paiements (banque, méthode) pour ``get_paiements`` ;
+    les totaux sont lus sur le bon de commande (``api.facturation``).
+    """
+    return queryset.prefetch_related(
+        models.Prefetch(
+            'factures',
+            queryset=Facture.objects.prefetch_related(
+                models.Prefetch(
+                    'paiements',
+                    queryset=Paiement.objects.select_related('id_banque', 'id_methode_paiement'),
+                )
+            ),
         )
-    total_paye = (
-        Paiement.objects.filter(id_facture__id_bc=bc).aggregate(total=models.Sum('montant')).get('total')
-        or Decimal('0')
     )
-    return total_autorise, total_paye
+
+
+# Relations lues par UserSerializer (département, rôle).
+USER_RELATIONS = ('id_departement', 'id_role')
+
+
+def user_paths(*names) -> list:
+    return [f'{name}__{relation}' for name in names for relation in USER_RELATIONS]
+
+
+def documents_queryset():
+    return Document.objects.select_related(*user_paths('id_utilisateur'))
+
+
+def transferts_queryset():
+    """
+    Transferts au format ``TransfertLiteSerializer``.
+    """
+    return Transfert.objects.select_related('departement_source', 'departement_beneficiaire', *user_paths('agent'))
+
+
+# Relations des lignes (ArticleSerializer : catégorie et devise de l'article).
+LIGNE_RELATIONS = ('id_article__id_categorie', 'id_article__id_devise', 'id_devise')
+
+
+def ribs_prefetch():
+    return models.Prefetch('id_fournisseur__ribs', queryset=FournisseurRIB.objects.select_related('id_banque', 'id_devise'))
+
+
+# Relations multiples des objets imbriqués par ``depth`` (listes d'identifiants).
+NESTED_M2M = (
+    'id_demande__agent_traitant__groups',
+    'id_demande__agent_traitant__user_permissions',
+    'id_demande_valider__documents',
+    'id_demande_valider__utilisateurs_transferts',
+)
+
+
+def with_bon_commande_relations(queryset, paiements=False):
+    """
+    Précharge tout ce que lit ``BonCommandeSerializer`` : le nombre de
+    requêtes ne dépend pas du nombre de bons de commande. ``paiements``
+    ajoute ``with_paiements`` (champ présent en liste et en détail).
+    """
+    queryset = queryset.select_related(
+        'id_demande__id_departement',
+        'id_demande__agent_traitant',
+        'id_fournisseur',
+        'id_departement',
+        'id_methode_paiement',
+        'id_devise',
+        'id_demande_valider',
+        *user_paths('agent_traitant', 'id_redacteur'),
+    ).prefetch_related(
+        *NESTED_M2M,
+        ribs_prefetch(),
+        models.Prefetch('lignes', queryset=LigneBC.objects.select_related(*LIGNE_RELATIONS)),
+        models.Prefetch('documents', queryset=documents_queryset()),
+        models.Prefetch(
+            'signatures',
+            queryset=SignatureBC.objects.select_related(
+                'id_signataire__signature_utilisateur',
+                *user_paths('id_signataire', 'id_document_preuve__id_utilisateur'),
+            ),
+        ),
+        models.Prefetch('transferts', queryset=transferts_queryset()),
+    )
+    return with_paiements(queryset) if paiements else queryset
+
+
+def with_demande_relations(queryset):
+    """
+    Précharge tout ce que lit ``DemandeSerializer``, bons de commande compris.
+    """
+    return queryset.select_related(
+        'id_departement',
+        'id_fournisseur',
+        'id_signataire__signature_utilisateur',
+        *user_paths('agent_traitant', 'id_signataire', 'id_document_preuve__id_utilisateur'),
+    ).prefetch_related(
+        ribs_prefetch(),
+        models.Prefetch('lignes', queryset=LigneDemande.objects.select_related(*LIGNE_RELATIONS)),
+        models.Prefetch('documents', queryset=documents_queryset()),
+        models.Prefetch(
+            'utilisateurs_transferts',
+            # Champ imbriqué par ``depth`` (groupes et permissions) et lu par ``get_agents_traitants``.
+            queryset=Utilisateur.objects.select_related(*USER_RELATIONS).prefetch_related('groups', 'user_permissions'),
+        ),
+        models.Prefetch('transferts', queryset=transferts_queryset()),
+        models.Prefetch('bons_commande', queryset=with_bon_commande_relations(BonCommande.objects.all(), paiements=True)),
+    )
+
+
+def with_facture_relations(queryset):
+    """
+    Précharge tout ce que lit ``FactureSerializer`` (bon de commande détaillé compris).
+    """
+    return queryset.select_related(
+        'id_devise',
+        *user_paths('id_document_facture__id_utilisateur', 'id_agent_comptable'),
+    ).prefetch_related(
+        models.Prefetch('id_bc', queryset=with_bon_commande_relations(BonCommande.objects.all(), paiements=True)),
+    )
 
 
 def _build_ordre_virement_payload(
@@ -202,7 +315,7 @@ def _build_ordre_virement_payload(
 
     if total_autorise is None or total_paye is None:
         if bc:
-            total_autorise, total_paye = _paiement_totaux(bc)
+            total_autorise, total_paye = facturation.totaux(bc)
         else:
             total_autorise, total_paye = Decimal('0'), Decimal('0')
 
@@ -323,16 +436,15 @@ class DeviseViewSet(AuditModelViewSet):
         return qs
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('actif').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'actifs': counts.get(True, 0),
-            'inactifs': counts.get(False, 0),
-            'derniers': self.get_serializer(qs.order_by('-id')[:5], many=True).data,
-            'a_traiter': self.get_serializer(qs.filter(actif=False).order_by('-id')[:5], many=True).data,
-        }
+        data = self.build_stats(
+            qs,
+            counts={'actifs': Q(actif=True), 'inactifs': Q(actif=False)},
+            lists={'derniers': None, 'a_traiter': Q(actif=False)},
+            order_by=('-id',),
+        )
         return Response({'message': 'Statistiques des devises', 'data': data}, status=status.HTTP_200_OK)
 
 
@@ -353,16 +465,15 @@ class MethodePaiementViewSet(AuditModelViewSet):
         return qs
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('actif').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'actifs': counts.get(True, 0),
-            'inactifs': counts.get(False, 0),
-            'derniers': self.get_serializer(qs.order_by('-id')[:5], many=True).data,
-            'a_traiter': self.get_serializer(qs.filter(actif=False).order_by('-id')[:5], many=True).data,
-        }
+        data = self.build_stats(
+            qs,
+            counts={'actifs': Q(actif=True), 'inactifs': Q(actif=False)},
+            lists={'derniers': None, 'a_traiter': Q(actif=False)},
+            order_by=('-id',),
+        )
         return Response({'message': 'Statistiques des méthodes de paiement', 'data': data}, status=status.HTTP_200_OK)
 
 
@@ -386,16 +497,15 @@ class CategorieViewSet(AuditModelViewSet):
         return qs
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('actif').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'actifs': counts.get(True, 0),
-            'inactifs': counts.get(False, 0),
-            'derniers': self.get_serializer(qs.order_by('-id')[:5], many=True).data,
-            'a_traiter': self.get_serializer(qs.filter(actif=False).order_by('-id')[:5], many=True).data,
-        }
+        data = self.build_stats(
+            qs,
+            counts={'actifs': Q(actif=True), 'inactifs': Q(actif=False)},
+            lists={'derniers': None, 'a_traiter': Q(actif=False)},
+            order_by=('-id',),
+        )
         return Response({'message': 'Statistiques des catégories', 'data': data}, status=status.HTTP_200_OK)
 
 
@@ -425,16 +535,15 @@ class ArticleViewSet(AuditModelViewSet):
         return qs
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('actif').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'actifs': counts.get(True, 0),
-            'inactifs': counts.get(False, 0),
-            'derniers': self.get_serializer(qs.order_by('-id')[:5], many=True).data,
-            'a_traiter': self.get_serializer(qs.filter(actif=False).order_by('-id')[:5], many=True).data,
-        }
+        data = self.build_stats(
+            qs,
+            counts={'actifs': Q(actif=True), 'inactifs': Q(actif=False)},
+            lists={'derniers': None, 'a_traiter': Q(actif=False)},
+            order_by=('-id',),
+        )
         return Response({'message': 'Statistiques des articles', 'data': data}, status=status.HTTP_200_OK)
 
 
@@ -462,30 +571,27 @@ class FournisseurViewSet(AuditModelViewSet):
         return qs
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('actif').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'actifs': counts.get(True, 0),
-            'inactifs': counts.get(False, 0),
-            'derniers': self.get_serializer(qs.order_by('-id')[:5], many=True).data,
-            'a_traiter': self.get_serializer(qs.filter(actif=False).order_by('-id')[:5], many=True).data,
-        }
+        data = self.build_stats(
+            qs,
+            counts={'actifs': Q(actif=True), 'inactifs': Q(actif=False)},
+            lists={'derniers': None, 'a_traiter': Q(actif=False)},
+            order_by=('-id',),
+        )
         return Response({'message': 'Statistiques des fournisseurs', 'data': data}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'], url_path='associations')
     def associations(self, request, pk=None):
         fournisseur = self.get_object()
-        demandes_qs = (
-            Demande.objects.select_related('id_departement', 'agent_traitant', 'id_fournisseur')
-            .prefetch_related('lignes__id_article', 'documents')
-            .filter(id_fournisseur=fournisseur)
-            .distinct()
-            .order_by('-date_creation')
-        )
-        bc_qs = (
-            BonCommande.objects.select_related(
+        demandes_qs = Demande.objects.filter(id_fournisseur=fournisseur).distinct().order_by('-date_creation')
+        bc_qs = BonCommande.objects.filter(id_fournisseur=fournisseur).order_by('-date_creation')
+        if request_wants_expand(request):
+            demandes_qs = demandes_qs.select_related('id_departement', 'agent_traitant', 'id_fournisseur').prefetch_related(
+                'lignes__id_article', 'documents'
+            )
+            bc_qs = bc_qs.select_related(
                 'id_demande',
                 'id_fournisseur',
                 'id_departement',
@@ -494,17 +600,17 @@ class FournisseurViewSet(AuditModelViewSet):
                 'id_devise',
                 'id_redacteur',
                 'id_demande_valider',
-            )
-            .prefetch_related('lignes__id_article', 'lignes__id_devise', 'documents')
-            .filter(id_fournisseur=fournisseur)
-            .order_by('-date_creation')
-        )
-        demandes_qs = filter_demandes_for_user(demandes_qs, request.user)
-        bc_qs = filter_bc_for_user(bc_qs, request.user)
+            ).prefetch_related('lignes__id_article', 'lignes__id_devise', 'documents')
+            demande_serializer_class, bc_serializer_class = DemandeSerializer, BonCommandeSerializer
+        else:
+            demande_serializer_class, bc_serializer_class = DemandeListSerializer, BonCommandeListSerializer
+        demandes_qs = filter_demandes_for_user(demandes_qs, self.principal)
+        bc_qs = filter_bc_for_user(bc_qs, self.principal)
+        context = self.get_serializer_context()
         data = {
             'fournisseur': self.get_serializer(fournisseur).data,
-            'demandes': DemandeSerializer(demandes_qs, many=True, context=self.get_serializer_context()).data,
-            'bons_commande': BonCommandeSerializer(bc_qs, many=True, context=self.get_serializer_context()).data,
+            'demandes': demande_serializer_class(demandes_qs, many=True, context=context).data,
+            'bons_commande': bc_serializer_class(bc_qs, many=True, context=context).data,
         }
         return Response({'message': 'Associations fournisseur', 'data': data}, status=status.HTTP_200_OK)
 
@@ -529,16 +635,15 @@ class BanqueViewSet(AuditModelViewSet):
         return qs
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('actif').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'actifs': counts.get(True, 0),
-            'inactifs': counts.get(False, 0),
-            'derniers': self.get_serializer(qs.order_by('-id')[:5], many=True).data,
-            'a_traiter': self.get_serializer(qs.filter(actif=False).order_by('-id')[:5], many=True).data,
-        }
+        data = self.build_stats(
+            qs,
+            counts={'actifs': Q(actif=True), 'inactifs': Q(actif=False)},
+            lists={'derniers': None, 'a_traiter': Q(actif=False)},
+            order_by=('-id',),
+        )
         return Response({'message': 'Statistiques des banques', 'data': data}, status=status.HTTP_200_OK)
 
 
@@ -562,34 +667,24 @@ class FournisseurRIBViewSet(AuditModelViewSet):
         return qs
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('actif').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'actifs': counts.get(True, 0),
-            'inactifs': counts.get(False, 0),
-            'derniers': self.get_serializer(qs.order_by('-date_creation')[:5], many=True).data,
-            'a_traiter': self.get_serializer(qs.filter(actif=False).order_by('-date_creation')[:5], many=True).data,
-        }
+        data = self.build_stats(
+            qs,
+            counts={'actifs': Q(actif=True), 'inactifs': Q(actif=False)},
+            lists={'derniers': None, 'a_traiter': Q(actif=False)},
+            order_by=('-date_creation',),
+        )
         return Response({'message': 'Statistiques des RIB fournisseurs', 'data': data}, status=status.HTTP_200_OK)
 
 
 class DemandeViewSet(AuditModelViewSet):
-    queryset = Demande.objects.select_related('id_departement', 'agent_traitant', 'id_fournisseur').prefetch_related(
-        'lignes__id_article',
-        'documents',
-        'utilisateurs_transferts',
-        models.Prefetch(
-            'transferts',
-            queryset=Transfert.objects.select_related(
-                'departement_source',
-                'departement_beneficiaire',
-                'agent',
-            ),
-        ),
-    ).all().order_by('-date_creation')
+    queryset = with_demande_relations(Demande.objects.all()).order_by('-date_creation')
     serializer_class = DemandeSerializer
+    summary_serializer_class = DemandeListSerializer
+    bare_object_actions = ('lignes_bulk',)
+    idempotent_actions = ('assign_agent', 'signature', 'transfer')
     audit_prefix = 'demande'
     audit_type = 'DEMANDE'
 
@@ -625,25 +720,26 @@ class DemandeViewSet(AuditModelViewSet):
                 qs = qs.filter(date_creation__date__lte=parsed)
         if search:
             qs = qs.filter(Q(numero_demande__icontains=search) | Q(objet__icontains=search))
-        return filter_demandes_for_user(qs, self.request.user)
+        return filter_demandes_for_user(qs, self.principal)
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response(per_user=True)
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('statut_demande').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'en_attente': counts.get(StatutDemande.EN_ATTENTE, 0),
-            'en_traitement': counts.get(StatutDemande.EN_TRAITEMENT, 0),
-            'valider': counts.get(StatutDemande.VALIDER, 0),
-            'rejeter': counts.get(StatutDemande.REJETER, 0),
-            'dernieres': self.get_serializer(qs.order_by('-date_creation')[:5], many=True).data,
-            'a_traiter': self.get_serializer(
-                qs.filter(statut_demande__in=[StatutDemande.EN_ATTENTE, StatutDemande.EN_TRAITEMENT])
-                .order_by('-date_creation')[:5],
-                many=True,
-            ).data,
-        }
+        data = self.build_stats(
+            qs,
+            counts={
+                'en_attente': Q(statut_demande=StatutDemande.EN_ATTENTE),
+                'en_traitement': Q(statut_demande=StatutDemande.EN_TRAITEMENT),
+                'valider': Q(statut_demande=StatutDemande.VALIDER),
+                'rejeter': Q(statut_demande=StatutDemande.REJETER),
+            },
+            lists={
+                'dernieres': None,
+                'a_traiter': Q(statut_demande__in=[StatutDemande.EN_ATTENTE, StatutDemande.EN_TRAITEMENT]),
+            },
+            order_by=('-date_creation',),
+        )
         return Response({'message': 'Statistiques des demandes', 'data': data}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'], url_path='history')
@@ -651,6 +747,30 @@ class DemandeViewSet(AuditModelViewSet):
         demande = self.get_object()
         return build_history_response(self, self.audit_type, demande.id)
 
+    @action(detail=True, methods=['post'], url_path='lignes/bulk')
+    def lignes_bulk(self, request, pk=None):
+        demande = self.get_object()
+        serializer = LignesDemandeBulkSerializer(data=request.data, parent_object=demande, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save()
+        log_audit(
+            request.user,
+            'demande_lignes_bulk',
+            type_objet=self.audit_type,
+            id_objet=demande.id,
+            request=request,
+            details=_bulk_details(result),
+        )
+        lignes = LigneDemande.objects.filter(id_demande=demande).select_related(*LIGNE_RELATIONS)
+        # Le parent est connu du client : seules l'article et la devise restent détaillés.
+        result['lignes'] = LigneDemandeSerializer(
+            lignes, many=True, expand=['id_article', 'id_devise'], context={'request': request}
+        ).data
+        return Response(
+            {'message': 'Lignes de la demande enregistrées avec succès', 'data': result},
+            status=status.HTTP_200_OK,
+        )
+
     @action(detail=True, methods=['post'], url_path='assign-agent')
     def assign_agent(self, request, pk=None):
         agent_id = request.data.get('agent_id') or request.data.get('agent_traitant_id')
@@ -817,7 +937,9 @@ class DemandeViewSet(AuditModelViewSet):
 
 
 class LigneDemandeViewSet(AuditModelViewSet):
-    queryset = LigneDemande.objects.select_related('id_demande', 'id_article').all()
+    queryset = LigneDemande.objects.select_related(*LIGNE_RELATIONS).prefetch_related(
+        models.Prefetch('id_demande', queryset=Demande.objects.prefetch_related('documents', 'utilisateurs_transferts')),
+    )
     serializer_class = LigneDemandeSerializer
     audit_prefix = 'ligne_demande'
     audit_type = 'LIGNE_DEMANDE'
@@ -830,19 +952,24 @@ class LigneDemandeViewSet(AuditModelViewSet):
             qs = qs.filter(id_demande_id=demande)
         if article:
             qs = qs.filter(id_article_id=article)
-        return filter_by_departement(qs, self.request.user, 'id_demande__id_departement_id')
+        return filter_by_departement(qs, self.principal, 'id_demande__id_departement_id')
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        data = {
-            'total': qs.count(),
-            'derniers': self.get_serializer(qs.order_by('-id')[:5], many=True).data,
-            'a_traiter': [],
-        }
+        data = self.build_stats(qs, lists={'derniers': None}, order_by=('-id',))
+        data['a_traiter'] = []
         return Response({'message': 'Statistiques des lignes de demande', 'data': data}, status=status.HTTP_200_OK)
 
 
+def _execution_csv(rows):
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow(EXECUTION_COLUMNS)
+    for row in rows:
+        yield writer.writerow(['' if row[column] is None else row[column] for column in EXECUTION_COLUMNS])
+
+
 class LigneBudgetaireViewSet(AuditModelViewSet):
     queryset = LigneBudgetaire.objects.select_related('id_departement', 'id_devise').all()
     serializer_class = LigneBudgetaireSerializer
@@ -861,17 +988,82 @@ class LigneBudgetaireViewSet(AuditModelViewSet):
         if exercice:
             qs = qs.filter(exercice=exercice)
         qs = qs.order_by('code_ligne')
-        return filter_by_departement(qs, self.request.user, 'id_departement_id')
+        return filter_by_departement(qs, self.principal, 'id_departement_id')
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
+        data = self.build_stats(qs, lists={'derniers': None}, order_by=('-exercice', '-code_ligne'))
+        data['a_traiter'] = []
+        return Response({'message': 'Statistiques des lignes budgétaires', 'data': data}, status=status.HTTP_200_OK)
+
+    # Écritures invalidant le rapport d'exécution (lignes, bons de commande, factures, paiements).
+    execution_dependencies = ('api.BonCommande', 'api.Facture', 'api.LigneBudgetaire', 'api.Paiement')
+
+    @action(detail=False, methods=['get'], url_path='execution', content_negotiation_class=ExportContentNegotiation)
+    def execution(self, request):
+        format_param = request.GET.get('format', 'json').lower()
+        if format_param not in ('json', 'csv'):
+            return Response({'detail': 'Formats supportés: json, csv'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset())
+        rows, hit = cached_data(
+            request,
+            f'{self.__class__.__name__}.execution',
+            self.execution_dependencies,
+            lambda: execution_rows(queryset),
+        )
+        if format_param == 'csv':
+            response = StreamingHttpResponse(_execution_csv(rows), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="execution_budgetaire.csv"'
+        else:
+            response = Response(
+                {'message': 'Exécution budgétaire', 'data': rows},
+                status=status.HTTP_200_OK,
+            )
+        response['X-Response-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+    @action(detail=True, methods=['get'], url_path='mouvements')
+    def mouvements(self, request, pk=None):
+        ligne = self.get_object()
+        queryset = MouvementBudgetaire.objects.filter(id_ligne_budgetaire=ligne).order_by('-date_mouvement')
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return Response(
+                {
+                    'message': 'Mouvements de la ligne budgétaire',
+                    'data': MouvementBudgetaireSerializer(page, many=True).data,
+                    'pagination': self.paginator.get_pagination_meta(),
+                },
+                status=status.HTTP_200_OK,
+            )
+        return Response(
+            {'message': 'Mouvements de la ligne budgétaire', 'data': MouvementBudgetaireSerializer(queryset, many=True).data},
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=['get'], url_path='disponibilite')
+    def disponibilite(self, request, pk=None):
+        ligne = self.get_object()
+        raw = request.GET.get('montant')
+        try:
+            montant = budget.montant(raw) if raw not in (None, '') else None
+            if montant is not None and not montant.is_finite():
+                raise InvalidOperation(raw)
+        except InvalidOperation:
+            return Response(
+                {'message': 'Validation échouée', 'detail': 'Montant invalide.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         data = {
-            'total': qs.count(),
-            'derniers': self.get_serializer(qs.order_by('-exercice', '-code_ligne')[:5], many=True).data,
-            'a_traiter': [],
+            'code_ligne': ligne.code_ligne,
+            'montant_budget': str(ligne.montant_budget),
+            'montant_engage': str(ligne.montant_engage),
+            'montant_reste': str(ligne.montant_reste),
+            'suffisant': montant <= ligne.montant_reste if montant is not None else None,
         }
-        return Response({'message': 'Statistiques des lignes budgétaires', 'data': data}, status=status.HTTP_200_OK)
+        return Response({'message': 'Disponibilité de la ligne budgétaire', 'data': data}, status=status.HTTP_200_OK)
 
 
 class DocumentViewSet(AuditModelViewSet):
@@ -905,19 +1097,22 @@ class DocumentViewSet(AuditModelViewSet):
             qs = qs.filter(id_utilisateur_id=user)
         if statut:
             qs = qs.filter(statut_archivage=statut)
-        return filter_by_departement(qs, self.request.user, 'id_utilisateur__id_departement_id')
+        return filter_by_departement(qs, self.principal, 'id_utilisateur__id_departement_id')
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('statut_archivage').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'actif': counts.get(StatutArchivage.ACTIF, 0),
-            'archive': counts.get(StatutArchivage.ARCHIVE, 0),
-            'derniers': self.get_serializer(qs.order_by('-date_generation')[:5], many=True).data,
-            'a_traiter': [],
-        }
+        data = self.build_stats(
+            qs,
+            counts={
+                'actif': Q(statut_archivage=StatutArchivage.ACTIF),
+                'archive': Q(statut_archivage=StatutArchivage.ARCHIVE),
+            },
+            lists={'derniers': None},
+            order_by=('-date_generation',),
+        )
+        data['a_traiter'] = []
         return Response({'message': 'Statistiques des documents', 'data': data}, status=status.HTTP_200_OK)
 
 
@@ -942,24 +1137,19 @@ class SignatureNumeriqueViewSet(AuditModelViewSet):
         return qs
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        data = {
-            'total': qs.count(),
-            'derniers': self.get_serializer(qs.order_by('-date_signature')[:5], many=True).data,
-            'a_traiter': [],
-        }
+        data = self.build_stats(qs, lists={'derniers': None}, order_by=('-date_signature',))
+        data['a_traiter'] = []
         return Response({'message': 'Statistiques des signatures numériques', 'data': data}, status=status.HTTP_200_OK)
 
 
 class TransfertViewSet(AuditModelViewSet):
-    queryset = Transfert.objects.select_related(
-        'departement_source',
-        'departement_beneficiaire',
-        'agent',
-        'id_demande',
-        'id_bc',
-    ).all().order_by('-date_transfert')
+    queryset = transferts_queryset().prefetch_related(
+        models.Prefetch('id_demande', queryset=with_demande_relations(Demande.objects.all())),
+        models.Prefetch('id_bc', queryset=with_bon_commande_relations(BonCommande.objects.all(), paiements=True)),
+    ).order_by('-date_transfert')
     serializer_class = TransfertSerializer
     audit_prefix = 'transfert'
     audit_type = 'TRANSFERT'
@@ -984,57 +1174,38 @@ class TransfertViewSet(AuditModelViewSet):
             qs = qs.filter(agent_id=agent)
         if statut:
             qs = qs.filter(statut=statut)
-        return filter_transferts_for_user(qs, self.request.user)
+        return filter_transferts_for_user(qs, self.principal)
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('statut').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'valide': counts.get(StatutTransfert.VALIDE, 0),
-            'rejete': counts.get(StatutTransfert.REJETE, 0),
-            'derniers': self.get_serializer(qs.order_by('-date_transfert')[:5], many=True).data,
-            'a_traiter': [],
-        }
+        data = self.build_stats(
+            qs,
+            counts={'valide': Q(statut=StatutTransfert.VALIDE), 'rejete': Q(statut=StatutTransfert.REJETE)},
+            lists={'derniers': None},
+            order_by=('-date_transfert',),
+        )
+        data['a_traiter'] = []
         return Response({'message': 'Statistiques des transferts', 'data': data}, status=status.HTTP_200_OK)
 
 
 class BonCommandeViewSet(AuditModelViewSet):
-    queryset = BonCommande.objects.select_related(
-        'id_demande',
-        'id_fournisseur',
-        'id_departement',
-        'agent_traitant',
-        'id_methode_paiement',
-        'id_devise',
-        'id_redacteur',
-        'id_demande_valider',
-    ).prefetch_related(
-        'lignes__id_article',
-        'lignes__id_devise',
-        'documents',
-        models.Prefetch(
-            'signatures',
-            queryset=SignatureBC.objects.select_related('id_signataire', 'id_document_preuve'),
-        ),
-        models.Prefetch(
-            'transferts',
-            queryset=Transfert.objects.select_related(
-                'departement_source',
-                'departement_beneficiaire',
-                'agent',
-            ),
-        ),
-    ).all().order_by('-date_creation')
+    queryset = with_bon_commande_relations(BonCommande.objects.all()).order_by('-date_creation')
     serializer_class = BonCommandeSerializer
+    summary_serializer_class = BonCommandeListSerializer
+    bare_object_actions = ('lignes_bulk',)
+    idempotent_actions = ('assign_agent', 'ordre_virement', 'ordres_virement_batch', 'transfer')
     audit_prefix = 'bon_commande'
     audit_type = 'BON_COMMANDE'
 
+    # Bon de commande, montant engagé recalculé et mouvements budgétaires : une seule transaction.
+    @transaction.atomic
     def perform_create(self, serializer):
         super().perform_create(serializer)
         _update_bc_montant_engage(serializer.instance)
 
+    @transaction.atomic
     def perform_update(self, serializer):
         super().perform_update(serializer)
         _update_bc_montant_engage(serializer.instance)
@@ -1070,24 +1241,28 @@ class BonCommandeViewSet(AuditModelViewSet):
             parsed = parse_date(date_fin)
             if parsed:
                 qs = qs.filter(date_creation__date__lte=parsed)
-        return filter_bc_for_user(qs, self.request.user)
+        if self.action in ('list', 'retrieve') and 'paiements' in self.get_serializer().fields:
+            qs = with_paiements(qs)
+        return filter_bc_for_user(qs, self.principal)
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('statut_bc').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'en_attente': counts.get(StatutBC.EN_ATTENTE, 0),
-            'en_traitement': counts.get(StatutBC.EN_TRAITEMENT, 0),
-            'valider': counts.get(StatutBC.VALIDER, 0),
-            'rejeter': counts.get('rejeter', 0),  # statut non défini pour BC, valeur par défaut 0
-            'dernieres': self.get_serializer(qs.order_by('-date_creation')[:5], many=True).data,
-            'a_traiter': self.get_serializer(
-                qs.filter(statut_bc__in=[StatutBC.EN_ATTENTE, StatutBC.EN_TRAITEMENT]).order_by('-date_creation')[:5],
-                many=True,
-            ).data,
-        }
+        data = self.build_stats(
+            qs,
+            counts={
+                'en_attente': Q(statut_bc=StatutBC.EN_ATTENTE),
+                'en_traitement': Q(statut_bc=StatutBC.EN_TRAITEMENT),
+                'valider': Q(statut_bc=StatutBC.VALIDER),
+                'rejeter': Q(statut_bc='rejeter'),  # statut non défini pour BC, valeur par défaut 0
+            },
+            lists={
+                'dernieres': None,
+                'a_traiter': Q(statut_bc__in=[StatutBC.EN_ATTENTE, StatutBC.EN_TRAITEMENT]),
+            },
+            order_by=('-date_creation',),
+        )
         return Response({'message': 'Statistiques des bons de commande', 'data': data}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'], url_path='history')
@@ -1095,6 +1270,33 @@ class BonCommandeViewSet(AuditModelViewSet):
         bc = self.get_object()
         return build_history_response(self, self.audit_type, bc.id)
 
+    @action(detail=True, methods=['post'], url_path='lignes/bulk')
+    def lignes_bulk(self, request, pk=None):
+        bc = self.get_object()
+        serializer = LignesBCBulkSerializer(data=request.data, parent_object=bc, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            result = serializer.save()
+            # Un seul recalcul du montant engagé pour tout le lot.
+            _update_bc_montant_engage(bc)
+        log_audit(
+            request.user,
+            'bon_commande_lignes_bulk',
+            type_objet=self.audit_type,
+            id_objet=bc.id,
+            request=request,
+            details=_bulk_details(result),
+        )
+        lignes = LigneBC.objects.filter(id_bc=bc).select_related(*LIGNE_RELATIONS)
+        result['montant_engage'] = bc.montant_engage
+        result['lignes'] = LigneBCSerializer(
+            lignes, many=True, expand=['id_article', 'id_devise'], context={'request': request}
+        ).data
+        return Response(
+            {'message': 'Lignes du bon de commande enregistrées avec succès', 'data': result},
+            status=status.HTTP_200_OK,
+        )
+
     @action(detail=True, methods=['post'], url_path='assign-agent')
     def assign_agent(self, request, pk=None):
         agent_id = request.data.get('agent_id') or request.data.get('agent_traitant_id')
@@ -1163,7 +1365,7 @@ class BonCommandeViewSet(AuditModelViewSet):
         banque = get_object_or_404(Banque, pk=banque_id)
 
         bc = self.get_object()
-        total_autorise, total_paye = _paiement_totaux(bc)
+        total_autorise, total_paye = facturation.totaux(bc)
         if total_autorise <= 0:
             return Response(
                 {
@@ -1201,13 +1403,7 @@ class BonCommandeViewSet(AuditModelViewSet):
             facture = get_object_or_404(Facture, pk=facture_id, id_bc=bc)
         else:
             date_facture = parse_date(request.data.get('date_facture') or '') or timezone.now().date()
-            numero_facture = (request.data.get('numero_facture') or '').strip()
-            if not numero_facture:
-                base = (bc.numero_bc or 'BC').strip().replace(' ', '')
-                suffix = timezone.now().strftime('%Y%m%d%H%M%S')
-                numero_facture = f'FAC/AUTO/{base}/{suffix}'
-                if len(numero_facture) > 100:
-                    numero_facture = numero_facture[:100]
+            numero_facture = (request.data.get('numero_facture') or '').strip() or facturation.numero_facture_auto(bc)
             facture = Facture.objects.create(
                 id_bc=bc,
                 numero_facture=numero_facture,
@@ -1268,10 +1464,37 @@ class BonCommandeViewSet(AuditModelViewSet):
         )
         return Response({'message': 'Ordre de virement genere', 'data': data}, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], url_path='ordres-virement/batch')
+    def ordres_virement_batch(self, request):
+        serializer = OrdresVirementBatchSerializer(
+            data=request.data, bc_queryset=self.get_queryset(), context={'request': request}
+        )
+        # Validation (bons de commande verrouillés) et création dans la même transaction.
+        with transaction.atomic():
+            serializer.is_valid(raise_exception=True)
+            results = serializer.save()
+        log_audit_many(
+            request.user,
+            [
+                {
+                    'action': 'bon_commande_ordre_virement',
+                    'type_objet': self.audit_type,
+                    'id_objet': result['bc_id'],
+                    'details': f"Ordre virement {result['paiement_id']} | montant: {result['montant']}",
+                }
+                for result in results
+            ],
+            request=request,
+        )
+        return Response(
+            {'message': 'Ordres de virement generes', 'data': {'nombre': len(results), 'ordres': results}},
+            status=status.HTTP_201_CREATED,
+        )
+
     @action(detail=True, methods=['get'], url_path='paiements')
     def paiements(self, request, pk=None):
         bc = self.get_object()
-        total_autorise, total_paye = _paiement_totaux(bc)
+        total_autorise, total_paye = facturation.totaux(bc)
         paiements_qs = (
             Paiement.objects.select_related('id_banque', 'id_facture', 'id_methode_paiement')
             .filter(id_facture__id_bc=bc)
@@ -1340,15 +1563,32 @@ class BonCommandeViewSet(AuditModelViewSet):
             )
 
         bc = self.get_object()
-        bc.id_ligne_budgetaire = valeur
-        bc.save(update_fields=['id_ligne_budgetaire'])
+        with transaction.atomic():
+            # Ligne verrouillée : le disponible lu reste valable jusqu'à l'engagement.
+            ligne = budget.find_ligne(valeur, LigneBudgetaire.objects.select_for_update())
+            if ligne is None:
+                return Response(
+                    {'message': 'Validation échouée', 'detail': 'Ligne budgétaire introuvable.'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            deja_engage = budget.resolve_lignes([bc.id_ligne_budgetaire]).get(bc.id_ligne_budgetaire) == ligne.pk
+            if not deja_engage and budget.montant(bc.montant_engage) > ligne.montant_reste:
+                return Response(
+                    {
+                        'message': 'Validation échouée',
+                        'detail': f'Crédit insuffisant sur la ligne {ligne.code_ligne} (disponible : {ligne.montant_reste}).',
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            bc.id_ligne_budgetaire = ligne.code_ligne
+            bc.save(update_fields=['id_ligne_budgetaire'])
         log_audit(
             request.user,
             'bon_commande_update_ligne_budgetaire',
             type_objet=self.audit_type,
             id_objet=bc.id,
             request=request,
-            details=f'Ligne budgétaire mise à jour: {valeur}',
+            details=f'Ligne budgétaire mise à jour: {ligne.code_ligne}',
         )
         serializer = self.get_serializer(bc)
         return Response(
@@ -1423,96 +1663,117 @@ class BonCommandeViewSet(AuditModelViewSet):
 class DashboardView(APIView):
     """
     Endpoint de synthèse : métriques et dernières demandes/BC.
+
+    Les métriques sont lues dans les compteurs matérialisés (``api.counters``),
+    selon la portée de ``filter_by_departement``.
     """
 
+    # Modèles dont dépend la réponse mise en cache (cf. api.response_cache).
+    cache_dependencies = tuple(
+        sorted({spec.model for spec in COUNTER_SPECS} | {'api.Utilisateur', 'api.Demande_utilisateurs_transferts'})
+    )
+
+    @staticmethod
+    def get_metrics(principal) -> dict:
+        global_scope = principal.has_global_access
+        departement_id = None if global_scope else principal.departement_id
+        values = read_counters(departement_id, global_scope=global_scope)
+        demande_par_statut = dict(values.get('demandes', {}))
+        if not global_scope and principal.is_authenticated:
+            # Demandes transférées à l'utilisateur hors de son département.
+            transferees = Demande.objects.filter(utilisateurs_transferts=principal.user)
+            if departement_id:
+                transferees = transferees.exclude(id_departement_id=departement_id)
+            for statut, total in (
+                transferees.order_by()
+                .values_list('statut_demande')
+                .annotate(total=models.Count('id', distinct=True))
+            ):
+                demande_par_statut[statut] = demande_par_statut.get(statut, 0) + total
+
+        metrics = {
+            'demandes_total': sum(demande_par_statut.values()),
+            'demandes_par_statut': {statut: total for statut, total in demande_par_statut.items() if total > 0},
+            'bons_commande_total': counter_total(values, 'bons_commande'),
+            'bons_commande_par_statut': {
+                statut: total for statut, total in values.get('bons_commande', {}).items() if total > 0
+            },
+        }
+        for metric in ('lignes_demande', 'lignes_bc', 'documents', 'transferts', 'factures', 'paiements'):
+            metrics[f'{metric}_total'] = counter_total(values, metric)
+        for metric in GLOBAL_ONLY_METRICS:
+            metrics[f'{metric}_total'] = counter_total(values, metric)
+        return metrics
+
+    @cache_response(per_user=True)
     def get(self, request, format=None):
-        user = request.user
-        demandes_qs = Demande.objects.select_related('id_departement', 'id_fournisseur').prefetch_related('lignes', 'documents')
-        bc_qs = BonCommande.objects.select_related(
-            'id_demande',
-            'id_fournisseur',
-            'id_departement',
-            'id_methode_paiement',
-            'id_devise',
-            'id_redacteur',
-            'id_demande_valider',
-        ).prefetch_related('lignes', 'documents')
-
-        demandes_qs = filter_demandes_for_user(demandes_qs, user)
-        bc_qs = filter_bc_for_user(bc_qs, user)
-
-        demande_par_statut = dict(
-            demandes_qs.values_list('statut_demande').annotate(total=models.Count('id'))
+        principal = get_principal(request.user)
+        demandes_qs = Demande.objects.all()
+        bc_qs = BonCommande.objects.all()
+        if request_wants_expand(request):
+            demandes_qs = demandes_qs.select_related('id_departement', 'id_fournisseur').prefetch_related('lignes', 'documents')
+            bc_qs = bc_qs.select_related(
+                'id_demande',
+                'id_fournisseur',
+                'id_departement',
+                'id_methode_paiement',
+                'id_devise',
+                'id_redacteur',
+                'id_demande_valider',
+            ).prefetch_related('lignes', 'documents')
+            demande_serializer_class, bc_serializer_class = DemandeSerializer, BonCommandeSerializer
+        else:
+            demande_serializer_class, bc_serializer_class = DemandeListSerializer, BonCommandeListSerializer
+
+        demandes_qs = filter_demandes_for_user(demandes_qs, principal)
+        bc_qs = filter_bc_for_user(bc_qs, principal)
+
+        # Dernières demandes / BC (global et par statut) : une requête fenêtrée chacun.
+        demandes = serialize_groups(
+            demande_serializer_class,
+            latest_by_group(
+                demandes_qs,
+                {
+                    'dernieres': None,
+                    'en_attente': Q(statut_demande=StatutDemande.EN_ATTENTE),
+                    'en_traitement': Q(statut_demande=StatutDemande.EN_TRAITEMENT),
+                    'valider': Q(statut_demande=StatutDemande.VALIDER),
+                    'rejeter': Q(statut_demande=StatutDemande.REJETER),
+                },
+                ('-date_creation',),
+            ),
+        )
+        bons_commande = serialize_groups(
+            bc_serializer_class,
+            latest_by_group(
+                bc_qs,
+                {
+                    'derniers': None,
+                    'en_attente': Q(statut_bc=StatutBC.EN_ATTENTE),
+                    'en_traitement': Q(statut_bc=StatutBC.EN_TRAITEMENT),
+                    'valider': Q(statut_bc=StatutBC.VALIDER),
+                },
+                ('-date_creation',),
+            ),
         )
-        bc_par_statut = dict(bc_qs.values_list('statut_bc').annotate(total=models.Count('id')))
-
-        demandes_by_status = {}
-        for key, statut in {
-            'en_attente': StatutDemande.EN_ATTENTE,
-            'en_traitement': StatutDemande.EN_TRAITEMENT,
-            'en_cours': StatutDemande.EN_TRAITEMENT,  # alias compat
-            'valider': StatutDemande.VALIDER,
-            'rejeter': StatutDemande.REJETER,
-        }.items():
-            demandes_by_status[key] = DemandeSerializer(
-                demandes_qs.filter(statut_demande=statut).order_by('-date_creation')[:5],
-                many=True,
-            ).data
-
-        bc_by_status = {}
-        for key, statut in {
-            'en_attente': StatutBC.EN_ATTENTE,
-            'en_traitement': StatutBC.EN_TRAITEMENT,
-            'en_cours': StatutBC.EN_TRAITEMENT,  # alias compat
-            'valider': StatutBC.VALIDER,
-        }.items():
-            bc_by_status[key] = BonCommandeSerializer(
-                bc_qs.filter(statut_bc=statut).order_by('-date_creation')[:5],
-                many=True,
-            ).data
+        demandes_by_status = {
+            'en_attente': demandes['en_attente'],
+            'en_traitement': demandes['en_traitement'],
+            'en_cours': demandes['en_traitement'],  # alias compat
+            'valider': demandes['valider'],
+            'rejeter': demandes['rejeter'],
+        }
+        bc_by_status = {
+            'en_attente': bons_commande['en_attente'],
+            'en_traitement': bons_commande['en_traitement'],
+            'en_cours': bons_commande['en_traitement'],  # alias compat
+            'valider': bons_commande['valider'],
+        }
 
         data = {
-            'metrics': {
-                'demandes_total': demandes_qs.count(),
-                'demandes_par_statut': demande_par_statut,
-                'bons_commande_total': bc_qs.count(),
-                'bons_commande_par_statut': bc_par_statut,
-                'lignes_demande_total': filter_by_departement(
-                    LigneDemande.objects.all(), user, 'id_demande__id_departement_id'
-                ).count(),
-                'lignes_bc_total': LigneBC.objects.filter(
-                    id_bc__in=filter_bc_for_user(BonCommande.objects.all(), user).values('id')
-                ).count(),
-                'documents_total': filter_by_departement(
-                    Document.objects.all(), user, 'id_utilisateur__id_departement_id'
-                ).count(),
-                'transferts_total': filter_transferts_for_user(Transfert.objects.all(), user).count(),
-                'factures_total': filter_by_departement(
-                    Facture.objects.all(), user, 'id_bc__id_departement_id'
-                ).count(),
-                'paiements_total': filter_by_departement(
-                    Paiement.objects.all(), user, 'id_facture__id_bc__id_departement_id'
-                ).count(),
-                'fournisseurs_total': Fournisseur.objects.count(),
-                'articles_total': Article.objects.count(),
-                'devises_total': Devise.objects.count(),
-                'departements_total': Departement.objects.count(),
-                'categories_total': Categorie.objects.count(),
-                'methodes_paiement_total': MethodePaiement.objects.count(),
-                'banques_total': Banque.objects.count(),
-                'fournisseurs_rib_total': FournisseurRIB.objects.count(),
-                'signatures_numeriques_total': SignatureNumerique.objects.count(),
-                'signatures_bc_total': SignatureBC.objects.count(),
-                'lignes_budgetaires_total': LigneBudgetaire.objects.count(),
-            },
-            'dernieres_demandes': DemandeSerializer(
-                demandes_qs.order_by('-date_creation')[:5],
-                many=True,
-            ).data,
-            'derniers_bons_commande': BonCommandeSerializer(
-                bc_qs.order_by('-date_creation')[:5],
-                many=True,
-            ).data,
+            'metrics': self.get_metrics(principal),
+            'dernieres_demandes': demandes['dernieres'],
+            'derniers_bons_commande': bons_commande['derniers'],
             'dernieres_demandes_par_statut': demandes_by_status,
             'derniers_bons_commande_par_statut': bc_by_status,
         }
@@ -1520,16 +1781,20 @@ class DashboardView(APIView):
 
 
 class LigneBCViewSet(AuditModelViewSet):
-    queryset = LigneBC.objects.select_related('id_bc', 'id_article', 'id_devise').all()
+    queryset = LigneBC.objects.select_related(*LIGNE_RELATIONS).prefetch_related(
+        models.Prefetch('id_bc', queryset=BonCommande.objects.prefetch_related('documents')),
+    )
     serializer_class = LigneBCSerializer
     audit_prefix = 'ligne_bc'
     audit_type = 'LIGNE_BC'
 
+    @transaction.atomic
     def perform_create(self, serializer):
         super().perform_create(serializer)
         instance = serializer.instance
         _update_bc_montant_engage(getattr(instance, 'id_bc', None))
 
+    @transaction.atomic
     def perform_update(self, serializer):
         old_bc = getattr(self.get_object(), 'id_bc', None)
         super().perform_update(serializer)
@@ -1539,6 +1804,7 @@ class LigneBCViewSet(AuditModelViewSet):
         if new_bc:
             _update_bc_montant_engage(new_bc)
 
+    @transaction.atomic
     def perform_destroy(self, instance):
         bc = getattr(instance, 'id_bc', None)
         super().perform_destroy(instance)
@@ -1552,16 +1818,14 @@ class LigneBCViewSet(AuditModelViewSet):
             qs = qs.filter(id_bc_id=bc)
         if article:
             qs = qs.filter(id_article_id=article)
-        return filter_by_departement(qs, self.request.user, 'id_bc__id_departement_id')
+        return filter_by_departement(qs, self.principal, 'id_bc__id_departement_id')
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        data = {
-            'total': qs.count(),
-            'derniers': self.get_serializer(qs.order_by('-id')[:5], many=True).data,
-            'a_traiter': [],
-        }
+        data = self.build_stats(qs, lists={'derniers': None}, order_by=('-id',))
+        data['a_traiter'] = []
         return Response({'message': 'Statistiques des lignes BC', 'data': data}, status=status.HTTP_200_OK)
 
 
@@ -1587,22 +1851,24 @@ class SignatureBCViewSet(AuditModelViewSet):
         return qs
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('decision').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'en_attente': counts.get(DecisionSignature.EN_ATTENTE, 0),
-            'approuve': counts.get(DecisionSignature.APPROUVE, 0),
-            'refuse': counts.get(DecisionSignature.REFUSE, 0),
-            'derniers': self.get_serializer(qs.order_by('-date_signature')[:5], many=True).data,
-            'a_traiter': self.get_serializer(qs.filter(decision=DecisionSignature.EN_ATTENTE).order_by('-date_signature')[:5], many=True).data,
-        }
+        data = self.build_stats(
+            qs,
+            counts={
+                'en_attente': Q(decision=DecisionSignature.EN_ATTENTE),
+                'approuve': Q(decision=DecisionSignature.APPROUVE),
+                'refuse': Q(decision=DecisionSignature.REFUSE),
+            },
+            lists={'derniers': None, 'a_traiter': Q(decision=DecisionSignature.EN_ATTENTE)},
+            order_by=('-date_signature',),
+        )
         return Response({'message': 'Statistiques des signatures BC', 'data': data}, status=status.HTTP_200_OK)
 
 
 class FactureViewSet(AuditModelViewSet):
-    queryset = Facture.objects.select_related('id_bc', 'id_devise', 'id_document_facture', 'id_agent_comptable').all()
+    queryset = with_facture_relations(Facture.objects.all())
     serializer_class = FactureSerializer
     audit_prefix = 'facture'
     audit_type = 'FACTURE'
@@ -1618,39 +1884,40 @@ class FactureViewSet(AuditModelViewSet):
             qs = qs.filter(id_bc_id=bc)
         if statut:
             qs = qs.filter(statut_facture=statut)
-        return filter_by_departement(qs, self.request.user, 'id_bc__id_departement_id')
+        return filter_by_departement(qs, self.principal, 'id_bc__id_departement_id')
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('statut_facture').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'recue': counts.get(StatutFacture.RECUE, 0),
-            'validee': counts.get(StatutFacture.VALIDEE, 0),
-            'attente_paiement': counts.get(StatutFacture.ATTENTE_PAIEMENT, 0),
-            'payee': counts.get(StatutFacture.PAYEE, 0),
-            'rejete': counts.get(StatutFacture.REJETEE, 0),
-            'derniers': self.get_serializer(qs.order_by('-date_facture')[:5], many=True).data,
-            'a_traiter': self.get_serializer(
-                qs.filter(statut_facture__in=[StatutFacture.RECUE, StatutFacture.ATTENTE_PAIEMENT, StatutFacture.VALIDEE])
-                .order_by('-date_facture')[:5],
-                many=True,
-            ).data,
-        }
+        data = self.build_stats(
+            qs,
+            counts={
+                'recue': Q(statut_facture=StatutFacture.RECUE),
+                'validee': Q(statut_facture=StatutFacture.VALIDEE),
+                'attente_paiement': Q(statut_facture=StatutFacture.ATTENTE_PAIEMENT),
+                'payee': Q(statut_facture=StatutFacture.PAYEE),
+                'rejete': Q(statut_facture=StatutFacture.REJETEE),
+            },
+            lists={
+                'derniers': None,
+                'a_traiter': Q(
+                    statut_facture__in=[StatutFacture.RECUE, StatutFacture.ATTENTE_PAIEMENT, StatutFacture.VALIDEE]
+                ),
+            },
+            order_by=('-date_facture',),
+        )
         return Response({'message': 'Statistiques des factures', 'data': data}, status=status.HTTP_200_OK)
 
 
 class PaiementViewSet(AuditModelViewSet):
     queryset = Paiement.objects.select_related(
-        'id_facture',
-        'id_facture__id_bc',
-        'id_facture__id_bc__id_demande',
         'id_banque',
         'id_methode_paiement',
-        'id_preuve_paiement',
-        'id_tresorier',
-    ).all()
+        *user_paths('id_preuve_paiement__id_utilisateur', 'id_tresorier'),
+    ).prefetch_related(
+        models.Prefetch('id_facture', queryset=with_facture_relations(Facture.objects.all())),
+    )
     serializer_class = PaiementSerializer
     audit_prefix = 'paiement'
     audit_type = 'PAIEMENT'
@@ -1666,7 +1933,7 @@ class PaiementViewSet(AuditModelViewSet):
             qs = qs.filter(id_banque_id=banque)
         if statut:
             qs = qs.filter(statut_paiement=statut)
-        return filter_by_departement(qs, self.request.user, 'id_facture__id_bc__id_departement_id')
+        return filter_by_departement(qs, self.principal, 'id_facture__id_bc__id_departement_id')
 
     @action(detail=True, methods=['get'], url_path='ordre-virement')
     def ordre_virement(self, request, pk=None):
@@ -1676,7 +1943,7 @@ class PaiementViewSet(AuditModelViewSet):
         total_autorise = Decimal('0')
         total_paye = Decimal('0')
         if bc:
-            total_autorise, total_paye = _paiement_totaux(bc)
+            total_autorise, total_paye = facturation.totaux(bc)
         montant = _safe_decimal(getattr(paiement, 'montant', None))
         total_paye_sans_ordre = total_paye - montant
         if total_paye_sans_ordre < 0:
@@ -1690,20 +1957,21 @@ class PaiementViewSet(AuditModelViewSet):
         return Response({'message': 'Ordre de virement', 'data': data}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['get'], url_path='stats')
+    @cache_response()
     def stats(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        counts = dict(qs.values_list('statut_paiement').annotate(total=models.Count('id')))
-        data = {
-            'total': qs.count(),
-            'en_attente': counts.get(StatutPaiement.EN_ATTENTE, 0),
-            'en_cours': counts.get(StatutPaiement.EN_COURS, 0),
-            'execute': counts.get(StatutPaiement.EXECUTE, 0),
-            'rejete': counts.get(StatutPaiement.REJETE, 0),
-            'derniers': self.get_serializer(qs.order_by('-date_ordre', '-date_execution')[:5], many=True).data,
-            'a_traiter': self.get_serializer(
-                qs.filter(statut_paiement__in=[StatutPaiement.EN_ATTENTE, StatutPaiement.EN_COURS])
-                .order_by('-date_ordre', '-date_execution')[:5],
-                many=True,
-            ).data,
-        }
+        data = self.build_stats(
+            qs,
+            counts={
+                'en_attente': Q(statut_paiement=StatutPaiement.EN_ATTENTE),
+                'en_cours': Q(statut_paiement=StatutPaiement.EN_COURS),
+                'execute': Q(statut_paiement=StatutPaiement.EXECUTE),
+                'rejete': Q(statut_paiement=StatutPaiement.REJETE),
+            },
+            lists={
+                'derniers': None,
+                'a_traiter': Q(statut_paiement__in=[StatutPaiement.EN_ATTENTE, StatutPaiement.EN_COURS]),
+            },
+            order_by=('-date_ordre', '-date_execution'),
+        )
         return Response({'message': 'Statistiques des paiements', 'data': data}, status=status.HTTP_200_OK)